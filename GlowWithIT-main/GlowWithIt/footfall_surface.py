@@ -0,0 +1,164 @@
+# GlowWithIt/footfall_surface.py
+"""
+Footfall interpolated over the city, for array lookups along routes and the map's heat layer.
+
+`build_surface` spreads one snapshot's sensor counts over a res_m grid on MEL_BBOX by
+inverse-distance weighting (sensors within idw_radius_m of a cell; farther cells are 0),
+then scales it with the same P10–P90 bounds add_footfall_score uses for the sensors.
+Each cell also remembers its nearest sensor within near_m. Scoring a route is then one
+pixel read per sample; `sample_sensors` evaluates the same interpolation and scaling at
+arbitrary points, for windows without a grid.
+"""
+from __future__ import annotations
+import math
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .geometry import M_PER_DEG_LAT
+from .lighting_index import MEL_BBOX
+from .pedestrians import robust_minmax
+
+DEFAULT_RES_M = 25.0
+DEFAULT_IDW_RADIUS_M = 400.0
+DEFAULT_NEAR_M = 60.0
+IDW_POWER = 2.0
+
+
+class FootfallSurface:
+    """
+    Grids over `bbox` (minlon, minlat, maxlon, maxlat); row 0 is the southern edge.
+    score: 0..1 (P10–P90 of the sensor counts), count: interpolated count,
+    nearest: index into sensor_ids of the sensor within near_m of the cell, or -1.
+    """
+
+    def __init__(self, score: np.ndarray, count: np.ndarray, nearest: np.ndarray, sensor_ids: Sequence[int],
+                 bbox: Sequence[float], res_m: float, meta: dict | None = None):
+        self.score = score
+        self.count = count
+        self.nearest = nearest
+        self.sensor_ids = np.asarray(sensor_ids, dtype=np.int64)
+        self.bbox = tuple(float(v) for v in bbox)
+        self.res_m = float(res_m)
+        self.height, self.width = score.shape
+        self.meta = meta or {}
+        minlon, minlat, _, maxlat = self.bbox
+        self.lat_m = M_PER_DEG_LAT
+        self.lng_m = M_PER_DEG_LAT * math.cos(math.radians((minlat + maxlat) / 2.0))
+
+    # ---- lookups ----
+    def _pixels(self, latlng: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        minlon, minlat = self.bbox[0], self.bbox[1]
+        cols = np.floor((latlng[:, 1] - minlon) * self.lng_m / self.res_m).astype(np.int64)
+        rows = np.floor((latlng[:, 0] - minlat) * self.lat_m / self.res_m).astype(np.int64)
+        return rows, cols
+
+    def covers(self, latlng: np.ndarray) -> bool:
+        """True if every point falls inside the grid extent."""
+        latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        rows, cols = self._pixels(latlng)
+        return bool(len(latlng)) and bool(
+            (rows >= 0).all() and (rows < self.height).all() and (cols >= 0).all() and (cols < self.width).all()
+        )
+
+    def sample(self, latlng: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(score, count, nearest) per point; points outside the extent read as 0, 0, -1."""
+        latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        rows, cols = self._pixels(latlng)
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        score = np.zeros(len(latlng), dtype=np.float32)
+        count = np.zeros(len(latlng), dtype=np.float32)
+        nearest = np.full(len(latlng), -1, dtype=np.int32)
+        r = rows[inside]; c = cols[inside]
+        score[inside] = self.score[r, c]
+        count[inside] = self.count[r, c]
+        nearest[inside] = self.nearest[r, c]
+        return score, count, nearest
+
+    def heat_points(self, stride: int = 4, min_score: float = 0.01) -> List[List[float]]:
+        """[[lat, lng, score], ...] for every `stride`-th cell with a score, at the cell centres."""
+        stride = max(1, int(stride))
+        sub = self.score[::stride, ::stride]
+        rows, cols = np.nonzero(sub >= min_score)
+        lat = self.bbox[1] + (rows * stride + 0.5) * self.res_m / self.lat_m
+        lng = self.bbox[0] + (cols * stride + 0.5) * self.res_m / self.lng_m
+        val = sub[rows, cols]
+        return [[round(a, 6), round(b, 6), round(v, 3)] for a, b, v in zip(lat.tolist(), lng.tolist(), val.tolist())]
+
+
+def build_surface(sensors: Iterable[dict], bbox: Sequence[float] = MEL_BBOX, res_m: float = DEFAULT_RES_M,
+                  idw_radius_m: float = DEFAULT_IDW_RADIUS_M, near_m: float = DEFAULT_NEAR_M,
+                  power: float = IDW_POWER, chunk_rows: int = 16, meta: dict | None = None) -> FootfallSurface:
+    """
+    IDW grid from build_live_payload() sensor rows ({id, lat, lon, count_60m}). Cells are
+    filled a band of rows at a time, so the (cells x sensors) distance matrix stays small.
+    """
+    sensors = list(sensors)
+    minlon, minlat, maxlon, maxlat = bbox
+    lat_m = M_PER_DEG_LAT
+    lng_m = M_PER_DEG_LAT * math.cos(math.radians((minlat + maxlat) / 2.0))
+    width = int(math.ceil((maxlon - minlon) * lng_m / res_m))
+    height = int(math.ceil((maxlat - minlat) * lat_m / res_m))
+    count = np.zeros((height, width), dtype=np.float32)
+    nearest = np.full((height, width), -1, dtype=np.int32)
+
+    counts = np.array([float(s.get("count_60m") or 0.0) for s in sensors])
+    # sensor positions in grid metres (origin at the bbox's south-west corner)
+    sx = np.array([(float(s["lon"]) - minlon) * lng_m for s in sensors])
+    sy = np.array([(float(s["lat"]) - minlat) * lat_m for s in sensors])
+    xs = (np.arange(width) + 0.5) * res_m
+    if len(sensors):
+        for r0 in range(0, height, chunk_rows):
+            ys = (np.arange(r0, min(height, r0 + chunk_rows)) + 0.5) * res_m
+            # only sensors that can reach this band of rows
+            reach = np.flatnonzero(np.abs(sy - ys.mean()) <= idw_radius_m + (ys[-1] - ys[0]) / 2.0)
+            if not len(reach):
+                continue
+            dx = xs[None, :, None] - sx[reach][None, None, :]
+            dy = ys[:, None, None] - sy[reach][None, None, :]
+            d = np.hypot(dx, dy)                                                  # (rows, width, sensors)
+            count[r0:r0 + len(ys)] = _idw(d, counts[reach], idw_radius_m, power, res_m / 2.0)
+            k = d.argmin(axis=2)
+            near = np.take_along_axis(d, k[..., None], axis=2)[..., 0] <= near_m
+            nearest[r0:r0 + len(ys)] = np.where(near, reach[k], -1)
+
+    # the same P10–P90 scaling as pedestrians.add_footfall_score
+    p10, p90 = robust_minmax(counts.tolist())
+    score = _scale(count, p10, p90)
+    ids = [int(s["id"]) for s in sensors]
+    return FootfallSurface(score, count, nearest, ids, bbox, res_m, meta={**(meta or {}), "p10": p10, "p90": p90})
+
+
+def sample_sensors(latlng: np.ndarray, sensors: Iterable[dict], bounds: Tuple[float, float] | None = None,
+                   bbox: Sequence[float] = MEL_BBOX, res_m: float = DEFAULT_RES_M,
+                   idw_radius_m: float = DEFAULT_IDW_RADIUS_M,
+                   power: float = IDW_POWER) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (score, count) per point, as build_surface() would put them in the cells under the points.
+    `bounds` are the (p10, p90) to scale with, e.g. a surface's meta; by default the sensors'.
+    """
+    sensors = list(sensors)
+    latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+    counts = np.array([float(s.get("count_60m") or 0.0) for s in sensors])
+    lng_m = M_PER_DEG_LAT * math.cos(math.radians((bbox[1] + bbox[3]) / 2.0))
+    if len(sensors):
+        dx = (latlng[:, 1, None] - np.array([float(s["lon"]) for s in sensors])[None, :]) * lng_m
+        dy = (latlng[:, 0, None] - np.array([float(s["lat"]) for s in sensors])[None, :]) * M_PER_DEG_LAT
+        count = _idw(np.hypot(dx, dy), counts, idw_radius_m, power, res_m / 2.0).astype(np.float32)
+    else:
+        count = np.zeros(len(latlng), dtype=np.float32)
+    p10, p90 = bounds if bounds is not None else robust_minmax(counts.tolist())
+    return _scale(count, p10, p90), count
+
+
+def _idw(d: np.ndarray, counts: np.ndarray, idw_radius_m: float, power: float, min_d: float) -> np.ndarray:
+    """Inverse-distance weighted counts over the last (sensor) axis of `d`; 0 with no sensor in reach."""
+    w = np.where(d <= idw_radius_m, 1.0 / np.maximum(d, min_d) ** power, 0.0)
+    wsum = w.sum(axis=-1)
+    return np.divide((w * counts).sum(axis=-1), wsum, out=np.zeros_like(wsum), where=wsum > 0)
+
+
+def _scale(count: np.ndarray, p10: float, p90: float) -> np.ndarray:
+    score = np.clip((count - p10) / max(p90 - p10, 1.0), 0.0, 1.0).astype(np.float32)
+    score[count <= 0] = 0.0
+    return score
@@ -0,0 +1,364 @@
+# GlowWithIt/geometry.py
+"""
+Shared geometry kernels for every endpoint that works with routes.
+
+Google encoded polylines are decoded straight into NumPy arrays, points are
+projected to local meters (equirectangular around a reference lat/lon, well
+under a meter of error across the City of Melbourne) and point/segment
+distances are computed in batches instead of one Python loop per point.
+"""
+from __future__ import annotations
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+M_PER_DEG_LAT = 111_320.0
+
+# points per broadcast chunk in the distance kernels; keeps (points x segments) matrices small
+DIST_CHUNK = 256
+
+
+# ---- encoded polylines ----
+def decode_polyline_np(s: str) -> np.ndarray:
+    """Decode a Google encoded polyline into an (n, 2) float64 array of lat, lng."""
+    if not s:
+        return np.empty((0, 2))
+    try:
+        raw = np.frombuffer(s.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    except UnicodeEncodeError:
+        raise ValueError("invalid polyline: non-ASCII characters") from None
+    if raw.min() < 0 or raw.max() > 0x3F:
+        raise ValueError("invalid polyline: character out of range")
+
+    # every value is a run of 5-bit chunks, the last one without the 0x20 continuation bit
+    ends = raw < 0x20
+    if not ends[-1]:
+        raise ValueError("invalid polyline: truncated value")
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    n_vals = len(starts)
+    if n_vals % 2:
+        raise ValueError("invalid polyline: odd number of values")
+    pos = np.arange(len(raw)) - np.repeat(starts, np.diff(np.append(starts, len(raw))))
+    vals = np.add.reduceat((raw & 0x1F) << (5 * pos), starts)
+
+    # zig-zag sign decoding, then running sums of the lat / lng deltas
+    deltas = np.where(vals & 1, ~(vals >> 1), vals >> 1).reshape(-1, 2)
+    return np.cumsum(deltas, axis=0) / 1e5
+
+
+def decode_polyline(s: str) -> List[Tuple[float, float]]:
+    """Decode a Google encoded polyline into a list of (lat, lng) tuples."""
+    return list(map(tuple, decode_polyline_np(s).tolist()))
+
+
+def encode_polyline(route: Sequence[Tuple[float, float]]) -> str:
+    out = []; plat = 0; plng = 0
+    for lat, lng in route:
+        ilat = int(round(lat * 1e5)); ilng = int(round(lng * 1e5))
+        for v in (ilat - plat, ilng - plng):
+            v = ~(v << 1) if v < 0 else (v << 1)
+            while v >= 0x20:
+                out.append(chr((0x20 | (v & 0x1F)) + 63)); v >>= 5
+            out.append(chr(v + 63))
+        plat, plng = ilat, ilng
+    return "".join(out)
+
+
+# ---- local-meter projection ----
+def meters_per_degree(lat: float) -> Tuple[float, float]:
+    """Meters per degree of latitude and of longitude at `lat`."""
+    return M_PER_DEG_LAT, M_PER_DEG_LAT * math.cos(math.radians(lat))
+
+
+def project_np(latlng: np.ndarray, ref_lat: float, ref_lng: float) -> np.ndarray:
+    """Project an (n, 2) lat/lng array to local meters (x east, y north)."""
+    latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+    lng_m = M_PER_DEG_LAT * math.cos(math.radians(ref_lat))
+    return np.column_stack(((latlng[:, 1] - ref_lng) * lng_m, (latlng[:, 0] - ref_lat) * M_PER_DEG_LAT))
+
+
+def project_segments_np(segs_latlng: np.ndarray, ref_lat: float, ref_lng: float) -> np.ndarray:
+    """Project an (m, 4) [a_lat, a_lng, b_lat, b_lng] array to local-meter [ax, ay, bx, by]."""
+    segs_latlng = np.asarray(segs_latlng, dtype=float).reshape(-1, 4)
+    return np.hstack([project_np(segs_latlng[:, :2], ref_lat, ref_lng),
+                      project_np(segs_latlng[:, 2:], ref_lat, ref_lng)])
+
+
+def polyline_segments_np(xy: np.ndarray) -> np.ndarray:
+    """(m, 4) [ax, ay, bx, by] for consecutive vertices of an (n, 2) polyline."""
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    return np.hstack([xy[:-1], xy[1:]])
+
+
+# ---- distances ----
+def _inv_len2(v: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    v2 = (v * v).sum(axis=1)
+    return v2, np.divide(1.0, v2, out=np.zeros_like(v2), where=v2 > 0)  # degenerate segment -> t = 0
+
+
+def min_dist2_points_segments(p_xy: np.ndarray, segs: np.ndarray, chunk: int = DIST_CHUNK) -> np.ndarray:
+    """Squared distance from each point to its nearest segment (all in local meters); inf with no segments."""
+    segs = np.asarray(segs, dtype=float).reshape(-1, 4)
+    a = segs[:, :2]; v = segs[:, 2:] - a
+    return _min_dist2(p_xy, a, v, _inv_len2(v)[1], chunk)
+
+
+def _min_dist2(p_xy: np.ndarray, a: np.ndarray, v: np.ndarray, inv: np.ndarray, chunk: int = DIST_CHUNK) -> np.ndarray:
+    """Kernel behind min_dist2_points_segments: segment starts `a`, vectors `v`, 1/|v|^2 `inv`."""
+    p_xy = np.asarray(p_xy, dtype=float).reshape(-1, 2)
+    out = np.full(len(p_xy), np.inf)
+    if len(a) == 0 or len(p_xy) == 0:
+        return out
+    for start in range(0, len(p_xy), chunk):
+        p = p_xy[start:start + chunk]
+        wx = p[:, None, 0] - a[None, :, 0]
+        wy = p[:, None, 1] - a[None, :, 1]
+        t = np.clip((wx * v[:, 0] + wy * v[:, 1]) * inv, 0.0, 1.0)
+        dx = wx - t * v[:, 0]; dy = wy - t * v[:, 1]
+        out[start:start + chunk] = (dx * dx + dy * dy).min(axis=1)
+    return out
+
+
+def min_dist_points_to_polyline_m(points_latlng, route_latlng) -> np.ndarray:
+    """Meters from each (lat, lng) point to the nearest point on the route; inf for a route under 2 vertices."""
+    return RouteContext.of(route_latlng).dist_m(points_latlng)
+
+
+def min_dist_point_to_polyline_m(pt_lat: float, pt_lng: float, route_latlng) -> float:
+    """Meters from one point to the nearest point on the route (scalar form of the above)."""
+    if len(route_latlng) < 2:
+        return float("inf")
+    return float(min_dist_points_to_polyline_m([(pt_lat, pt_lng)], route_latlng)[0])
+
+
+class RouteContext:
+    """
+    One route, projected to local meters once and shared by every distance query
+    made while scoring it (sensors, venues, disruptions, lighting samples).
+
+    latlng:   (n, 2) vertices, lat/lng          xy:       (n, 2) vertices in meters around ref
+    seg_a:    (n-1, 2) segment starts (m)       seg_v:    (n-1, 2) segment vectors (m)
+    seg_len2: (n-1,) squared segment lengths    cum_len:  (n,) distance along the route to each vertex (m)
+    bbox:     (minlon, minlat, maxlon, maxlat) of the vertices
+    """
+
+    __slots__ = ("points", "latlng", "ref_lat", "ref_lng", "xy", "seg_a", "seg_v", "seg_len2", "_seg_inv",
+                 "cum_len", "bbox")
+
+    def __init__(self, route: Sequence[Tuple[float, float]]):
+        self.points = list(route)
+        self.latlng = np.asarray(self.points, dtype=float).reshape(-1, 2)
+        self.ref_lat, self.ref_lng = (float(self.latlng[0, 0]), float(self.latlng[0, 1])) if len(self.latlng) else (0.0, 0.0)
+        self.xy = project_np(self.latlng, self.ref_lat, self.ref_lng)
+        self.seg_a = self.xy[:-1]
+        self.seg_v = np.diff(self.xy, axis=0)
+        self.seg_len2, self._seg_inv = _inv_len2(self.seg_v)
+        self.cum_len = np.concatenate(([0.0], np.cumsum(np.sqrt(self.seg_len2))))
+        if len(self.latlng):
+            lo = self.latlng.min(axis=0); hi = self.latlng.max(axis=0)
+            self.bbox = (float(lo[1]), float(lo[0]), float(hi[1]), float(hi[0]))
+        else:
+            self.bbox = None
+
+    @classmethod
+    def of(cls, route) -> "RouteContext":
+        return route if isinstance(route, cls) else cls(route)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    @property
+    def length_m(self) -> float:
+        return float(self.cum_len[-1]) if len(self.cum_len) else 0.0
+
+    def padded_bbox(self, pad_m: float) -> Tuple[float, float, float, float]:
+        """bbox grown by pad_m, with the lng scale taken at the mean vertex latitude."""
+        lat_m, lng_m = meters_per_degree(float(self.latlng[:, 0].mean()))
+        dlat = pad_m / lat_m; dlng = pad_m / lng_m
+        minx, miny, maxx, maxy = self.bbox
+        return (minx - dlng, miny - dlat, maxx + dlng, maxy + dlat)
+
+    def project(self, latlng) -> np.ndarray:
+        return project_np(latlng, self.ref_lat, self.ref_lng)
+
+    def segments(self) -> np.ndarray:
+        """(n-1, 4) [ax, ay, bx, by] in meters."""
+        return np.hstack([self.seg_a, self.seg_a + self.seg_v])
+
+    def dist_m(self, points_latlng) -> np.ndarray:
+        """Meters from each (lat, lng) point to the nearest point on the route; inf under 2 vertices."""
+        pts = np.asarray(points_latlng, dtype=float).reshape(-1, 2)
+        if len(self.points) < 2:
+            return np.full(len(pts), np.inf)
+        return np.sqrt(_min_dist2(self.project(pts), self.seg_a, self.seg_v, self._seg_inv))
+
+
+class PointGrid:
+    """
+    Uniform grid over a fixed point set (sensors), in local meters around `ref`.
+    Cells map to the indices of the points inside them, so a route-buffer query
+    only measures points in cells the buffer touches, and a nearest query only
+    scans rings of cells around the query point.
+    """
+
+    def __init__(self, latlng, cell_m: float = 60.0, ref: Tuple[float, float] | None = None):
+        self.latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        if ref is None:
+            ref = tuple(self.latlng.mean(axis=0)) if len(self.latlng) else (0.0, 0.0)
+        self.ref_lat, self.ref_lng = float(ref[0]), float(ref[1])
+        self.cell_m = float(cell_m)
+        self.xy = project_np(self.latlng, self.ref_lat, self.ref_lng)
+        self._cells: Dict[Tuple[int, int], np.ndarray] | None = None
+        self._codes = np.empty(0, dtype=np.int64)
+        if len(self.xy):
+            c = np.floor(self.xy / self.cell_m).astype(np.int64)
+            self._lo = c.min(axis=0); self._hi = c.max(axis=0)
+            # occupied cells as sorted integer codes over the occupied extent, for vectorized lookups
+            self._span = int(self._hi[1] - self._lo[1] + 1)
+            codes = self._code(c[:, 0], c[:, 1])
+            self._order = np.argsort(codes, kind="stable")
+            self._codes, self._starts, counts = np.unique(codes[self._order], return_index=True, return_counts=True)
+            self._ends = self._starts + counts
+
+    @property
+    def cells(self) -> Dict[Tuple[int, int], np.ndarray]:
+        """(cx, cy) -> point indices; built on first use (nearest lookups walk it cell by cell)."""
+        if self._cells is None:
+            cells = {}
+            for code, st, en in zip(self._codes.tolist(), self._starts.tolist(), self._ends.tolist()):
+                cx, cy = divmod(code, self._span)
+                cells[(cx + int(self._lo[0]), cy + int(self._lo[1]))] = self._order[st:en]
+            self._cells = cells
+        return self._cells
+
+    def _code(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        return (cx - self._lo[0]) * self._span + (cy - self._lo[1])
+
+    def __len__(self) -> int:
+        return len(self.latlng)
+
+    def candidates_near_route(self, route, radius_m: float) -> np.ndarray:
+        """
+        Indices of the points in cells that can hold a point within radius_m of the route,
+        sorted. Each route segment is expanded to the grid cells its buffer reaches, all
+        segments at once; only those cells' points are candidates.
+        """
+        if not len(self._codes):
+            return np.empty(0, dtype=np.int64)
+        rc = RouteContext.of(route)
+        xy = project_np(rc.latlng, self.ref_lat, self.ref_lng)
+        if len(xy) == 1:
+            xy = np.vstack([xy, xy])
+        a = xy[:-1]; v = xy[1:] - a
+        # a cell qualifies when its center is within the buffer plus half a cell diagonal
+        # (plus a little slack for the different projection references)
+        reach = radius_m + self.cell_m * 0.7072 + 1.0
+        lo = np.maximum(np.floor((np.minimum(a, a + v) - reach) / self.cell_m).astype(np.int64), self._lo)
+        hi = np.minimum(np.floor((np.maximum(a, a + v) + reach) / self.cell_m).astype(np.int64), self._hi)
+        n_xy = np.maximum(hi - lo + 1, 0)
+        n = n_xy[:, 0] * n_xy[:, 1]
+        if not n.sum():
+            return np.empty(0, dtype=np.int64)
+        owner = np.repeat(np.arange(len(n)), n)
+        local = np.arange(owner.size) - np.repeat(np.cumsum(n) - n, n)
+        cx = lo[owner, 0] + local // n_xy[owner, 1]
+        cy = lo[owner, 1] + local % n_xy[owner, 1]
+
+        # distance from each cell center to the segment that produced it
+        w = (np.column_stack([cx, cy]) + 0.5) * self.cell_m - a[owner]
+        vo = v[owner]
+        v2 = (vo * vo).sum(axis=1)
+        t = np.clip(np.divide((w * vo).sum(axis=1), v2, out=np.zeros_like(v2), where=v2 > 0), 0.0, 1.0)
+        d = w - t[:, None] * vo
+        near = (d * d).sum(axis=1) <= reach * reach
+
+        codes = np.unique(self._code(cx[near], cy[near]))
+        pos = np.searchsorted(self._codes, codes)
+        pos = pos[(pos < len(self._codes)) & (self._codes[np.minimum(pos, len(self._codes) - 1)] == codes)]
+        if not len(pos):
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self._order[self._starts[i]:self._ends[i]] for i in pos.tolist()]))
+
+    def within_route(self, route, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, meters) of the points within radius_m of the route, in point order."""
+        cand = self.candidates_near_route(route, radius_m)
+        if not len(cand):
+            return cand, np.empty(0)
+        d = RouteContext.of(route).dist_m(self.latlng[cand])
+        keep = d <= radius_m
+        return cand[keep], d[keep]
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_m: float = math.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, meters) of up to k points nearest to (lat, lng), closest first."""
+        if not len(self._codes) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        p = project_np([(lat, lng)], self.ref_lat, self.ref_lng)[0]
+        px, py = (np.floor(p / self.cell_m)).astype(np.int64).tolist()
+        (lo_x, lo_y), (hi_x, hi_y) = self._lo.tolist(), self._hi.tolist()
+        max_ring = max(abs(px - lo_x), abs(px - hi_x), abs(py - lo_y), abs(py - hi_y))
+        # rings closer than the occupied extent are empty, so start at the first one that reaches
+        # it, and walk only the part of each ring inside it: a far-away point costs no more
+        first = max(lo_x - px, px - hi_x, lo_y - py, py - hi_y, 0)
+        cand: List[np.ndarray] = []
+        for ring in range(first, max_ring + 1):
+            for cx in range(max(px - ring, lo_x), min(px + ring, hi_x) + 1):
+                if abs(cx - px) == ring:
+                    cys = range(max(py - ring, lo_y), min(py + ring, hi_y) + 1)
+                else:
+                    cys = [cy for cy in (py - ring, py + ring) if lo_y <= cy <= hi_y]
+                for cy in cys:
+                    idx = self.cells.get((cx, cy))
+                    if idx is not None:
+                        cand.append(idx)
+            # points outside the rings seen so far are at least ring * cell_m away
+            if ring * self.cell_m > max_m:
+                break
+            if sum(len(c) for c in cand) >= k:
+                d = np.hypot(*(self.xy[np.concatenate(cand)] - p).T)
+                if np.partition(d, k - 1)[k - 1] <= ring * self.cell_m:
+                    break
+        if not cand:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        idx = np.concatenate(cand)
+        d = np.hypot(*(self.xy[idx] - p).T)
+        order = np.argsort(d, kind="stable")[:k]
+        idx, d = idx[order], d[order]
+        keep = d <= max_m
+        return idx[keep], d[keep]
+
+
+# ---- simplification ----
+def douglas_peucker_mask(latlng, tol_m: float) -> np.ndarray:
+    """
+    Boolean keep-mask over the vertices of a polyline: Douglas–Peucker with a
+    tolerance in meters, measured to the chord as a segment (so loops that end
+    where they started still simplify sensibly). Endpoints are always kept.
+    """
+    pts = np.asarray(latlng, dtype=float).reshape(-1, 2)
+    n = len(pts)
+    keep = np.ones(n, dtype=bool)
+    if n < 3 or tol_m <= 0:
+        return keep
+    xy = project_np(pts, pts[0, 0], pts[0, 1])
+    keep[1:-1] = False
+    tol2 = tol_m * tol_m
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        d2 = min_dist2_points_segments(xy[i + 1:j], np.concatenate([xy[i], xy[j]])[None, :])
+        k = int(np.argmax(d2))
+        if d2[k] > tol2:
+            k += i + 1
+            keep[k] = True
+            stack.append((i, k)); stack.append((k, j))
+    return keep
+
+
+def simplify_polyline(route: Sequence[Tuple[float, float]], tol_m: float) -> List[Tuple[float, float]]:
+    if len(route) < 3 or tol_m <= 0:
+        return list(route)
+    keep = douglas_peucker_mask(route, tol_m)
+    return [p for p, k in zip(route, keep.tolist()) if k]
@@ -0,0 +1,209 @@
+# GlowWithIt/lighting_index.py
+"""
+In-process spatial indexes over the lighting layer used by route scoring.
+
+Everything is projected once into local meters (equirectangular around a
+reference lat/lon), which is accurate to well under a meter at the scale of
+the City of Melbourne and lets radius queries use plain Euclidean math.
+"""
+from __future__ import annotations
+import math
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .geometry import M_PER_DEG_LAT
+
+# City of Melbourne extent (minlon, minlat, maxlon, maxlat) covered by the lighting layer
+MEL_BBOX = (144.90, -37.86, 145.02, -37.76)
+
+Segment = Tuple[float, float, float, float]  # ax, ay, bx, by in local meters
+
+
+class _LocalGrid:
+    """Shared local-meter projection and cell addressing for the indexes below."""
+
+    def __init__(self, ref_lat: float, ref_lng: float, cell_m: float):
+        self.ref_lat = ref_lat
+        self.ref_lng = ref_lng
+        self.lat_m = M_PER_DEG_LAT
+        self.lng_m = M_PER_DEG_LAT * math.cos(math.radians(ref_lat))
+        self.cell_m = float(cell_m)
+
+    def to_xy(self, lat: float, lng: float) -> Tuple[float, float]:
+        return (lng - self.ref_lng) * self.lng_m, (lat - self.ref_lat) * self.lat_m
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_m)), int(math.floor(y / self.cell_m))
+
+
+class LampGrid(_LocalGrid):
+    """
+    Uniform hash-grid over lamp points.
+
+    Lamps are bucketed into square cells of `cell_m` meters, so a radius query
+    only has to scan the cells the query circle can touch (the 3x3 block around
+    the sample when radius <= cell_m) instead of every lamp in the bbox.
+    """
+
+    def __init__(self, lamps: Iterable[Tuple[float, float]], ref_lat: float, ref_lng: float,
+                 cell_m: float = 25.0):
+        super().__init__(ref_lat, ref_lng, cell_m)
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+        self.size = 0
+        for lat, lon in lamps:
+            x, y = self.to_xy(lat, lon)
+            self.cells.setdefault(self._cell(x, y), []).append((x, y))
+            self.size += 1
+
+    def any_within(self, lat: float, lng: float, radius_m: float) -> bool:
+        """True if at least one lamp lies within `radius_m` of (lat, lng)."""
+        if not self.cells:
+            return False
+        x, y = self.to_xy(lat, lng)
+        cx, cy = self._cell(x, y)
+        reach = max(1, int(math.ceil(radius_m / self.cell_m)))
+        r2 = radius_m * radius_m
+        for ix in range(cx - reach, cx + reach + 1):
+            for iy in range(cy - reach, cy + reach + 1):
+                pts = self.cells.get((ix, iy))
+                if not pts:
+                    continue
+                for px, py in pts:
+                    dx = px - x; dy = py - y
+                    if dx * dx + dy * dy <= r2:
+                        return True
+        return False
+
+
+def _dist2_point_segment(x: float, y: float, seg: Segment) -> float:
+    ax, ay, bx, by = seg
+    vx = bx - ax; vy = by - ay
+    wx = x - ax; wy = y - ay
+    v2 = vx * vx + vy * vy
+    t = 0.0 if v2 == 0 else max(0.0, min(1.0, (wx * vx + wy * vy) / v2))
+    dx = wx - t * vx; dy = wy - t * vy
+    return dx * dx + dy * dy
+
+
+class SegmentIndex(_LocalGrid):
+    """
+    Bucketed index over lit-way segments.
+
+    Every segment is projected to meters once and registered in each cell its
+    bounding box (grown by `radius_m`) overlaps. A query point then only tests
+    the handful of segments whose buffered box covers its cell, instead of
+    re-projecting and walking every vertex of every lit line.
+    """
+
+    def __init__(self, lines: Iterable[List[Tuple[float, float]]], ref_lat: float, ref_lng: float,
+                 radius_m: float = 25.0, cell_m: float = 50.0):
+        super().__init__(ref_lat, ref_lng, cell_m)
+        self.radius_m = float(radius_m)
+        self.segments: List[Segment] = []
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for line in lines:
+            pts = [self.to_xy(lat, lon) for (lat, lon) in line]
+            for (ax, ay), (bx, by) in zip(pts[:-1], pts[1:]):
+                self._add((ax, ay, bx, by))
+
+    def _add(self, seg: Segment) -> None:
+        ax, ay, bx, by = seg
+        r = self.radius_m
+        cx0, cy0 = self._cell(min(ax, bx) - r, min(ay, by) - r)
+        cx1, cy1 = self._cell(max(ax, bx) + r, max(ay, by) + r)
+        idx = len(self.segments)
+        self.segments.append(seg)
+        for ix in range(cx0, cx1 + 1):
+            for iy in range(cy0, cy1 + 1):
+                self.cells.setdefault((ix, iy), []).append(idx)
+
+    def any_within(self, lat: float, lng: float, radius_m: float | None = None) -> bool:
+        """True if any lit segment passes within `radius_m` (<= the build radius) of (lat, lng)."""
+        r = self.radius_m if radius_m is None else min(radius_m, self.radius_m)
+        x, y = self.to_xy(lat, lng)
+        cand = self.cells.get(self._cell(x, y))
+        if not cand:
+            return False
+        r2 = r * r
+        for i in cand:
+            ax, ay, bx, by = seg = self.segments[i]
+            # cheap buffered-bbox reject before the exact distance
+            if x < min(ax, bx) - r or x > max(ax, bx) + r or y < min(ay, by) - r or y > max(ay, by) + r:
+                continue
+            if _dist2_point_segment(x, y, seg) <= r2:
+                return True
+        return False
+
+
+# ---- NumPy backend ----
+# The classes above are the pure-Python reference; the functions below compute
+# the same near/not-near flags with chunked, broadcast array math.
+
+# samples per chunk; each chunk only sees the features inside its own buffered bbox,
+# which keeps the broadcast (samples x features) matrices small on long routes
+NP_CHUNK = 64
+
+
+def sample_route_np(route: Sequence[Tuple[float, float]], step_m: float = 40.0) -> np.ndarray:
+    """
+    Vectorized twin of route_score._sample_route: same samples, as an (n, 2) lat/lng array.
+    """
+    pts = np.asarray(route, dtype=float).reshape(-1, 2)
+    if len(pts) < 2:
+        return pts
+    a = pts[:-1]; b = pts[1:]
+    lng_m = M_PER_DEG_LAT * np.cos(np.radians((a[:, 0] + b[:, 0]) / 2.0))
+    seg = np.hypot((b[:, 1] - a[:, 1]) * lng_m, (b[:, 0] - a[:, 0]) * M_PER_DEG_LAT)
+    keep = seg != 0
+    a = a[keep]; b = b[keep]
+    n = np.maximum(1, (seg[keep] // step_m).astype(np.int64))
+    owner = np.repeat(np.arange(len(n)), n)
+    i = np.arange(owner.size) - np.repeat(np.cumsum(n) - n, n)
+    t = (i / n[owner])[:, None]
+    out = a[owner] + (b[owner] - a[owner]) * t
+    return np.vstack([out, pts[-1:]])
+
+
+def lit_flags_np(samples_xy: np.ndarray, lamps_xy: np.ndarray, segs: np.ndarray,
+                 radius_m: float = 25.0, chunk: int = NP_CHUNK) -> np.ndarray:
+    """
+    Boolean flag per sample: within `radius_m` of any lamp point or lit segment.
+    All inputs are already in local meters.
+    """
+    n = len(samples_xy)
+    flags = np.zeros(n, dtype=bool)
+    if n == 0 or (len(lamps_xy) == 0 and len(segs) == 0):
+        return flags
+    r2 = radius_m * radius_m
+    seg_lo = np.minimum(segs[:, :2], segs[:, 2:]) if len(segs) else segs[:, :2]
+    seg_hi = np.maximum(segs[:, :2], segs[:, 2:]) if len(segs) else segs[:, :2]
+
+    for start in range(0, n, chunk):
+        p = samples_xy[start:start + chunk]
+        lo = p.min(axis=0) - radius_m
+        hi = p.max(axis=0) + radius_m
+        hit = np.zeros(len(p), dtype=bool)
+
+        if len(lamps_xy):
+            m = np.all((lamps_xy >= lo) & (lamps_xy <= hi), axis=1)
+            if m.any():
+                d = p[:, None, :] - lamps_xy[m][None, :, :]
+                hit |= ((d * d).sum(axis=2) <= r2).any(axis=1)
+
+        if len(segs) and not hit.all():
+            m = np.all((seg_hi >= lo) & (seg_lo <= hi), axis=1)
+            if m.any():
+                q = p[~hit]
+                s = segs[m]
+                a = s[None, :, :2]; v = s[None, :, 2:] - a
+                w = q[:, None, :] - a
+                v2 = (v * v).sum(axis=2)
+                t = np.where(v2 > 0, (w * v).sum(axis=2) / np.where(v2 > 0, v2, 1.0), 0.0)
+                t = np.clip(t, 0.0, 1.0)[:, :, None]
+                e = w - t * v
+                sub = ((e * e).sum(axis=2) <= r2).any(axis=1)
+                hit[~hit] = sub
+
+        flags[start:start + chunk] = hit
+    return flags
@@ -0,0 +1,114 @@
+# GlowWithIt/lighting_pack.py
+"""
+Compact, array-backed lighting payloads for the Django cache.
+
+Instead of pickling lists of (lat, lon) tuples, a tile is stored as one bytes
+blob: a 16-byte header, then lamp coords, line vertices (float64) and line
+offsets (int64). Reading it back is np.frombuffer over a memoryview, so a
+cache hit costs one memcpy out of the cache backend and no per-float objects.
+"""
+from __future__ import annotations
+import struct
+from array import array
+from itertools import chain
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"LIT1"
+_HEADER = struct.Struct("<4sIII")  # magic, n_lamps, n_vertices, n_lines  (16 bytes, keeps 8-byte alignment)
+
+
+class PackedLighting:
+    """
+    lamps:    (n, 2) float64 lat, lon
+    vertices: (v, 2) float64 lat, lon of every line, back to back
+    offsets:  (k + 1,) int64; line i is vertices[offsets[i]:offsets[i + 1]]
+    """
+
+    __slots__ = ("lamps", "vertices", "offsets")
+
+    def __init__(self, lamps: np.ndarray, vertices: np.ndarray, offsets: np.ndarray):
+        self.lamps = lamps
+        self.vertices = vertices
+        self.offsets = offsets
+
+    # ---- construction ----
+    @classmethod
+    def from_lists(cls, lamps: Iterable[Sequence[float]], lines: Iterable[Sequence[Sequence[float]]]) -> "PackedLighting":
+        lamp_buf = array("d", chain.from_iterable((float(a), float(b)) for a, b in lamps))
+        vert_buf = array("d")
+        offs = array("q", [0])
+        for line in lines:
+            if len(line) < 2:
+                continue
+            vert_buf.extend(chain.from_iterable((float(a), float(b)) for a, b in line))
+            offs.append(len(vert_buf) // 2)
+        return cls(np.frombuffer(lamp_buf, dtype=np.float64).reshape(-1, 2),
+                   np.frombuffer(vert_buf, dtype=np.float64).reshape(-1, 2),
+                   np.frombuffer(offs, dtype=np.int64))
+
+    @classmethod
+    def empty(cls) -> "PackedLighting":
+        return cls(np.empty((0, 2)), np.empty((0, 2)), np.zeros(1, dtype=np.int64))
+
+    @classmethod
+    def merge(cls, parts: Sequence["PackedLighting"]) -> "PackedLighting":
+        """Concatenate tiles, dropping lamps and lines that came back from more than one tile."""
+        if not parts:
+            return cls.empty()
+        lamps = np.vstack([p.lamps for p in parts])
+        if len(lamps):
+            lamps = np.unique(lamps, axis=0)
+        seen = set(); verts = []; offs = [0]
+        for p in parts:
+            for i in range(p.n_lines):
+                v = p.vertices[p.offsets[i]:p.offsets[i + 1]]
+                key = v.tobytes()
+                if key in seen:
+                    continue
+                seen.add(key); verts.append(v); offs.append(offs[-1] + len(v))
+        vertices = np.vstack(verts) if verts else np.empty((0, 2))
+        return cls(lamps, vertices, np.asarray(offs, dtype=np.int64))
+
+    # ---- (de)serialization ----
+    def to_bytes(self) -> bytes:
+        lamps = np.ascontiguousarray(self.lamps, dtype="<f8")
+        verts = np.ascontiguousarray(self.vertices, dtype="<f8")
+        offs = np.ascontiguousarray(self.offsets, dtype="<i8")
+        head = _HEADER.pack(MAGIC, len(lamps), len(verts), len(offs) - 1)
+        return b"".join((head, lamps.tobytes(), verts.tobytes(), offs.tobytes()))
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> "PackedLighting":
+        """Zero-copy view over `buf` (the arrays are read-only and keep `buf` alive)."""
+        mv = memoryview(buf)
+        magic, n_lamps, n_verts, n_lines = _HEADER.unpack_from(mv, 0)
+        if magic != MAGIC:
+            raise ValueError("not a packed lighting payload")
+        off = _HEADER.size
+        lamps = np.frombuffer(mv, dtype="<f8", count=2 * n_lamps, offset=off).reshape(-1, 2)
+        off += 16 * n_lamps
+        verts = np.frombuffer(mv, dtype="<f8", count=2 * n_verts, offset=off).reshape(-1, 2)
+        off += 16 * n_verts
+        offs = np.frombuffer(mv, dtype="<i8", count=n_lines + 1, offset=off)
+        return cls(lamps, verts, offs)
+
+    # ---- views ----
+    @property
+    def n_lines(self) -> int:
+        return len(self.offsets) - 1
+
+    def lines(self) -> Iterator[List[Tuple[float, float]]]:
+        for i in range(self.n_lines):
+            yield [tuple(p) for p in self.vertices[self.offsets[i]:self.offsets[i + 1]].tolist()]
+
+    def segments(self) -> np.ndarray:
+        """(m, 4) [a_lat, a_lon, b_lat, b_lon] for every consecutive vertex pair within a line."""
+        if len(self.vertices) < 2:
+            return np.empty((0, 4))
+        keep = np.ones(len(self.vertices) - 1, dtype=bool)
+        # a pair straddling two lines starts at the last vertex of a line
+        ends = self.offsets[1:-1] - 1
+        keep[ends[(ends >= 0) & (ends < len(keep))]] = False
+        return np.hstack([self.vertices[:-1][keep], self.vertices[1:][keep]])
@@ -0,0 +1,134 @@
+# GlowWithIt/lighting_snapshot.py
+"""
+Process-wide, versioned snapshot of the whole lighting layer for MEL_BBOX.
+
+Each worker loads lamps and lit-way segments once into flat NumPy arrays and
+serves every route from memory. The snapshot is versioned by MAX(updated_at)
+and COUNT(*) of lighting_lamps / lighting_litways; a background thread checks
+that version at most every LIGHTING_SNAPSHOT_CHECK_S seconds and swaps in a
+fresh snapshot only when it changed, so route scoring never waits on MySQL.
+Only the web views start that thread (ensure_lighting_snapshot); everything
+else just reads whatever snapshot is loaded.
+"""
+from __future__ import annotations
+import logging, threading, time
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .lighting_index import MEL_BBOX
+from .lighting_pack import PackedLighting
+
+LIGHTING_SNAPSHOT_CHECK_S = 60
+
+
+@dataclass(frozen=True)
+class LightingSnapshot:
+    version: str
+    lamps: np.ndarray      # (n, 2) lat, lon
+    segments: np.ndarray   # (m, 4) a_lat, a_lon, b_lat, b_lon
+    loaded_at: float
+    bbox: Tuple[float, float, float, float] = MEL_BBOX
+
+    def covers(self, bbox: Sequence[float]) -> bool:
+        """True if bbox lies entirely inside the snapshot extent."""
+        minlon, minlat, maxlon, maxlat = bbox
+        return (minlon >= self.bbox[0] and minlat >= self.bbox[1] and
+                maxlon <= self.bbox[2] and maxlat <= self.bbox[3])
+
+    def subset(self, bbox: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Lamps and segments touching bbox (minlon, minlat, maxlon, maxlat)."""
+        minlon, minlat, maxlon, maxlat = bbox
+        lm = ((self.lamps[:, 0] >= minlat) & (self.lamps[:, 0] <= maxlat) &
+              (self.lamps[:, 1] >= minlon) & (self.lamps[:, 1] <= maxlon))
+        s = self.segments
+        sm = ((np.maximum(s[:, 0], s[:, 2]) >= minlat) & (np.minimum(s[:, 0], s[:, 2]) <= maxlat) &
+              (np.maximum(s[:, 1], s[:, 3]) >= minlon) & (np.minimum(s[:, 1], s[:, 3]) <= maxlon))
+        return self.lamps[lm], s[sm]
+
+
+_STATE = {"snapshot": None, "checked_at": 0.0, "refreshing": False}
+_LOCK = threading.Lock()
+
+
+def _lighting_version() -> str:
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            SELECT (SELECT MAX(updated_at) FROM lighting_lamps), (SELECT COUNT(*) FROM lighting_lamps),
+                   (SELECT MAX(updated_at) FROM lighting_litways), (SELECT COUNT(*) FROM lighting_litways)
+            """
+        )
+        row = cur.fetchone() or ()
+    return "|".join(str(x) for x in row)
+
+
+def _load_snapshot(version: str) -> LightingSnapshot:
+    # route_score imports this module, so pull the SQL helpers in lazily
+    from .route_score import _bbox_to_wkt, _query_lighting_db
+
+    data = _query_lighting_db(_bbox_to_wkt(*MEL_BBOX))
+    packed = PackedLighting.from_lists(data["lamps"], data["lines"])
+    return LightingSnapshot(version=version, lamps=packed.lamps, segments=packed.segments(), loaded_at=time.time())
+
+
+def refresh_lighting_snapshot() -> Optional[LightingSnapshot]:
+    """
+    Check the DB version and reload the snapshot if it changed. Blocking;
+    request paths go through ensure_lighting_snapshot() which runs this in the background.
+    """
+    try:
+        version = _lighting_version()
+        current = _STATE["snapshot"]
+        if current is None or current.version != version:
+            _STATE["snapshot"] = _load_snapshot(version)
+            logging.info("[lighting snapshot] loaded version %s", version)
+    except Exception as ex:
+        logging.exception("[lighting snapshot] refresh failed: %s", ex)
+    finally:
+        _STATE["checked_at"] = time.time()
+        _STATE["refreshing"] = False
+    return _STATE["snapshot"]
+
+
+def _refresh_async() -> None:
+    def _job():
+        try:
+            refresh_lighting_snapshot()
+        finally:
+            # this thread owns its own DB connection; don't leak it
+            connection.close()
+
+    threading.Thread(target=_job, name="lighting_snapshot_refresh", daemon=True).start()
+
+
+def get_lighting_snapshot() -> Optional[LightingSnapshot]:
+    """
+    Return the in-memory snapshot, or None until a background load has finished.
+    Read-only: nothing here touches the DB or starts a thread (see ensure_lighting_snapshot).
+    """
+    if not getattr(settings, "LIGHTING_SNAPSHOT_ENABLED", True):
+        return None
+    return _STATE["snapshot"]
+
+
+def ensure_lighting_snapshot() -> None:
+    """
+    Trigger a non-blocking version check when the last one is older than
+    LIGHTING_SNAPSHOT_CHECK_S. Called from the route-scoring views only, so tests,
+    management commands and other importers of route_score never start the
+    refresh thread or open DB connections from it.
+    """
+    if not getattr(settings, "LIGHTING_SNAPSHOT_ENABLED", True):
+        return
+    interval = getattr(settings, "LIGHTING_SNAPSHOT_CHECK_S", LIGHTING_SNAPSHOT_CHECK_S)
+    if time.time() - _STATE["checked_at"] >= interval:
+        with _LOCK:
+            due = not _STATE["refreshing"] and time.time() - _STATE["checked_at"] >= interval
+            if due:
+                _STATE["refreshing"] = True
+        if due:
+            _refresh_async()
@@ -0,0 +1,179 @@
+# GlowWithIt/lit_mask.py
+"""
+Precomputed "lit mask" raster for constant-time lighting lookups.
+
+`build_lit_mask` rasterizes a 25 m buffer around every lamp and lit way over
+MEL_BBOX into a packed bitmap (1 bit per ~5 m pixel). The file is a small
+JSON header followed by the raw packed rows, so readers can np.memmap it
+without loading it into every worker's heap.
+"""
+from __future__ import annotations
+import json, math, os
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .geometry import M_PER_DEG_LAT
+from .lighting_index import MEL_BBOX
+
+HEADER_BYTES = 256
+FORMAT_VERSION = 1
+DEFAULT_RES_M = 5.0
+DEFAULT_RADIUS_M = 25.0
+
+
+def lit_mask_path() -> Path:
+    base = Path(getattr(settings, "DERIVED_DATA_DIR", Path(settings.BASE_DIR) / "GlowWithIt" / "derived"))
+    return Path(getattr(settings, "LIT_MASK_PATH", base / "lit_mask.bin"))
+
+
+class LitMask:
+    """
+    Packed bitmap over `bbox` (minlon, minlat, maxlon, maxlat); row 0 is the southern edge.
+    Bits are packed big-endian per row (np.packbits default).
+    """
+
+    def __init__(self, bits: np.ndarray, bbox: Sequence[float], res_m: float, width: int, meta: dict | None = None):
+        self.bits = bits
+        self.bbox = tuple(float(v) for v in bbox)
+        self.res_m = float(res_m)
+        self.width = int(width)
+        self.height = int(bits.shape[0])
+        self.meta = meta or {}
+        minlon, minlat, _, maxlat = self.bbox
+        self.lat_m = M_PER_DEG_LAT
+        self.lng_m = M_PER_DEG_LAT * math.cos(math.radians((minlat + maxlat) / 2.0))
+
+    # ---- lookups ----
+    def _pixels(self, latlng: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        minlon, minlat = self.bbox[0], self.bbox[1]
+        cols = np.floor((latlng[:, 1] - minlon) * self.lng_m / self.res_m).astype(np.int64)
+        rows = np.floor((latlng[:, 0] - minlat) * self.lat_m / self.res_m).astype(np.int64)
+        return rows, cols
+
+    def covers(self, latlng: np.ndarray) -> bool:
+        """True if every point falls inside the raster extent."""
+        latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        rows, cols = self._pixels(latlng)
+        return bool(len(latlng)) and bool(
+            (rows >= 0).all() and (rows < self.height).all() and (cols >= 0).all() and (cols < self.width).all()
+        )
+
+    def lit_flags(self, latlng: np.ndarray) -> np.ndarray:
+        """One bit lookup per point; points outside the extent read as unlit."""
+        latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        rows, cols = self._pixels(latlng)
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        out = np.zeros(len(latlng), dtype=bool)
+        r = rows[inside]; c = cols[inside]
+        out[inside] = ((self.bits[r, c >> 3] >> (7 - (c & 7))) & 1).astype(bool)
+        return out
+
+    def is_lit(self, lat: float, lng: float) -> bool:
+        return bool(self.lit_flags(np.array([[lat, lng]]))[0])
+
+    # ---- persistence ----
+    def save(self, path: Path) -> None:
+        """Atomic write: header + packed rows to .tmp, then os.replace()."""
+        header = {
+            "version": FORMAT_VERSION,
+            "bbox": list(self.bbox),
+            "res_m": self.res_m,
+            "width": self.width,
+            "height": self.height,
+            **{k: v for k, v in self.meta.items() if k not in {"version", "bbox", "res_m", "width", "height"}},
+        }
+        raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if len(raw) > HEADER_BYTES:
+            raise ValueError("lit mask header too large")
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(raw.ljust(HEADER_BYTES, b" "))
+            f.write(np.ascontiguousarray(self.bits, dtype=np.uint8).tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LitMask":
+        with open(path, "rb") as f:
+            header = json.loads(f.read(HEADER_BYTES).decode("utf-8").strip())
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported lit mask version {header.get('version')!r}")
+        width, height = int(header["width"]), int(header["height"])
+        bits = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_BYTES, shape=(height, (width + 7) // 8))
+        return cls(bits, header["bbox"], header["res_m"], width, meta=header)
+
+
+def rasterize(lamps: Iterable[Tuple[float, float]], lines: Iterable[List[Tuple[float, float]]],
+              bbox: Sequence[float] = MEL_BBOX, res_m: float = DEFAULT_RES_M,
+              radius_m: float = DEFAULT_RADIUS_M, chunk: int = 20_000) -> LitMask:
+    """
+    Burn a `radius_m` disc around every lamp, and around points spaced res_m/2
+    along every lit segment, into a boolean grid; then pack it 8 pixels per byte.
+    """
+    minlon, minlat, maxlon, maxlat = bbox
+    lat_m = M_PER_DEG_LAT
+    lng_m = M_PER_DEG_LAT * math.cos(math.radians((minlat + maxlat) / 2.0))
+    width = int(math.ceil((maxlon - minlon) * lng_m / res_m))
+    height = int(math.ceil((maxlat - minlat) * lat_m / res_m))
+    grid = np.zeros((height, width), dtype=bool)
+
+    # lat/lng points to stamp: every lamp, plus lit segments densified to res_m/2 spacing
+    pts = [np.asarray(list(lamps), dtype=float).reshape(-1, 2)]
+    step = res_m / 2.0
+    for line in lines:
+        xy = np.asarray(line, dtype=float).reshape(-1, 2)
+        if len(xy) < 2:
+            continue
+        a = xy[:-1]; b = xy[1:]
+        seg = np.hypot((b[:, 1] - a[:, 1]) * lng_m, (b[:, 0] - a[:, 0]) * lat_m)
+        n = np.maximum(1, np.ceil(seg / step).astype(np.int64))
+        owner = np.repeat(np.arange(len(n)), n)
+        t = ((np.arange(owner.size) - np.repeat(np.cumsum(n) - n, n)) / n[owner])[:, None]
+        pts.append(np.vstack([a[owner] + (b[owner] - a[owner]) * t, xy[-1:]]))
+    latlng = np.vstack(pts) if pts else np.empty((0, 2))
+
+    px = (latlng[:, 1] - minlon) * lng_m / res_m
+    py = (latlng[:, 0] - minlat) * lat_m / res_m
+    rad = radius_m / res_m
+    keep = (px >= -rad) & (px < width + rad) & (py >= -rad) & (py < height + rad)
+    px = px[keep]; py = py[keep]
+
+    k = int(math.ceil(rad)) + 1
+    oy, ox = np.mgrid[-k:k + 1, -k:k + 1]
+    ox = ox.ravel(); oy = oy.ravel()
+    for start in range(0, len(px), chunk):
+        cx = px[start:start + chunk, None]; cy = py[start:start + chunk, None]
+        cols = np.floor(cx).astype(np.int64) + ox[None, :]
+        rows = np.floor(cy).astype(np.int64) + oy[None, :]
+        # keep pixels whose centre lies inside the buffer disc
+        d2 = (cols + 0.5 - cx) ** 2 + (rows + 0.5 - cy) ** 2
+        ok = (d2 <= rad * rad) & (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        grid[rows[ok], cols[ok]] = True
+
+    return LitMask(np.packbits(grid, axis=1), bbox, res_m, width, meta={"radius_m": radius_m})
+
+
+# Process-local hot cache, keyed like views._LOCAL_JSON_CACHE by file mtime_ns and size.
+_MASK_CACHE = {"path": None, "mtime_ns": -1, "size": -1, "mask": None}
+
+
+def get_lit_mask() -> Optional[LitMask]:
+    """Return the memory-mapped lit mask, reloading it only when the file changes; None if absent."""
+    p = lit_mask_path()
+    try:
+        st = os.stat(p)
+    except OSError:
+        return None
+    if (_MASK_CACHE["path"] == p and _MASK_CACHE["mtime_ns"] == st.st_mtime_ns
+            and _MASK_CACHE["size"] == st.st_size):
+        return _MASK_CACHE["mask"]
+    try:
+        mask = LitMask.load(p)
+    except Exception:
+        mask = None
+    _MASK_CACHE.update({"path": p, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "mask": mask})
+    return mask
@@ -0,0 +1,228 @@
+import json
+import math
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from GlowWithIt import route_score
+from GlowWithIt.geometry import M_PER_DEG_LAT, encode_polyline
+from GlowWithIt.lighting_pack import PackedLighting
+from GlowWithIt.lighting_snapshot import LightingSnapshot
+from GlowWithIt.lit_mask import rasterize
+from GlowWithIt.pedestrians import SensorRegistry
+
+# fixtures are scattered over the CBD and its fringe, well inside MEL_BBOX
+FIXTURE_BBOX = (144.935, -37.830, 144.990, -37.795)
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+HOURS = ("24/7", "7:00 am - 11:00 pm", "10am-2am", "Closed", "", "9:00 AM – 5:00 PM", "Open 24 hours")
+DISRUPTION_TITLES = ("Full closure", "Lane closure", "Reduced speed", "Footpath works", "Event")
+
+
+def _random_walk(rng, n, step_m, start=None):
+    lat, lng = start if start is not None else (rng.uniform(FIXTURE_BBOX[1], FIXTURE_BBOX[3]),
+                                                rng.uniform(FIXTURE_BBOX[0], FIXTURE_BBOX[2]))
+    lng_m = M_PER_DEG_LAT * math.cos(math.radians(lat))
+    heading = rng.uniform(0, 2 * math.pi)
+    pts = [(lat, lng)]
+    for _ in range(n - 1):
+        heading += rng.normal(0, 0.35)
+        lat += step_m * math.cos(heading) / M_PER_DEG_LAT
+        lng += step_m * math.sin(heading) / lng_m
+        pts.append((lat, lng))
+    return pts
+
+
+def build_fixtures(lamps, ways, venues, disruptions, sensors, routes, seed):
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = FIXTURE_BBOX
+
+    lamp_ll = np.column_stack([rng.uniform(miny, maxy, lamps), rng.uniform(minx, maxx, lamps)])
+    lines = [_random_walk(rng, int(rng.integers(2, 7)), rng.uniform(20, 80)) for _ in range(ways)]
+    venue_rows = []
+    for i in range(venues):
+        row = {"latitude": rng.uniform(miny, maxy), "longitude": rng.uniform(minx, maxx), "name": f"venue {i}"}
+        row.update({d: HOURS[int(rng.integers(len(HOURS)))] for d in DAYS})
+        venue_rows.append(row)
+    feats = []
+    for i in range(disruptions):
+        lat, lng = rng.uniform(miny, maxy), rng.uniform(minx, maxx)
+        if i % 2:
+            geom = {"type": "LineString", "coordinates": [[b, a] for a, b in _random_walk(rng, 4, 40, (lat, lng))]}
+        else:
+            geom = {"type": "Point", "coordinates": [lng, lat]}
+        feats.append({"geometry": geom, "properties": {"title": DISRUPTION_TITLES[i % len(DISRUPTION_TITLES)]}})
+    sensor_rows = [{"lat": rng.uniform(miny, maxy), "lon": rng.uniform(minx, maxx),
+                    "count_60m": int(rng.integers(0, 1500)), "id": i + 1} for i in range(sensors)]
+    route_pts = [_random_walk(rng, int(rng.integers(40, 90)), 40.0) for _ in range(routes)]
+    return {
+        "lamps": lamp_ll, "lines": lines, "venues": venue_rows, "disruptions": feats,
+        "sensors": sensor_rows, "routes": route_pts,
+        "polylines": [encode_polyline(r) for r in route_pts],
+    }
+
+
+_WKT_NUM = re.compile(r"-?\d+(?:\.\d+)?(?:[eE]-?\d+)?")
+
+
+def _stub_query_lighting(fx):
+    """In-memory stand-in for the lighting_lamps / lighting_litways bbox queries."""
+    lamps = fx["lamps"]
+    line_boxes = np.array([[min(p[0] for p in ln), min(p[1] for p in ln), max(p[0] for p in ln), max(p[1] for p in ln)]
+                           for ln in fx["lines"]]).reshape(-1, 4)
+
+    def query(bbox_wkt):
+        xs = [float(v) for v in _WKT_NUM.findall(bbox_wkt)]
+        minx, maxx = min(xs[0::2]), max(xs[0::2]); miny, maxy = min(xs[1::2]), max(xs[1::2])
+        lm = (lamps[:, 0] >= miny) & (lamps[:, 0] <= maxy) & (lamps[:, 1] >= minx) & (lamps[:, 1] <= maxx)
+        wm = ((line_boxes[:, 2] >= miny) & (line_boxes[:, 0] <= maxy) &
+              (line_boxes[:, 3] >= minx) & (line_boxes[:, 1] <= maxx))
+        return {"lamps": [tuple(p) for p in lamps[lm].tolist()],
+                "lines": [fx["lines"][i] for i in np.flatnonzero(wm)]}
+    return query
+
+
+def _stub_live_payload(fx):
+    def build(csv_path, minutes=60, bbox=None, snapshot=None):
+        return {"generated_at": "", "minutes_window": minutes, "sensors": route_score._in_bbox(fx["sensors"], bbox)}
+    return build
+
+
+def _percentile(xs, q):
+    return float(np.percentile(np.asarray(xs), q)) if xs else 0.0
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Benchmark score_route and its components against synthetic fixtures "
+        "(N lamps, M lit ways, K venues, D disruptions) with in-memory stubs for the DB and "
+        "the pedestrian upstream (route_score.use_sources). Reports ops/sec and p50/p99, "
+        "and compares against a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lamps", type=int, default=20000, help="N lamps")
+        parser.add_argument("--ways", type=int, default=3000, help="M lit ways")
+        parser.add_argument("--venues", type=int, default=1500, help="K venues")
+        parser.add_argument("--disruptions", type=int, default=300, help="D disruption features")
+        parser.add_argument("--sensors", type=int, default=90, help="pedestrian sensors")
+        parser.add_argument("--routes", type=int, default=20, help="distinct routes to cycle through")
+        parser.add_argument("--iterations", type=int, default=200, help="timed calls per component")
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--lighting", choices=("tiles", "snapshot", "raster"), default="tiles",
+                            help="lighting source the scorer sees (default: cached DB tiles)")
+        parser.add_argument("--only", nargs="*", default=None, help="subset of components to run")
+        parser.add_argument("--baseline", default=None,
+                            help="baseline JSON (default DERIVED_DATA_DIR/bench_route_score.json)")
+        parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+        parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p50 slowdown vs baseline (0.10 = 10%%)")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **opts):
+        params = {k: opts[k] for k in ("lamps", "ways", "venues", "disruptions", "sensors", "routes", "seed", "lighting")}
+        fx = build_fixtures(opts["lamps"], opts["ways"], opts["venues"], opts["disruptions"],
+                            opts["sensors"], opts["routes"], opts["seed"])
+        self.stdout.write(self.style.NOTICE(
+            "Fixtures: {lamps} lamps, {ways} ways, {venues} venues, {disruptions} disruptions, "
+            "{sensors} sensors, {routes} routes; lighting from {lighting}".format(**params)
+        ))
+
+        routes, polylines = fx["routes"], fx["polylines"]
+        bboxes = [route_score._route_bbox(r, pad_m=800) for r in routes]
+        benches = {
+            "lighting":    lambda i: route_score._lighting_score_db(routes[i]),
+            "footfall":    lambda i: route_score._footfall_score(routes[i], 60),
+            "venues":      lambda i: route_score._venues_score(routes[i], bboxes[i]),
+            "disruptions": lambda i: route_score._disruptions_penalty(routes[i], radius_m=200),
+            "score_route": lambda i: route_score.score_route(polylines[i]),
+        }
+        if opts["only"]:
+            unknown = set(opts["only"]) - set(benches)
+            if unknown:
+                raise CommandError(f"unknown component(s): {', '.join(sorted(unknown))}")
+            benches = {k: v for k, v in benches.items() if k in opts["only"]}
+
+        results = {}
+        # scores are computed, not cached, and the fixture tiles get cache keys of their own
+        with route_score.use_sources(**self._sources(fx, opts["lighting"])):
+            for name, fn in benches.items():
+                results[name] = self._run(fn, len(routes), opts["iterations"], opts["warmup"])
+
+        baseline_path = Path(opts["baseline"] or Path(settings.DERIVED_DATA_DIR) / "bench_route_score.json")
+        baseline = None
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+            if baseline.get("params") != params:
+                self.stdout.write(self.style.WARNING(f"Baseline {baseline_path} was recorded with different fixture params."))
+
+        regressions = self._report(results, baseline, opts["tolerance"])
+
+        if opts["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = baseline_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"params": params, "results": results}, indent=2), encoding="utf-8")
+            tmp.replace(baseline_path)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+
+        if regressions and opts["fail_on_regression"]:
+            raise CommandError(f"p50 regression beyond {opts['tolerance']:.0%}: {', '.join(regressions)}")
+
+    @staticmethod
+    def _sources(fx, lighting):
+        """In-memory stand-ins for every source score_route reads (see route_score.use_sources)."""
+        registry = SensorRegistry.from_meta({s["id"]: {"name": f"sensor {s['id']}", "lat": s["lat"], "lon": s["lon"]}
+                                             for s in fx["sensors"]})
+        snap = mask = None
+        if lighting == "snapshot":
+            packed = PackedLighting.from_lists(fx["lamps"].tolist(), fx["lines"])
+            snap = LightingSnapshot(version="bench", lamps=packed.lamps, segments=packed.segments(), loaded_at=time.time())
+        elif lighting == "raster":
+            mask = rasterize(fx["lamps"].tolist(), fx["lines"])
+        return {
+            "query_lighting_db": _stub_query_lighting(fx),
+            "live_payload": _stub_live_payload(fx),
+            "sensor_registry": lambda csv_path: registry,
+            "venues": lambda bbox: route_score._in_bbox(fx["venues"], bbox, "latitude", "longitude"),
+            "disruptions": lambda: fx["disruptions"],
+            "lighting_snapshot": lambda: snap,
+            "lit_mask": lambda: mask,
+        }
+
+    @staticmethod
+    def _run(fn, n_routes, iterations, warmup):
+        for i in range(warmup):
+            fn(i % n_routes)
+        lat_ms = []
+        t_start = time.perf_counter()
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            fn(i % n_routes)
+            lat_ms.append((time.perf_counter() - t0) * 1000.0)
+        wall = time.perf_counter() - t_start
+        return {
+            "ops_s": round(iterations / wall, 1) if wall > 0 else 0.0,
+            "p50_ms": round(_percentile(lat_ms, 50), 3),
+            "p99_ms": round(_percentile(lat_ms, 99), 3),
+        }
+
+    def _report(self, results, baseline, tolerance):
+        base = (baseline or {}).get("results", {})
+        self.stdout.write(f"{'component':<12} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10}  vs baseline (p50)")
+        regressions = []
+        for name, r in results.items():
+            line = f"{name:<12} {r['ops_s']:>10.1f} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f}"
+            b = base.get(name)
+            if b and b.get("p50_ms"):
+                delta = (r["p50_ms"] - b["p50_ms"]) / b["p50_ms"]
+                line += f"  {delta:+.1%}"
+                if delta > tolerance:
+                    regressions.append(name)
+                    self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+                    continue
+            self.stdout.write(line)
+        return regressions
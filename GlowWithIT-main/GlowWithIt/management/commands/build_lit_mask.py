@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from GlowWithIt.lighting_index import MEL_BBOX
+from GlowWithIt.lit_mask import DEFAULT_RADIUS_M, DEFAULT_RES_M, lit_mask_path, rasterize
+from GlowWithIt.route_score import _bbox_to_wkt, _query_lighting_db
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Rasterize a buffer around every lighting_lamps point and lighting_litways line "
+        "over MEL_BBOX into a packed, memory-mappable bitmap used by route lighting scoring."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--res", type=float, default=DEFAULT_RES_M, help="pixel size in meters (default 5)")
+        parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS_M, help="lit buffer radius in meters (default 25)")
+        parser.add_argument("--out", default=None, help="output path (default settings.LIT_MASK_PATH / DERIVED_DATA_DIR)")
+
+    def handle(self, *args, **opts):
+        out = opts["out"] or lit_mask_path()
+
+        self.stdout.write(self.style.NOTICE("Loading lighting layer for MEL_BBOX…"))
+        lighting = _query_lighting_db(_bbox_to_wkt(*MEL_BBOX))
+        lamps, lines = lighting["lamps"], lighting["lines"]
+        self.stdout.write(f"Loaded: {len(lamps)} lamps, {len(lines)} lit ways.")
+
+        mask = rasterize(lamps, lines, bbox=MEL_BBOX, res_m=opts["res"], radius_m=opts["radius"])
+        mask.meta.update({
+            "built_at": timezone.now().isoformat(timespec="seconds"),
+            "lamps": len(lamps),
+            "lines": len(lines),
+        })
+        mask.save(out)
+
+        kb = mask.bits.nbytes / 1024.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Lit mask written to {out} ({mask.width}x{mask.height} px @ {mask.res_m} m, {kb:.0f} KiB)."
+        ))
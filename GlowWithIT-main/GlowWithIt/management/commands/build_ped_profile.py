@@ -0,0 +1,61 @@
+import csv
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from GlowWithIt.ped_profile import DEFAULT_WEEKS, build_profile, fetch_hourly_history, ped_profile_path
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Average the last few weeks of hourly pedestrian counts into a per-sensor, per-weekday, "
+        "per-hour profile that /api/ped/live and route scoring fall back to when the live counts "
+        "are slow or unavailable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--weeks", type=int, default=DEFAULT_WEEKS, help=f"weeks of history (default {DEFAULT_WEEKS})")
+        parser.add_argument("--csv", default=None,
+                            help="build from a local export (location_id, sensing_date, hourday, pedestriancount) "
+                                 "instead of fetching")
+        parser.add_argument("--out", default=None, help="output path (default settings.PED_PROFILE_PATH / DERIVED_DATA_DIR)")
+
+    def handle(self, *args, **opts):
+        out = opts["out"] or ped_profile_path()
+
+        if opts["csv"]:
+            self.stdout.write(self.style.NOTICE(f"Reading hourly counts from {opts['csv']}…"))
+            with Path(opts["csv"]).open(newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        else:
+            self.stdout.write(self.style.NOTICE(f"Fetching {opts['weeks']} weeks of hourly counts…"))
+            try:
+                rows = fetch_hourly_history(weeks=opts["weeks"])
+            except Exception as ex:
+                raise CommandError(f"history fetch failed: {ex}")
+
+        parsed = []
+        for r in rows:
+            try:
+                parsed.append((int(r["location_id"]), date.fromisoformat(str(r["sensing_date"])[:10]),
+                               int(r["hourday"]), float(r["pedestriancount"] or 0)))
+            except (KeyError, TypeError, ValueError):
+                continue
+        if not parsed:
+            raise CommandError("no usable hourly counts; profile not written")
+        self.stdout.write(f"Loaded: {len(parsed)} sensor-hours.")
+
+        profile = build_profile(parsed)
+        profile.meta.update({
+            "built_at": timezone.now().isoformat(timespec="seconds"),
+            "weeks": opts["weeks"] if not opts["csv"] else None,
+        })
+        profile.save(out)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Footfall profile written to {out} ({len(profile)} sensors, "
+            f"{profile.meta.get('first_day')} to {profile.meta.get('last_day')})."
+        ))
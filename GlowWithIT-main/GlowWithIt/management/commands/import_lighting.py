@@ -1,8 +1,10 @@
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import BaseCommand
+from django.core.management import call_command
 from django.db import connection, transaction, utils as dj_utils
 from django.utils import timezone
-from time import sleep
-import requests, json
+import json
+
+from GlowWithIt import upstream
 
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
 
@@ -156,20 +158,17 @@ class Command(BaseCommand):
         parser.add_argument("--timeout", type=int, default=180, help="Overpass timeout (sec).")
         parser.add_argument("--source", default="overpass", help="Source label stored in DB rows.")
         parser.add_argument("--retries", type=int, default=2, help="Retry count for Overpass (HTTP 429/5xx).")
-        parser.add_argument("--backoff", type=float, default=2.0, help="Backoff seconds between retries.")
+        parser.add_argument("--backoff", type=float, default=2.0,
+                            help="Base backoff seconds between retries (jittered, doubling per attempt).")
+        parser.add_argument("--skip-lit-mask", action="store_true",
+                            help="Do not rebuild the lit mask raster after importing (build_lit_mask).")
 
     #  Overpass fetch with retry mechanism
     def _fetch_overpass(self, query, timeout, retries, backoff):
-        for attempt in range(retries + 1):
-            resp = requests.post(OVERPASS_URL, data={"data": query}, timeout=timeout)
-            if resp.status_code < 500 and resp.status_code != 429:
-                resp.raise_for_status()
-                return resp.json()
-            if attempt < retries:
-                sleep(backoff * (attempt + 1))
-            else:
-                resp.raise_for_status()
-        raise CommandError("Overpass fetch failed unexpectedly.")
+        # the shared upstream client retries 429/5xx and connection errors with jittered backoff
+        resp = upstream.post(OVERPASS_URL, data={"data": query}, timeout=timeout, retries=retries, backoff_s=backoff)
+        resp.raise_for_status()
+        return resp.json()
 
     # The following three functions are Axis-aware WKT builders for describing geometry such as (points and linestring)
     def _build_point_wkt(self, lon, lat):
@@ -325,3 +324,7 @@ class Command(BaseCommand):
                 self._upsert_litway(cur, osm_id, coords, w.get("tags") or {}, opts["source"], now_dt)
 
         self.stdout.write(self.style.SUCCESS("Import complete."))
+
+        # Keep the lit mask raster used by route scoring in step with the tables
+        if not opts["skip_lit_mask"]:
+            call_command("build_lit_mask", stdout=self.stdout)
@@ -0,0 +1,44 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from GlowWithIt.ped_snapshot import poll_once, run_poller
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Poll live pedestrian counts for every sensor once a minute into the shared snapshot "
+        "read by /api/ped/live and route scoring. The web workers only see it through a shared "
+        "cache backend (Redis, memcached, database). Only the holder of the cache lease polls, so "
+        "several copies can run side by side. Use --once for a single unconditional poll (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="poll once, ignoring the lease, and exit")
+
+    def handle(self, *args, **opts):
+        backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+        if backend.endswith("LocMemCache") or backend.endswith("DummyCache"):
+            self.stderr.write(self.style.WARNING(
+                f"CACHES['default'] is {backend.rsplit('.', 1)[-1]}: the web workers won't see this snapshot."
+            ))
+        if opts["once"]:
+            try:
+                snap = poll_once()
+            except Exception as ex:
+                raise CommandError(f"poll failed: {ex}")
+            self.stdout.write(self.style.SUCCESS(
+                f"version {snap.version}: {len(snap.series.ids)} sensors, "
+                f"{snap.series.covered_minutes()} minutes covered."
+            ))
+            return
+
+        self.stdout.write(self.style.NOTICE("Polling pedestrian counts; Ctrl-C to stop."))
+        stop = threading.Event()
+        try:
+            run_poller(stop)
+        except KeyboardInterrupt:
+            stop.set()
+            self.stdout.write("Stopped.")
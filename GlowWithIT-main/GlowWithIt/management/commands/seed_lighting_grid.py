@@ -25,6 +25,7 @@ class Command(BaseCommand):
         parser.add_argument("--source", default="seed-grid")
         parser.add_argument("--retries", type=int, default=2)
         parser.add_argument("--backoff", type=float, default=2.0)
+        parser.add_argument("--skip-lit-mask", action="store_true", help="do not rebuild the lit mask raster at the end")
 
     def handle(self, *args, **opts):
         n, s, e, w = opts["n"], opts["s"], opts["e"], opts["w"]
@@ -56,7 +57,11 @@ class Command(BaseCommand):
                     "--source", opts["source"],
                     "--retries", str(opts["retries"]),
                     "--backoff", str(opts["backoff"]),
+                    "--skip-lit-mask",  # rebuilt once below, not once per tile
                 )
                 total += 1
 
         self.stdout.write(self.style.SUCCESS(f"Seed complete. Tiles imported: {total}"))
+
+        if not opts["skip_lit_mask"]:
+            call_command("build_lit_mask", stdout=self.stdout)
@@ -0,0 +1,215 @@
+# GlowWithIt/opening_hours.py
+"""
+Opening hours compiled to a weekly minute bitmap.
+
+A venue's `mon`..`sun` texts ("9:00 AM – 5:00 PM", "10am-2am", "24/7", "Closed")
+and its OSM `opening_hours_raw` ("Mo-Fr 08:00-18:00; Sa 10:00-14:00; Su off")
+compile once into a 7 x 1440-bit mask, Monday 00:00 first, held as a Python int.
+"Open now" is one bit test and "open in the next N minutes" one masked shift.
+
+A day column that parses wins over the OSM rule for that day; a day neither
+describes stays unknown and reads as None. Spans past midnight spill into the
+next day, so "10am-2am" on Friday covers Saturday 00:00-02:00 as well.
+"""
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Mapping, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+MEL_TZ = ZoneInfo("Australia/Melbourne")
+DAY_FIELDS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+_WEEK_ALL = (1 << WEEK_MINUTES) - 1
+
+PATTERN_247 = r'(?i)\b(24\s*(?:/|\-)?\s*7|24\s*h(?:ou)?rs?)\b'
+_RE_247 = re.compile(PATTERN_247)
+_RE_CLOSED = re.compile(r"\b(closed|off|by appointment)\b", re.I)
+_TIME = r"(\d{1,2})(?:[:.](\d{2}))?\s*(a\.?m\.?|p\.?m\.?)?"
+_RE_RANGE = re.compile(_TIME + r"\s*(?:-|–|—|to)\s*" + _TIME + r"|" + r"(\d{1,2}):(\d{2})\s*\+", re.I)
+
+# OSM weekday selectors: "Mo-Fr", "Sa,Su", "Fr-Mo", "Tu[1]" (nth-weekday is read as every week)
+_OSM_DAYS = {"mo": 0, "tu": 1, "we": 2, "th": 3, "fr": 4, "sa": 5, "su": 6}
+_OSM_DAY = r"(?:Mo|Tu|We|Th|Fr|Sa|Su)"
+_RE_OSM_SELECTOR = re.compile(
+    rf"^\s*((?:{_OSM_DAY}(?:\s*-\s*{_OSM_DAY})?(?:\[[^\]]*\])?|PH|SH)(?:\s*,\s*(?:{_OSM_DAY}(?:\s*-\s*{_OSM_DAY})?(?:\[[^\]]*\])?|PH|SH))*)\s*:?\s*(.*)$",
+    re.I,
+)
+# rule separators; a comma only starts an additional rule after a time ("12:00, Sa ..."), not in "Mo-Th,Su"
+_RE_OSM_SPLIT = re.compile(rf"(\s*(?:;|\|\|)\s*|(?:(?<=\d)|(?<=\+)|(?<=off))\s*,\s*(?={_OSM_DAY}\b|PH\b|SH\b))", re.I)
+_RE_OSM_UNSUPPORTED = re.compile(r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|week|easter|sunrise|sunset|dawn|dusk)\b|\d{4}", re.I)
+
+Span = Tuple[int, int]          # minutes from the day's 00:00; end may pass 1440
+
+
+def _minutes(hh: str, mm: Optional[str], ampm: Optional[str]) -> int:
+    h, m = int(hh), int(mm or 0)
+    if ampm:
+        pm = ampm.lower().startswith("p")
+        h = (h % 12) + (12 if pm else 0)
+    return h * 60 + min(m, 59)
+
+
+def _spans(text: str) -> List[Span]:
+    """Every "start-end" (or OSM "HH:MM+") range in text, as (start, end) with end > start."""
+    out: List[Span] = []
+    for m in _RE_RANGE.finditer(text):
+        if m.group(7) is not None:   # "18:00+": open end, read as until midnight
+            out.append((_minutes(m.group(7), m.group(8), None), DAY_MINUTES))
+            continue
+        h1, m1, ap1, h2, m2, ap2 = m.group(1, 2, 3, 4, 5, 6)
+        if ap2 and not ap1:
+            # "9-5pm": the start takes the end's meridiem unless that puts it after the end
+            ap1 = ap2 if _minutes(h1, m1, ap2) < _minutes(h2, m2, ap2) else "am"
+        start, end = _minutes(h1, m1, ap1), _minutes(h2, m2, ap2)
+        if not (ap1 or ap2) and not h2.startswith("0") and end < start <= 12 * 60:
+            end += 12 * 60            # "9-5": a 12-hour range without am/pm ends in the afternoon
+        if end <= start:
+            end += DAY_MINUTES        # past midnight
+        if end - start >= DAY_MINUTES or start >= DAY_MINUTES:
+            start, end = 0, DAY_MINUTES
+        out.append((start, end))
+    return out
+
+
+def parse_day_text(text: Optional[str]) -> Optional[List[Span]]:
+    """One day's hours text -> open spans ([] = closed), or None when it can't be read."""
+    if not text or not text.strip():
+        return None
+    s = text.strip()
+    if _RE_247.search(s):
+        return [(0, DAY_MINUTES)]
+    spans = _spans(s)
+    if spans:
+        return spans
+    if _RE_CLOSED.search(s):
+        return []
+    return None
+
+
+def _osm_days(selector: str) -> List[int]:
+    days: List[int] = []
+    for part in re.split(r"\s*,\s*", selector):
+        part = re.sub(r"\[[^\]]*\]", "", part).strip().lower()
+        if part in ("ph", "sh"):
+            continue                  # holidays: no calendar here
+        if "-" in part:
+            a, b = (_OSM_DAYS[p.strip()[:2]] for p in part.split("-", 1))
+            days.extend((a + i) % 7 for i in range((b - a) % 7 + 1))
+        elif part[:2] in _OSM_DAYS:
+            days.append(_OSM_DAYS[part[:2]])
+    return days
+
+
+def parse_osm(raw: Optional[str]) -> List[Optional[List[Span]]]:
+    """
+    OSM opening_hours -> spans per weekday (Mon first), None where no rule applies.
+    Rules are applied in order and a later rule replaces the days it names; rules that
+    only add (", Sa 10:00-12:00") merge in. Month, date, week and holiday-only rules are skipped.
+    """
+    days: List[Optional[List[Span]]] = [None] * 7
+    if not raw or not raw.strip():
+        return days
+    parts = _RE_OSM_SPLIT.split(raw.strip())
+    # split() keeps the separators: [rule, sep, rule, ...]; "," marks an additional rule
+    for sep, rule in zip([""] + parts[1::2], parts[0::2]):
+        if not rule.strip() or _RE_OSM_UNSUPPORTED.search(rule):
+            continue
+        m = _RE_OSM_SELECTOR.match(rule)
+        if m:
+            targets, body = _osm_days(m.group(1)), m.group(2)
+            if not targets:
+                continue
+        else:
+            targets, body = list(range(7)), rule
+        body = body.strip().strip('"')
+        if not body or body.lower() in ("open", "24/7") or _RE_247.fullmatch(body):
+            spans = [(0, DAY_MINUTES)]
+        elif re.fullmatch(r"(?i)(off|closed)(\s+\".*\")?", body):
+            spans = []
+        else:
+            spans = _spans(body)
+            if not spans:
+                continue
+        additive = sep.strip() == ","
+        for d in targets:
+            days[d] = (days[d] or []) + spans if additive else list(spans)
+    return days
+
+
+@dataclass(frozen=True)
+class OpeningHours:
+    mask: int                    # bit m set = open during minute m of the week (Mon 00:00 = 0)
+    known: Tuple[bool, ...]      # per weekday: described by a column or an OSM rule
+
+    @classmethod
+    def from_days(cls, days: Sequence[Optional[List[Span]]]) -> "OpeningHours":
+        mask = 0
+        for d, spans in enumerate(days):
+            for start, end in spans or ():
+                lo = d * DAY_MINUTES + start
+                hi = min(d * DAY_MINUTES + end, lo + WEEK_MINUTES)
+                bits = ((1 << (hi - lo)) - 1) << lo
+                mask |= (bits | (bits >> WEEK_MINUTES)) & _WEEK_ALL   # Sunday night wraps to Monday
+        return cls(mask=mask, known=tuple(spans is not None for spans in days))
+
+    @property
+    def is_247(self) -> bool:
+        """Every described day is open all day (and at least one day is described)."""
+        if not any(self.known):
+            return False
+        return all(((self.mask >> (d * DAY_MINUTES)) & ((1 << DAY_MINUTES) - 1)) == (1 << DAY_MINUTES) - 1
+                   for d, k in enumerate(self.known) if k)
+
+    @staticmethod
+    def minute_of_week(when: datetime | int | None = None) -> int:
+        """Minute of the week (Mon 00:00 = 0); an int is taken as already computed."""
+        if isinstance(when, int):
+            return when % WEEK_MINUTES
+        if when is None:
+            when = datetime.now(MEL_TZ)
+        elif when.tzinfo is not None:
+            when = when.astimezone(MEL_TZ)    # naive datetimes are taken as Melbourne time
+        return when.weekday() * DAY_MINUTES + when.hour * 60 + when.minute
+
+    def is_open(self, when: datetime | int | None = None) -> Optional[bool]:
+        """True / False, or None when that day's hours are unknown."""
+        m = self.minute_of_week(when)
+        if (self.mask >> m) & 1:
+            return True
+        return False if self.known[m // DAY_MINUTES] else None
+
+    def open_within(self, when: datetime | int | None = None, minutes: int = 30) -> Optional[bool]:
+        """Open at any minute of [when, when + minutes); None if closed so far as known but a day is unknown."""
+        m = self.minute_of_week(when)
+        n = max(1, min(int(minutes), WEEK_MINUTES))
+        if (self.mask >> m) & ((1 << n) - 1):
+            return True
+        over = m + n - WEEK_MINUTES           # window runs past Sunday night into Monday
+        if over > 0 and self.mask & ((1 << over) - 1):
+            return True
+        first, last = m // DAY_MINUTES, (m + n - 1) // DAY_MINUTES
+        return False if all(self.known[d % 7] for d in range(first, last + 1)) else None
+
+
+@lru_cache(maxsize=16384)
+def _compile(raw: Optional[str], day_texts: Tuple[Optional[str], ...]) -> OpeningHours:
+    osm = parse_osm(raw)
+    days = []
+    for d, text in enumerate(day_texts):
+        spans = parse_day_text(text)
+        days.append(spans if spans is not None else osm[d])
+    return OpeningHours.from_days(days)
+
+
+def compile_hours(row: Mapping | object) -> OpeningHours:
+    """
+    The compiled hours of a VenueCBD row (model instance or .values() dict). Cached on the
+    row's hours texts, so every row with the same hours, or an unchanged row, compiles once.
+    """
+    if isinstance(row, Mapping):
+        return _compile(row.get("opening_hours_raw"), tuple(map(row.get, DAY_FIELDS)))
+    return _compile(getattr(row, "opening_hours_raw", None), tuple(getattr(row, d, None) for d in DAY_FIELDS))
@@ -0,0 +1,176 @@
+# GlowWithIt/ped_profile.py
+"""
+Typical footfall per sensor, weekday and hour, for when the live counts can't be had.
+
+`build_ped_profile` averages the hourly counts of the last few weeks into a
+(sensors, 7, 24) table of counts per hour, stored as a small JSON header, the
+sensor ids (int32) and the table (uint16), so readers can np.memmap it.
+When the live endpoint errors or misses PED_LIVE_DEADLINE_S, pedestrians answers
+from the profile straight away instead of retrying upstream; ped_snapshot uses it
+while there is no snapshot at all.
+"""
+from __future__ import annotations
+import json, os
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+
+from . import upstream
+
+MEL_TZ = ZoneInfo("Australia/Melbourne")
+HISTORY_ENDPOINT = (
+    "https://data.melbourne.vic.gov.au/api/explore/v2.1/catalog/datasets/"
+    "pedestrian-counting-system-monthly-counts-per-hour/exports/json"
+)
+
+HEADER_BYTES = 256
+FORMAT_VERSION = 1
+DEFAULT_WEEKS = 8
+PED_LIVE_DEADLINE_S = 4.0   # request-path budget for the live fetch once a profile exists
+
+
+def ped_profile_path() -> Path:
+    base = Path(getattr(settings, "DERIVED_DATA_DIR", Path(settings.BASE_DIR) / "GlowWithIt" / "derived"))
+    return Path(getattr(settings, "PED_PROFILE_PATH", base / "ped_profile.bin"))
+
+
+class FootfallProfile:
+    """Mean count per hour for sensor ids[i] on weekday d (Mon=0) at local hour h: hourly[i, d, h]."""
+
+    def __init__(self, ids: np.ndarray, hourly: np.ndarray, meta: dict | None = None):
+        self.ids = ids
+        self.hourly = hourly
+        self.meta = meta or {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def describe(self) -> dict:
+        return {k: self.meta.get(k) for k in ("built_at", "weeks", "first_day", "last_day")}
+
+    def expected(self, minutes: int = 60, now: Optional[datetime] = None) -> np.ndarray:
+        """Expected per-sensor totals over the `minutes` before `now` (aligned with .ids)."""
+        end = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).replace(second=0, microsecond=0)
+        # whole weeks put one hour on every (weekday, hour) slot; the rest is the most recent part
+        weeks, left = divmod(max(0, int(minutes)), 7 * 24 * 60)
+        weights = np.full((7, 24), float(weeks))
+        # Melbourne's UTC offsets are whole hours, so each UTC hour is one local slot: walk back
+        # an hour at a time, the partial hours at either end carrying just their minutes
+        t = end
+        while left > 0:
+            take = min(left, t.minute or 60)
+            local = (t - timedelta(minutes=1)).astimezone(MEL_TZ)
+            weights[local.weekday(), local.hour] += take / 60.0
+            t -= timedelta(minutes=take)
+            left -= take
+        return self.hourly.reshape(len(self.ids), 7 * 24).astype(float) @ weights.ravel()
+
+    def counts(self, minutes: int = 60, now: Optional[datetime] = None) -> List[dict]:
+        """expected() in the shape of pedestrians.fetch_live_counts() rows."""
+        sums = self.expected(minutes, now)
+        return [{"location_id": int(lid), "pedestriancount": int(round(c))}
+                for lid, c in zip(self.ids.tolist(), sums.tolist())]
+
+    # ---- persistence ----
+    def save(self, path: Path) -> None:
+        """Atomic write: header + ids + table to .tmp, then os.replace()."""
+        header = {
+            "version": FORMAT_VERSION,
+            "sensors": len(self.ids),
+            **{k: v for k, v in self.meta.items() if k not in {"version", "sensors"}},
+        }
+        raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if len(raw) > HEADER_BYTES:
+            raise ValueError("ped profile header too large")
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(raw.ljust(HEADER_BYTES, b" "))
+            f.write(np.ascontiguousarray(self.ids, dtype="<i4").tobytes())
+            f.write(np.ascontiguousarray(self.hourly, dtype="<u2").tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FootfallProfile":
+        with open(path, "rb") as f:
+            header = json.loads(f.read(HEADER_BYTES).decode("utf-8").strip())
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported ped profile version {header.get('version')!r}")
+        n = int(header["sensors"])
+        ids = np.memmap(path, dtype="<i4", mode="r", offset=HEADER_BYTES, shape=(n,)) if n else np.empty(0, "<i4")
+        hourly = (np.memmap(path, dtype="<u2", mode="r", offset=HEADER_BYTES + 4 * n, shape=(n, 7, 24))
+                  if n else np.empty((0, 7, 24), "<u2"))
+        return cls(ids, hourly, meta=header)
+
+
+def build_profile(rows: Iterable[Tuple[int, date | str, int, float]]) -> FootfallProfile:
+    """
+    Average (location_id, sensing_date, hourday, count) rows into a profile. Each
+    (sensor, weekday, hour) slot is the mean over the days it was observed.
+    """
+    lids, days, hours, counts = [], [], [], []
+    for lid, day, hour, count in rows:
+        d = day if isinstance(day, date) else date.fromisoformat(str(day)[:10])
+        lids.append(int(lid)); days.append(d); hours.append(int(hour)); counts.append(float(count or 0.0))
+    ids, row = np.unique(np.asarray(lids, dtype=np.int64), return_inverse=True)
+    sums = np.zeros((len(ids), 7, 24))
+    seen = np.zeros((len(ids), 7, 24))
+    if lids:
+        wd = np.fromiter((d.weekday() for d in days), dtype=np.intp, count=len(days))
+        hr = np.clip(np.asarray(hours, dtype=np.intp), 0, 23)
+        np.add.at(sums, (row, wd, hr), counts)
+        np.add.at(seen, (row, wd, hr), 1.0)
+    mean = np.divide(sums, seen, out=np.zeros_like(sums), where=seen > 0)
+    meta = {"first_day": min(days).isoformat(), "last_day": max(days).isoformat()} if days else {}
+    return FootfallProfile(ids.astype(np.int32), np.clip(np.rint(mean), 0, 65535).astype(np.uint16), meta=meta)
+
+
+def fetch_hourly_history(weeks: int = DEFAULT_WEEKS, timeout: int = 120) -> List[dict]:
+    """
+    Hourly counts per sensor for the last `weeks` full weeks (exports endpoint: no row limit).
+    Returns: [{'location_id': int, 'sensing_date': 'YYYY-MM-DD', 'hourday': int, 'pedestriancount': int}, ...]
+    """
+    today = datetime.now(MEL_TZ).date()
+    start = today - timedelta(weeks=int(weeks))
+    params = {
+        "select": "location_id, sensing_date, hourday, sum(pedestriancount) as pedestriancount",
+        "where": f"sensing_date >= date'{start.isoformat()}' AND sensing_date < date'{today.isoformat()}'",
+        "group_by": "location_id, sensing_date, hourday",
+        "limit": -1,
+    }
+    r = upstream.get(HISTORY_ENDPOINT, params=params, timeout=timeout, deadline_s=timeout * 2)
+    r.raise_for_status()
+    return r.json()
+
+
+_PROFILE_CACHE = {"path": None, "mtime_ns": -1, "size": -1, "profile": None}
+
+
+def get_ped_profile() -> Optional[FootfallProfile]:
+    """Return the memory-mapped profile, reloading it only when the file changes; None if absent."""
+    p = ped_profile_path()
+    try:
+        st = os.stat(p)
+    except OSError:
+        return None
+    if (_PROFILE_CACHE["path"] == p and _PROFILE_CACHE["mtime_ns"] == st.st_mtime_ns
+            and _PROFILE_CACHE["size"] == st.st_size):
+        return _PROFILE_CACHE["profile"]
+    try:
+        profile = FootfallProfile.load(p)
+    except Exception:
+        profile = None
+    _PROFILE_CACHE.update({"path": p, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "profile": profile})
+    return profile
+
+
+def live_deadline_s(default: float) -> float:
+    """How long a request may wait on the live counts: short once a profile can stand in."""
+    if get_ped_profile() is None:
+        return default
+    return min(default, getattr(settings, "PED_LIVE_DEADLINE_S", PED_LIVE_DEADLINE_S))
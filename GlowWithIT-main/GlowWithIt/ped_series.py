@@ -0,0 +1,124 @@
+# GlowWithIt/ped_series.py
+"""
+Rolling per-sensor, per-minute pedestrian counts.
+
+A MinuteSeries is a NumPy ring of `capacity` one-minute slots per sensor, fed
+with the per-minute rows of the "past hour counts per minute" dataset. Any
+window ending at the newest minute (15, 30, 60, 120, ...) is two lookups in
+cumulative sums along the time axis, so every `minutes` value is served from
+the same data instead of its own upstream aggregation query.
+"""
+from __future__ import annotations
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+PED_SERIES_MINUTES = 180
+
+
+def minute_of(ts: str | datetime) -> int:
+    """Epoch minute of an ISO timestamp (the dataset's sensing_datetime) or a datetime."""
+    dt = ts if isinstance(ts, datetime) else datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    return int(dt.timestamp() // 60)
+
+
+class MinuteSeries:
+
+    def __init__(self, capacity: int = PED_SERIES_MINUTES):
+        self.capacity = int(capacity)
+        self.ids = np.empty(0, dtype=np.int64)                  # row -> location_id
+        self.counts = np.zeros((0, self.capacity), dtype=np.int32)
+        self.filled = np.zeros(self.capacity, dtype=bool)       # slot was covered by a fetch
+        self.head: Optional[int] = None                         # epoch minute of the newest slot
+        self._rows: Dict[int, int] = {}
+        self._prefix: Optional[np.ndarray] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_prefix"] = None  # derived; rebuilt on first window query
+        return state
+
+    # ---- writes ----
+    def _advance(self, minute: int) -> None:
+        if self.head is None:
+            self.head = minute
+            return
+        gap = minute - self.head
+        if gap <= 0:
+            return
+        if gap >= self.capacity:
+            self.counts[:] = 0
+            self.filled[:] = False
+        else:
+            slots = (self.head + 1 + np.arange(gap)) % self.capacity
+            self.counts[:, slots] = 0
+            self.filled[slots] = False
+        self.head = minute
+
+    def _rows_of(self, location_ids: List[int]) -> np.ndarray:
+        new = [lid for lid in dict.fromkeys(location_ids) if lid not in self._rows]
+        if new:
+            for lid in new:
+                self._rows[lid] = len(self._rows)
+            self.ids = np.concatenate([self.ids, np.asarray(new, dtype=np.int64)])
+            self.counts = np.vstack([self.counts, np.zeros((len(new), self.capacity), dtype=np.int32)])
+        return np.fromiter((self._rows[lid] for lid in location_ids), dtype=np.intp, count=len(location_ids))
+
+    def ingest(self, rows: Iterable[Tuple[int, int, int]], end_minute: int, span: int) -> None:
+        """
+        Store (location_id, epoch_minute, count) rows from a fetch of the `span` minutes
+        ending at `end_minute`. Only minutes up to the newest row returned count as covered
+        (minutes there without a row are zero): later ones may not be published yet, and the
+        next fetch starts again from the newest. Rows already in the ring are overwritten,
+        so overlapping fetches pick up late data.
+        """
+        rows = [(int(lid), int(m), int(c)) for lid, m, c in rows if end_minute - span < int(m) <= end_minute]
+        if not rows:
+            return
+        newest = max(m for _, m, _ in rows)
+        self._advance(newest)
+        first = max(end_minute - span + 1, self.head - self.capacity + 1)
+        covered = np.arange(first, newest + 1) % self.capacity
+        kept = [r for r in rows if first <= r[1]]
+        self.counts[:, covered] = 0
+        if kept:
+            lids, minutes, counts = zip(*kept)
+            at = self._rows_of(list(lids))  # may grow self.counts
+            self.counts[at, np.asarray(minutes) % self.capacity] = counts
+        self.filled[covered] = True
+        self._prefix = None
+
+    # ---- reads ----
+    def _chronological(self) -> np.ndarray:
+        """Slot order from oldest to newest minute."""
+        return (self.head - np.arange(self.capacity)[::-1]) % self.capacity
+
+    def _prefix_sums(self) -> np.ndarray:
+        if self._prefix is None:
+            chrono = self.counts[:, self._chronological()].astype(np.int64)
+            self._prefix = np.concatenate([np.zeros((len(self.ids), 1), dtype=np.int64),
+                                           np.cumsum(chrono, axis=1)], axis=1)
+        return self._prefix
+
+    def covered_minutes(self) -> int:
+        """How many consecutive minutes back from the newest one have been fetched."""
+        if self.head is None:
+            return 0
+        missing = np.flatnonzero(~self.filled[self._chronological()][::-1])
+        return int(missing[0]) if len(missing) else self.capacity
+
+    def covers(self, minutes: int) -> bool:
+        return 0 < minutes <= self.covered_minutes()
+
+    def window(self, minutes: int) -> np.ndarray:
+        """Per-sensor totals over the `minutes` ending at the newest minute (aligned with .ids)."""
+        minutes = max(0, min(int(minutes), self.capacity))
+        cs = self._prefix_sums()
+        return cs[:, -1] - cs[:, -1 - minutes]
+
+    def count_rows(self, minutes: int) -> List[dict]:
+        """window() in the shape of pedestrians.fetch_live_counts() rows."""
+        sums = self.window(minutes)
+        order = np.argsort(self.ids, kind="stable")
+        return [{"location_id": int(self.ids[i]), "pedestriancount": int(sums[i])} for i in order.tolist()]
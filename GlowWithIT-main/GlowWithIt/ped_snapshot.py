@@ -0,0 +1,252 @@
+# GlowWithIt/ped_snapshot.py
+"""
+Live pedestrian counts for every sensor, polled from the City of Melbourne
+endpoint once a minute into a versioned snapshot held in the Django cache.
+
+The snapshot is a per-sensor, per-minute MinuteSeries (ped_series) fed from the
+counts-per-minute dataset: each poll fetches only the minutes since the last one
+(plus PED_SERIES_OVERLAP_MIN for late rows), and every `minutes` window is summed
+locally from the series, so one upstream query and one cache entry serve all of them.
+The dataset keeps the past hour; longer windows fill in as the series accumulates.
+
+One process polls at a time: the holder of the PED_POLL_LOCK lease (cache.add
+with a timeout, renewed every round) fetches, everyone else only reads. With a
+shared cache backend, run the poller as `manage.py poll_pedestrians` next to the
+web workers. The in-process daemon thread (PED_POLLER_THREAD) is off by default:
+every process that touched footfall would start one, and with the default
+per-process LocMemCache each would win its own lease. Without a poller the
+snapshot is refreshed on demand, as below.
+
+Request paths go through live_payload(), which joins the snapshot with the
+sensor registry and never calls the upstream. A snapshot older than
+PED_SNAPSHOT_MAX_AGE_S is still served, marked stale and with its age, and a
+one-off refresh is started in the background (at most one per
+PED_POLL_INTERVAL_S for everything sharing the cache). Without any snapshot the
+weekday/hour profile from `manage.py build_ped_profile` answers; without that
+either, PedUnavailable is raised and the views answer 503.
+"""
+from __future__ import annotations
+import logging, os, socket, threading, time, uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .footfall_surface import FootfallSurface, build_surface
+from .ped_profile import get_ped_profile
+from .ped_series import PED_SERIES_MINUTES, MinuteSeries, minute_of
+from .pedestrians import build_live_payload, fetch_minute_counts
+
+PED_POLL_INTERVAL_S = 60
+PED_SNAPSHOT_MAX_AGE_S = 180      # older snapshots are served as stale and refreshed in the background
+PED_FETCH_MINUTES = 60            # the dataset only keeps the past hour
+PED_SERIES_OVERLAP_MIN = 5        # minutes re-fetched each poll to pick up late rows
+PED_POLL_LOCK = "ped_poller:leader"
+PED_SNAPSHOT_KEY = "ped_snapshot:v2"
+PED_REFRESH_CLAIM = "ped_snapshot:refreshing"
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class PedUnavailable(Exception):
+    """No snapshot, not even a stale one, and no footfall profile to stand in."""
+
+
+@dataclass(frozen=True)
+class PedSnapshot:
+    version: int            # +1 per refresh
+    fetched_at: float       # epoch seconds
+    series: MinuteSeries    # per-sensor, per-minute counts up to the fetch
+
+    def age_s(self, now: Optional[float] = None) -> float:
+        return max(0.0, (time.time() if now is None else now) - self.fetched_at)
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return self.age_s(now) > _setting("PED_SNAPSHOT_MAX_AGE_S", PED_SNAPSHOT_MAX_AGE_S)
+
+    def minutes_covered(self, minutes: int) -> int:
+        """How much of a `minutes` window the series holds, i.e. what counts(minutes) sums over."""
+        return min(int(minutes), self.series.covered_minutes())
+
+    def counts(self, minutes: int) -> List[dict]:
+        """fetch_live_counts() rows for the last `minutes`, or as much of them as the series holds."""
+        return self.series.count_rows(self.minutes_covered(minutes))
+
+    def describe(self, minutes: Optional[int] = None) -> dict:
+        out = {"version": self.version, "fetched_at": round(self.fetched_at, 3), "age_s": round(self.age_s(), 1),
+               "stale": self.is_stale()}
+        if minutes is not None:
+            out["minutes_covered"] = self.minutes_covered(minutes)
+        return out
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# ---- leader election ----
+def acquire_leadership(owner: str = _OWNER) -> bool:
+    """Take or renew the poller lease. cache.add is atomic, so only one owner wins a free lease."""
+    lease = int(_setting("PED_POLL_INTERVAL_S", PED_POLL_INTERVAL_S) * 1.5) + 1
+    if cache.add(PED_POLL_LOCK, owner, timeout=lease):
+        return True
+    if cache.get(PED_POLL_LOCK) == owner:
+        cache.touch(PED_POLL_LOCK, timeout=lease)
+        return True
+    return False
+
+def release_leadership(owner: str = _OWNER) -> None:
+    if cache.get(PED_POLL_LOCK) == owner:
+        cache.delete(PED_POLL_LOCK)
+
+
+# ---- polling ----
+def refresh_snapshot(timeout: float = 20) -> PedSnapshot:
+    """Fetch the minutes since the last refresh for all sensors and publish. Blocking; raises on upstream errors."""
+    prev = cache.get(PED_SNAPSHOT_KEY)
+    series = prev.series if prev else MinuteSeries(_setting("PED_SERIES_MINUTES", PED_SERIES_MINUTES))
+    now = time.time()
+    end = int(now // 60)
+    span = _setting("PED_FETCH_MINUTES", PED_FETCH_MINUTES)
+    if series.head is not None:
+        span = max(1, min(span, end - series.head + _setting("PED_SERIES_OVERLAP_MIN", PED_SERIES_OVERLAP_MIN)))
+    rows = fetch_minute_counts(minutes=span, timeout=timeout)
+    series.ingest(((r["location_id"], minute_of(r["sensing_datetime"]), r["pedestriancount"]) for r in rows),
+                  end_minute=end, span=span)
+    snap = PedSnapshot(version=prev.version + 1 if prev else 1, fetched_at=now, series=series)
+    # kept a while past max_age: served as stale through short outages, and the older minutes survive
+    timeout = _setting("PED_SNAPSHOT_MAX_AGE_S", PED_SNAPSHOT_MAX_AGE_S) * 10
+    cache.set(PED_SNAPSHOT_KEY, snap, timeout=timeout)
+    cache.set(f"{PED_SNAPSHOT_KEY}:version", (snap.version, snap.fetched_at), timeout=timeout)
+    _LOCAL["snap"] = snap
+    return snap
+
+def poll_once() -> PedSnapshot:
+    return refresh_snapshot()
+
+def run_poller(stop: threading.Event, owner: str = _OWNER) -> None:
+    """Poll every PED_POLL_INTERVAL_S while holding the lease, until `stop` is set."""
+    try:
+        while not stop.is_set():
+            t0 = time.monotonic()
+            if acquire_leadership(owner):
+                try:
+                    snap = poll_once()
+                    logging.debug("[ped snapshot] v%s: %d sensors, %d min covered",
+                                  snap.version, len(snap.series.ids), snap.series.covered_minutes())
+                except Exception as ex:
+                    logging.warning("[ped snapshot] poll failed: %s", ex)
+            interval = _setting("PED_POLL_INTERVAL_S", PED_POLL_INTERVAL_S)
+            stop.wait(max(1.0, interval - (time.monotonic() - t0)))
+    finally:
+        release_leadership(owner)
+
+
+_STATE = {"thread": None, "refresh": None}
+_LOCK = threading.Lock()
+_FETCH_LOCK = threading.Lock()   # one background refresh per process at a time
+_LOCAL = {"snap": None}          # last snapshot seen here, with its prefix sums built
+_SURFACES: dict = {}             # covered minutes -> (snapshot version, fetched_at, FootfallSurface)
+PED_SURFACE_CACHE_SIZE = 4       # full-city grids (~2 MB each) kept per process; oldest built goes first
+_SURFACE_LOCK = threading.Lock()
+
+def ensure_poller() -> None:
+    """Start this worker's poller thread once (it only polls while it holds the lease)."""
+    if _STATE["thread"] is not None and _STATE["thread"].is_alive():
+        return
+    with _LOCK:
+        if _STATE["thread"] is None or not _STATE["thread"].is_alive():
+            t = threading.Thread(target=run_poller, args=(threading.Event(),), name="ped_poller", daemon=True)
+            t.start()
+            _STATE["thread"] = t
+
+def _refresh_job() -> None:
+    if not _FETCH_LOCK.acquire(blocking=False):
+        return
+    try:
+        refresh_snapshot()
+    except Exception as ex:
+        logging.warning("[ped snapshot] background refresh failed: %s", ex)
+    finally:
+        _FETCH_LOCK.release()
+
+def request_refresh() -> Optional[threading.Thread]:
+    """
+    Refresh the snapshot in a background thread, unless a refresh was claimed in the last
+    PED_POLL_INTERVAL_S by anyone sharing the cache. The claim is left to expire rather
+    than released, so an upstream outage costs one attempt per interval, not one per request.
+    """
+    claim = int(_setting("PED_POLL_INTERVAL_S", PED_POLL_INTERVAL_S))
+    if not cache.add(PED_REFRESH_CLAIM, _OWNER, timeout=claim):
+        return None
+    t = threading.Thread(target=_refresh_job, name="ped_snapshot_refresh", daemon=True)
+    t.start()
+    _STATE["refresh"] = t
+    return t
+
+
+# ---- request path ----
+def get_ped_snapshot() -> Optional[PedSnapshot]:
+    """
+    The latest snapshot however old (see PedSnapshot.is_stale), or None if there is none.
+    Never calls the upstream: a missing or stale snapshot only starts a background refresh.
+    """
+    if _setting("PED_POLLER_THREAD", False):
+        ensure_poller()
+    snap = _LOCAL["snap"]
+    # a tiny key decides whether the series has to be unpickled again
+    if snap is None or cache.get(f"{PED_SNAPSHOT_KEY}:version") != (snap.version, snap.fetched_at):
+        snap = _LOCAL["snap"] = cache.get(PED_SNAPSHOT_KEY)
+    if snap is None or snap.is_stale():
+        request_refresh()
+    return snap
+
+def live_payload(csv_path: Path, minutes: int = 60, bbox=None, snapshot: Optional[PedSnapshot] = None) -> dict:
+    """
+    build_live_payload() for bbox from the city-wide snapshot, with a "snapshot" block
+    (version, fetched_at, age_s, stale, minutes_covered). Never waits on the upstream:
+    a stale snapshot is served as it is. Without any snapshot the weekday/hour profile
+    answers ("source": "profile", "snapshot": None); without a profile either,
+    raises PedUnavailable.
+    """
+    snap = snapshot or get_ped_snapshot()
+    if snap is None:
+        profile = get_ped_profile()
+        if profile is None:
+            raise PedUnavailable("no pedestrian snapshot yet and no footfall profile (manage.py build_ped_profile)")
+        payload = build_live_payload(csv_path, minutes=minutes, bbox=bbox, counts=profile.counts(minutes))
+        return {**payload, "source": "profile", "profile": profile.describe(), "snapshot": None}
+    # report the window the counts really cover: a young series holds less than 120 minutes
+    payload = build_live_payload(csv_path, minutes=snap.minutes_covered(minutes), bbox=bbox, counts=snap.counts(minutes))
+    payload["snapshot"] = snap.describe(minutes)
+    return payload
+
+def footfall_surface(csv_path: Path, minutes: int = 60,
+                     snapshot: Optional[PedSnapshot] = None) -> Optional[FootfallSurface]:
+    """
+    The interpolated footfall grid (footfall_surface) for `minutes` of the current snapshot,
+    built once per snapshot version and window in this process. None without a snapshot.
+    Windows are clamped to the series and keyed by the minutes actually covered, so every
+    `minutes` past what the series holds shares one grid.
+    """
+    snap = snapshot or get_ped_snapshot()
+    if snap is None:
+        return None
+    window = snap.minutes_covered(max(1, min(int(minutes), _setting("PED_SERIES_MINUTES", PED_SERIES_MINUTES))))
+    key = (snap.version, snap.fetched_at)
+    hit = _SURFACES.get(window)
+    if hit is not None and hit[:2] == key:
+        return hit[2]
+    with _SURFACE_LOCK:
+        hit = _SURFACES.get(window)
+        if hit is not None and hit[:2] == key:
+            return hit[2]
+        sensors = build_live_payload(csv_path, minutes=window, counts=snap.counts(window))["sensors"]
+        surface = build_surface(sensors, meta={**snap.describe(window), "minutes": window})
+        _SURFACES.pop(window, None)
+        _SURFACES[window] = (*key, surface)
+        while len(_SURFACES) > _setting("PED_SURFACE_CACHE_SIZE", PED_SURFACE_CACHE_SIZE):
+            _SURFACES.pop(next(iter(_SURFACES)))
+        return surface
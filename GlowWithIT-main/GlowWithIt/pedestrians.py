@@ -1,10 +1,17 @@
 # core/pedestrians.py
 from __future__ import annotations
-import csv, json, math, time
+import csv, json, math, os, threading, time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+import numpy as np
 import requests
 
+from . import upstream
+from .geometry import PointGrid
+from .ped_profile import get_ped_profile, live_deadline_s
+
 OD_ENDPOINT = (
     "https://data.melbourne.vic.gov.au/api/explore/v2.1/catalog/datasets/"
     "pedestrian-counting-system-past-hour-counts-per-minute/records"
@@ -33,7 +40,24 @@ def fetch_live_counts(
         "order_by": "location_id",
         "limit": 50000,
     }
-    r = requests.get(OD_ENDPOINT, params=params, timeout=timeout)
+    # pooled keep-alive session with retries; `timeout` bounds the whole call
+    r = upstream.get(OD_ENDPOINT, params=params, timeout=timeout, deadline_s=timeout)
+    r.raise_for_status()
+    return r.json().get("results", [])
+
+def fetch_minute_counts(minutes: int = 60, timeout: int = 20) -> List[dict]:
+    """
+    Per-sensor, per-minute counts for the last `minutes` (the dataset keeps the past hour).
+    Returns: [{'location_id': int, 'sensing_datetime': str (ISO), 'pedestriancount': int}, ...]
+    """
+    params = {
+        "select": "location_id, sensing_datetime, sum(total_of_directions) as pedestriancount",
+        "where": f"sensing_datetime >= now(minutes=-{minutes})",
+        "group_by": "location_id, sensing_datetime",
+        "order_by": "sensing_datetime",
+        "limit": 50000,
+    }
+    r = upstream.get(OD_ENDPOINT, params=params, timeout=timeout, deadline_s=timeout)
     r.raise_for_status()
     return r.json().get("results", [])
 
@@ -61,7 +85,63 @@ def load_sensor_metadata(csv_path: Path) -> Dict[int, dict]:
             meta[lid] = {"name": name, "lat": lat, "lon": lon, "status": status}
     return meta
 
-def join_counts_with_metadata(count_rows: List[dict], meta: Dict[int, dict]) -> List[dict]:
+# sensors are a few hundred meters apart in the CBD; 250 m cells keep nearest lookups to a ring or two
+SENSOR_GRID_CELL_M = 250.0
+
+@dataclass(frozen=True)
+class SensorRegistry:
+    """
+    Read-only sensor metadata for one version of the locations CSV. `meta` is the
+    load_sensor_metadata() mapping; ids/lat/lon hold the same sensors, in file order,
+    as arrays for vectorized bbox masks, and `grid` indexes them for nearest-sensor lookups.
+    Shared by every request in the worker: don't mutate.
+    """
+    meta: Mapping[int, dict]
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    grid: PointGrid
+
+    @classmethod
+    def from_meta(cls, meta: Dict[int, dict]) -> "SensorRegistry":
+        rows = [(lid, m["lat"], m["lon"]) for lid, m in meta.items()
+                if m.get("lat") is not None and m.get("lon") is not None]
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        lat = np.array([r[1] for r in rows], dtype=float)
+        lon = np.array([r[2] for r in rows], dtype=float)
+        for a in (ids, lat, lon):
+            a.setflags(write=False)
+        grid = PointGrid(np.column_stack([lat, lon]), cell_m=SENSOR_GRID_CELL_M)
+        return cls(meta=MappingProxyType(dict(meta)), ids=ids, lat=lat, lon=lon, grid=grid)
+
+    def ids_in_bbox(self, bbox: tuple[float,float,float,float]) -> list[int]:
+        minlon, minlat, maxlon, maxlat = bbox
+        mask = (self.lat >= minlat) & (self.lat <= maxlat) & (self.lon >= minlon) & (self.lon <= maxlon)
+        return self.ids[mask].tolist()
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_m: float = math.inf) -> List[tuple[int, float]]:
+        """[(location_id, meters), ...] for up to k sensors nearest to (lat, lon), closest first."""
+        idx, dist = self.grid.nearest(lat, lon, k=k, max_m=max_m)
+        return [(int(self.ids[i]), float(d)) for i, d in zip(idx.tolist(), dist.tolist())]
+
+
+# Process-local registry, reloaded only when the CSV's mtime_ns or size changes (see lit_mask._MASK_CACHE).
+_REGISTRY_CACHE = {"path": None, "mtime_ns": -1, "size": -1, "registry": None}
+_REGISTRY_LOCK = threading.Lock()
+
+def get_sensor_registry(csv_path: Path) -> SensorRegistry:
+    """The sensor registry for csv_path, parsed once per worker and per file version."""
+    p = str(csv_path)
+    st = os.stat(p)
+    with _REGISTRY_LOCK:
+        if (_REGISTRY_CACHE["path"] == p and _REGISTRY_CACHE["mtime_ns"] == st.st_mtime_ns
+                and _REGISTRY_CACHE["size"] == st.st_size):
+            return _REGISTRY_CACHE["registry"]
+        registry = SensorRegistry.from_meta(load_sensor_metadata(Path(p)))
+        _REGISTRY_CACHE.update({"path": p, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "registry": registry})
+        return registry
+
+def join_counts_with_metadata(count_rows: List[dict], meta: Mapping[int, dict]) -> List[dict]:
     """
     Merge live counts with metadata; drop sensors without coords or inactive status.
     Output per sensor: {id,name,lat,lon,count_60m}
@@ -107,43 +187,54 @@ def add_footfall_score(sensors: List[dict]) -> List[dict]:
         s["footfall_score"] = float(max(0.0, min(1.0, raw)))
     return sensors
 
-def sensor_ids_in_bbox(meta: Dict[int, dict], bbox: Optional[tuple[float,float,float,float]]) -> Optional[list[int]]:
+def sensor_ids_in_bbox(registry: SensorRegistry,
+                       bbox: Optional[tuple[float,float,float,float]]) -> Optional[list[int]]:
+    """Ids of the get_sensor_registry() sensors in bbox, masked off its arrays; None without a bbox or a match."""
     if not bbox:
         return None
-    minlon, minlat, maxlon, maxlat = bbox
-    ids: list[int] = []
-    for lid, m in meta.items():
-        lat, lon = m.get("lat"), m.get("lon")
-        if lat is None or lon is None:
-            continue
-        if (minlat <= lat <= maxlat) and (minlon <= lon <= maxlon):
-            ids.append(lid)
-    return ids or None
+    return registry.ids_in_bbox(bbox) or None
+
+def sensors_in_bbox(sensors: List[dict], registry: SensorRegistry,
+                    bbox: Optional[tuple[float,float,float,float]]) -> List[dict]:
+    """Payload sensors whose registry location lies in bbox (all of them without one)."""
+    if not bbox:
+        return sensors
+    inside = set(registry.ids_in_bbox(bbox))
+    return [s for s in sensors if s["id"] in inside]
 
 def build_live_payload(csv_path: Path,
                        minutes: int = 60,
-                       bbox: Optional[tuple[float,float,float,float]] = None) -> dict:
+                       bbox: Optional[tuple[float,float,float,float]] = None,
+                       counts: Optional[List[dict]] = None) -> dict:
     """
     High-level: fetch → join → score → (optional bbox filter) → payload.
+    Counts are always fetched city-wide, so every bbox shares one upstream query per window;
+    the bbox only filters locally, before scoring, so footfall_score stays relative to the
+    sensors in view. `counts` are already-fetched
+    fetch_live_counts() rows (see ped_snapshot); the fetch is skipped.
+    If the fetch fails or runs past PED_LIVE_DEADLINE_S, the weekday/hour profile
+    (ped_profile) stands in and "source" says so.
     """
-    meta = load_sensor_metadata(csv_path)
-    ids = sensor_ids_in_bbox(meta, bbox)
-    try:
-        counts = fetch_live_counts(minutes=minutes, sensor_ids=ids)
-    except requests.RequestException:
-        # Retry with a wider window when the last hour is thin
-        counts = fetch_live_counts(minutes=120, sensor_ids=ids)
-
-    sensors = join_counts_with_metadata(counts, meta)
-    sensors = add_footfall_score(sensors)
+    registry = get_sensor_registry(csv_path)
+    source = "live"
+    if counts is None:
+        try:
+            counts = fetch_live_counts(minutes=minutes, timeout=live_deadline_s(20))
+        except requests.RequestException:
+            profile = get_ped_profile()
+            if profile is not None:
+                counts, source = profile.counts(minutes), "profile"
+            else:
+                # no profile built yet: retry with a wider window
+                counts = fetch_live_counts(minutes=120)
 
-    # extra safety if bbox was passed
-    if bbox:
-        minlon, minlat, maxlon, maxlat = bbox
-        sensors = [s for s in sensors if (minlat <= s["lat"] <= maxlat) and (minlon <= s["lon"] <= maxlon)]
+    sensors = join_counts_with_metadata(counts, registry.meta)
+    sensors = sensors_in_bbox(sensors, registry, bbox)
+    sensors = add_footfall_score(sensors)
 
     return {
         "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
         "minutes_window": minutes,
+        "source": source,
         "sensors": sensors,
     }
@@ -1,64 +1,67 @@
 
 from __future__ import annotations
-import math, json, os, hashlib, logging, requests
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Any
+import math, json, os, hashlib, logging, requests, threading, time, contextvars, uuid
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Tuple, Dict, Any, Iterator, Optional
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from django.conf import settings
 from django.core.cache import cache
 from .models import VenueCBD
-from .pedestrians import build_live_payload
-from django.db import connection
+from .ped_snapshot import PedUnavailable, footfall_surface, live_payload
+from .pedestrians import get_sensor_registry
+from .footfall_surface import sample_sensors
+from .opening_hours import OpeningHours, compile_hours
+from .lit_mask import get_lit_mask
+from .lighting_snapshot import get_lighting_snapshot
+from .lighting_pack import PackedLighting
+from .timing import stage
+from .lighting_index import LampGrid, SegmentIndex, sample_route_np, lit_flags_np
+from .geometry import (
+    RouteContext, decode_polyline, meters_per_degree, project_np, project_segments_np,
+    simplify_polyline,
+)
+from django.db import connection, close_old_connections
 
 MEL_TZ = ZoneInfo("Australia/Melbourne")
 OVERPASS = "https://overpass-api.de/api/interpreter"
 
+# a route sample counts as lit when it is this close to a lamp or lit way
+LIT_RADIUS_M = 25.0
 
-def decode_polyline(s: str) -> List[Tuple[float, float]]:
-    out = []
-    i = 0; lat = 0; lng = 0
-    while i < len(s):
-        shift = 0; result = 0
-        while True:
-            b = ord(s[i]) - 63; i += 1
-            result |= (b & 0x1F) << shift; shift += 5
-            if b < 0x20: break
-        dlat = ~(result >> 1) if (result & 1) else (result >> 1)
-        lat += dlat
-        shift = 0; result = 0
-        while True:
-            b = ord(s[i]) - 63; i += 1
-            result |= (b & 0x1F) << shift; shift += 5
-            if b < 0x20: break
-        dlng = ~(result >> 1) if (result & 1) else (result >> 1)
-        lng += dlng
-        out.append((lat/1e5, lng/1e5))
-    return out
+# ---- data sources ----
+# Scoring reads its data through these names; use_sources() swaps any of them for the current
+# context (pool tasks see it too, as with timing.collect), e.g. bench_route_score's fixtures.
+SOURCE_NAMES = ("query_lighting_db", "lighting_snapshot", "lit_mask", "live_payload",
+                "sensor_registry", "venues", "disruptions")
+_SOURCES: contextvars.ContextVar[Optional[Dict[str,Any]]] = contextvars.ContextVar("route_score_sources", default=None)
+
+@contextmanager
+def use_sources(**sources) -> Iterator[None]:
+    """
+    Score from other data sources inside this block. Injected data stays out of the shared
+    caches: route scores are computed, never cached, and lighting tiles get keys of their own.
+    """
+    unknown = set(sources) - set(SOURCE_NAMES)
+    if unknown:
+        raise ValueError(f"unknown source(s): {', '.join(sorted(unknown))}")
+    token = _SOURCES.set({**sources, "_tile_ns": f"src:{uuid.uuid4().hex[:8]}:"})
+    try:
+        yield
+    finally:
+        _SOURCES.reset(token)
+
+def _source(name: str, default):
+    injected = _SOURCES.get()
+    return injected.get(name, default) if injected else default
 
-def meters_per_degree(lat: float) -> Tuple[float, float]:
-    lat_m = 111_320.0
-    lon_m = 111_320.0 * math.cos(math.radians(lat))
-    return lat_m, lon_m
-
-def _min_dist_point_to_polyline_m(pt_lat, pt_lng, route_latlng):
-    if len(route_latlng) < 2: return float("inf")
-    ref_lat, ref_lng = route_latlng[0]
-    LAT_M, LNG_M = meters_per_degree(ref_lat)
-    def to_xy(lat, lng): return (lng - ref_lng) * LNG_M, (lat - ref_lat) * LAT_M
-    px, py = to_xy(pt_lat, pt_lng); dmin = float("inf")
-    for (a_lat,a_lng),(b_lat,b_lng) in zip(route_latlng[:-1], route_latlng[1:]):
-        ax, ay = to_xy(a_lat,a_lng); bx, by = to_xy(b_lat,b_lng)
-        vx, vy = bx-ax, by-ay
-        wx, wy = px-ax, py-ay
-        v2 = vx*vx + vy*vy
-        t = 0.0 if v2 == 0 else max(0.0, min(1.0, (wx*vx + wy*vy) / v2))
-        projx, projy = ax + t*vx, ay + t*vy
-        dmin = min(dmin, math.hypot(px-projx, py-projy))
-    return dmin
-
-def _route_bbox(route: List[Tuple[float,float]], pad_m: float = 400.0) -> Tuple[float,float,float,float]:
+
+def _route_bbox(route: List[Tuple[float,float]] | RouteContext, pad_m: float = 400.0) -> Tuple[float,float,float,float]:
     if not route: return (144.9, -37.88, 145.06, -37.76)
+    if isinstance(route, RouteContext): return route.padded_bbox(pad_m)
     lats = [p[0] for p in route]; lngs = [p[1] for p in route]
     lat0 = sum(lats)/len(lats)
     LAT_M, LNG_M = meters_per_degree(lat0)
@@ -95,15 +98,11 @@ def _bbox_to_wkt(minx, miny, maxx, maxy) -> str:
         f"{minx} {miny}))"
     )
 
-def _fetch_lighting_db(bbox_wkt: str) -> Dict[str, Any]:
+def _query_lighting_db(bbox_wkt: str) -> Dict[str, Any]:
     """
+    Uncached lamps + lit ways inside bbox_wkt, straight from MySQL.
     Returns: { "lamps": [(lat, lon), ...], "lines": [[(lat,lon), ...], ...] }
     """
-    key = f"lit:db:{hashlib.sha256(bbox_wkt.encode('utf-8')).hexdigest()[:16]}"
-    dj = cache.get(key)
-    if dj:
-        return dj
-
     lamps: list[tuple[float,float]] = []
     lines: list[list[tuple[float,float]]] = []
 
@@ -151,108 +150,255 @@ def _fetch_lighting_db(bbox_wkt: str) -> Dict[str, Any]:
                 for seg in gj.get("coordinates") or []:
                     lines.append([(c[1], c[0]) for c in seg if isinstance(c, (list, tuple)) and len(c) >= 2])
 
-    dj = {"lamps": lamps, "lines": [ln for ln in lines if len(ln) >= 2]}
-    cache.set(key, dj, 60 * 30)  # 30 min TTL
-    return dj
+    return {"lamps": lamps, "lines": [ln for ln in lines if len(ln) >= 2]}
 
+# Lighting is cached per fixed slippy-map tile (z15 is ~1 km across in Melbourne),
+# so overlapping routes anywhere in the city share cache entries.
+LIGHTING_TILE_ZOOM = 15
+LIGHTING_TILE_TTL = 60 * 30  # 30 min
 
-def _lighting_score_db(route: List[Tuple[float, float]]) -> Dict[str, Any]:
-    if not route:
-        return {"score": 0.0, "coverage": 0.0}
+def _lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
 
-    # Build bbox around the route with generous padding so we can fetch it once
-    minx, miny, maxx, maxy = _route_bbox(route, pad_m=2500)  # same radius for what Overpass initially does
-    bbox_wkt = _bbox_to_wkt(minx, miny, maxx, maxy)
-    lighting = _fetch_lighting_db(bbox_wkt)
+def _tile_bbox(x: int, y: int, z: int) -> Tuple[float, float, float, float]:
+    n = 2 ** z
+    def lat_of(yy): return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yy / n))))
+    return (x / n * 360.0 - 180.0, lat_of(y + 1), (x + 1) / n * 360.0 - 180.0, lat_of(y))
 
-    lamps = lighting.get("lamps", [])
-    lines = lighting.get("lines", [])
+def _tiles_for_bbox(bbox, z: int = LIGHTING_TILE_ZOOM) -> List[Tuple[int, int]]:
+    minx, miny, maxx, maxy = bbox
+    x0, y0 = _lonlat_to_tile(minx, maxy, z)  # tile y grows southwards
+    x1, y1 = _lonlat_to_tile(maxx, miny, z)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+def _fetch_lighting_db(bbox) -> PackedLighting:
+    """
+    Lamps + lit ways for bbox (minx, miny, maxx, maxy), assembled from cached z15 tiles.
+    Tiles are cached as packed bytes (see lighting_pack) and read back without copying.
+    """
+    return _fetch_lighting_tiles(_tiles_for_bbox(bbox, LIGHTING_TILE_ZOOM))
+
+def _fetch_lighting_tiles(tiles: List[Tuple[int, int]]) -> PackedLighting:
+    z = LIGHTING_TILE_ZOOM
+    ns = _source("_tile_ns", "")
+    keys = {f"{ns}lit:tile:v2:z{z}:{x}:{y}": (x, y) for (x, y) in tiles}
+    hit = cache.get_many(list(keys))
+
+    fresh = {}
+    for key, (x, y) in keys.items():
+        if key not in hit:
+            d = _source("query_lighting_db", _query_lighting_db)(_bbox_to_wkt(*_tile_bbox(x, y, z)))
+            fresh[key] = PackedLighting.from_lists(d["lamps"], d["lines"]).to_bytes()
+    if fresh:
+        cache.set_many(fresh, LIGHTING_TILE_TTL)
+    hit.update(fresh)
+
+    # features crossing a tile edge come back from every tile they touch; merge() de-duplicates
+    return PackedLighting.merge([PackedLighting.from_bytes(b) for b in hit.values()])
+
+def _as_packed(lighting) -> PackedLighting:
+    if isinstance(lighting, PackedLighting):
+        return lighting
+    return PackedLighting.from_lists(lighting.get("lamps", []), lighting.get("lines", []))
+
+def _lit_good_python(samples, lamps, lines, ref_lat: float, ref_lng: float) -> int:
+    """Reference backend: count lit samples with the pure-Python grid/segment indexes."""
+    # bucket lamps into 25 m cells and lit-way segments into buffered cells once,
+    # so each sample only tests the few features that can actually be within range
+    lamp_grid = LampGrid(lamps, ref_lat, ref_lng, cell_m=LIT_RADIUS_M) if lamps else None
+    seg_index = SegmentIndex(lines, ref_lat, ref_lng, radius_m=LIT_RADIUS_M) if lines else None
 
-    # Sample the route and check if each sample is within 25 m of either a lamp or a lit line
-    samples = _sample_route(route, step_m=30.0)
     good = 0
     for (la, lo) in samples:
         near = False
 
         # distance to nearest lamp (cheap)
-        if lamps:
-            # use local meters/deg at sample latitude
-            LAT_M, LNG_M = meters_per_degree(la)
-            # compute min Euclidean in meters (no need to be fancy for small radii)
-            d_lamp = min(
-                math.hypot((lo - lon) * LNG_M, (la - lat) * LAT_M)
-                for (lat, lon) in lamps
-            )
-            if d_lamp <= 25:
-                near = True
+        if lamp_grid is not None and lamp_grid.any_within(la, lo, LIT_RADIUS_M):
+            near = True
 
         # distance to nearest lit line segment
-        if not near and lines:
-            for line in lines:
-                if _min_dist_point_to_polyline_m(la, lo, line) <= 25:
-                    near = True
-                    break
+        if not near and seg_index is not None and seg_index.any_within(la, lo, LIT_RADIUS_M):
+            near = True
 
         if near:
             good += 1
+    return good
+
+def _lit_good_arrays(samples, lamps_ll: np.ndarray, segs_ll: np.ndarray, ref_lat: float, ref_lng: float) -> int:
+    """NumPy backend: project samples, lamps and segments to local-meter arrays once, then chunked broadcast distances."""
+    samples_xy = project_np(samples, ref_lat, ref_lng)
+    lamps_xy = project_np(lamps_ll, ref_lat, ref_lng)
+    segs = project_segments_np(segs_ll, ref_lat, ref_lng)
+    return int(lit_flags_np(samples_xy, lamps_xy, segs, radius_m=LIT_RADIUS_M).sum())
 
-    coverage = good / max(1, len(samples))
+def _lighting_backend(name: str | None = None) -> str:
+    name = name or getattr(settings, "ROUTE_LIGHTING_BACKEND", "auto")
+    return name if name in ("python", "numpy", "raster") else "auto"
+
+def _lighting_result(good: int, n_samples: int) -> Dict[str, Any]:
+    coverage = good / max(1, n_samples)
     score = max(0.0, min(1.0, 1.2 * coverage - 0.1))  # same s-curve
-    return {"score": score, "coverage": round(coverage, 3), "samples": len(samples)}
+    return {"score": score, "coverage": round(coverage, 3), "samples": n_samples}
 
+def _lighting_score_db(route: List[Tuple[float, float]] | RouteContext, backend: str | None = None,
+                       lighting: PackedLighting | None = None) -> Dict[str, Any]:
+    """`lighting`, when given, is a prefetched layer (see iter_score_routes) used instead of the tile fetch."""
+    if not route:
+        return {"score": 0.0, "coverage": 0.0}
 
+    rc = RouteContext.of(route)
+    backend = _lighting_backend(backend)
+    ref_lat, ref_lng = rc.ref_lat, rc.ref_lng
+    if backend != "python":
+        with stage("sampling"):
+            samples = sample_route_np(rc.latlng, step_m=30.0)
+        if backend in ("auto", "raster"):
+            # precomputed lit mask: one bit lookup per sample and no DB round trip
+            mask = _source("lit_mask", get_lit_mask)()
+            if mask is not None and mask.covers(samples):
+                with stage("lighting_compute"):
+                    good = int(mask.lit_flags(samples).sum())
+                return _lighting_result(good, len(samples))
+
+        # worker-wide snapshot of the whole lighting layer: no MySQL on the request path
+        snap = _source("lighting_snapshot", get_lighting_snapshot)()
+        near_bbox = rc.padded_bbox(2 * LIT_RADIUS_M)
+        if snap is not None and snap.covers(near_bbox):
+            with stage("lighting_fetch"):
+                lamps_ll, segs_ll = snap.subset(near_bbox)
+            with stage("lighting_compute"):
+                good = _lit_good_arrays(samples, lamps_ll, segs_ll, ref_lat, ref_lng)
+            return _lighting_result(good, len(samples))
+
+    # Only features within LIT_RADIUS_M of the route matter; fetch the tiles covering that
+    if lighting is None:
+        with stage("lighting_fetch"):
+            lighting = _fetch_lighting_db(rc.padded_bbox(2 * LIT_RADIUS_M))
+    lighting = _as_packed(lighting)
 
+    # Sample the route and check if each sample is within 25 m of either a lamp or a lit line
+    if backend == "python":
+        with stage("sampling"):
+            samples = _sample_route(rc.points, step_m=30.0)
+        with stage("lighting_compute"):
+            good = _lit_good_python(samples, lighting.lamps.tolist(), list(lighting.lines()), ref_lat, ref_lng)
+    else:
+        with stage("lighting_compute"):
+            good = _lit_good_arrays(samples, lighting.lamps, lighting.segments(), ref_lat, ref_lng)
+
+    return _lighting_result(good, len(samples))
+
+def _prefetch_lighting(routes: List[List[Tuple[float, float]] | RouteContext], backend: str | None = None) -> PackedLighting | None:
+    """
+    One tile fetch for every route that the lit mask / snapshot can't serve from memory.
+    The tile set is the union of each route's own tiles, not the tiles of the union bbox.
+    """
+    backend = _lighting_backend(backend)
+    rcs = [RouteContext.of(r) for r in routes]
+    if backend != "python":
+        mask = _source("lit_mask", get_lit_mask)() if backend in ("auto", "raster") else None
+        snap = _source("lighting_snapshot", get_lighting_snapshot)()
+        def in_memory(rc):
+            if mask is not None and mask.covers(rc.latlng):
+                return True
+            return snap is not None and snap.covers(rc.padded_bbox(2 * LIT_RADIUS_M))
+        rcs = [rc for rc in rcs if not in_memory(rc)]
+    if not rcs:
+        return None
+    tiles = sorted({t for rc in rcs for t in _tiles_for_bbox(rc.padded_bbox(2 * LIT_RADIUS_M))})
+    with stage("lighting_fetch"):
+        return _fetch_lighting_tiles(tiles)
 
 
-# footfall (ped sensors) 
-def _footfall_score(route: List[Tuple[float,float]], minutes=60, bbox=None) -> Dict[str,Any]:
-    
-    # use data retrieved from the pedestrina-counting-system-sensor-location.csv 
-    csv_path = settings.BASE_DIR / "GlowWithIt/static/data/pedestrian-counting-system-sensor-locations.csv"
-    data = build_live_payload(csv_path, minutes=minutes, bbox=bbox)
-    sensors = data.get("sensors", [])
-    if not sensors:
-        return {"score": 0.0, "near_sensors": 0, "avg": 0.0}
 
-    # consider sensors within 60 m of the path; aggregate counts
-    samples = 0; acc = 0.0; near = 0
-    for s in sensors:
-        d = _min_dist_point_to_polyline_m(s["lat"], s["lon"], route)
-        if d <= 60:
-            acc += float(s.get("count_60m") or 0.0)
-            near += 1
-            samples += 1
+
+
+# footfall (ped sensors) 
+FOOTFALL_RADIUS_M = 60.0
+# route samples read from the interpolated footfall grid (footfall_surface)
+FOOTFALL_SAMPLE_STEP_M = 20.0
+# use data retrieved from the pedestrina-counting-system-sensor-location.csv 
+PED_SENSORS_CSV = settings.BASE_DIR / "GlowWithIt/static/data/pedestrian-counting-system-sensor-locations.csv"
+
+def _footfall_payload(minutes=60) -> Dict[str,Any]:
+    # city-wide, like the footfall grid: the P10–P90 bounds must not depend on the route's bbox
+    with stage("footfall_fetch"):
+        try:
+            return _source("live_payload", live_payload)(PED_SENSORS_CSV, minutes=minutes)
+        except PedUnavailable:
+            # no counts at all yet (a refresh is on its way): score the route without footfall
+            return {"minutes_window": minutes, "source": "unavailable", "sensors": [], "snapshot": None}
+
+def _footfall_surface(minutes, payload):
+    # the grid is built per snapshot; only payloads read from that same snapshot can use it
+    snap = (payload or {}).get("snapshot")
+    if not snap:
+        return None
+    surface = footfall_surface(PED_SENSORS_CSV, minutes)
+    if surface is None or surface.meta.get("version") != snap.get("version"):
+        return None
+    return surface
+
+def _in_bbox(rows: List[Dict[str,Any]], bbox, lat_key="lat", lon_key="lon") -> List[Dict[str,Any]]:
+    if not bbox: return rows
+    w, s, e, n = bbox
+    return [r for r in rows if s <= float(r[lat_key]) <= n and w <= float(r[lon_key]) <= e]
+
+def _footfall_score(route: List[Tuple[float,float]] | RouteContext, minutes=60, payload=None) -> Dict[str,Any]:
+    if payload is None:
+        payload = _footfall_payload(minutes)
+    sensors = payload.get("sensors", [])
+
+    # consider sensors within 60 m of the path. The registry's grid is built once per CSV
+    # version; keep the sensors this payload has counts for.
+    registry = _source("sensor_registry", get_sensor_registry)(PED_SENSORS_CSV)
+    idx, _ = registry.grid.within_route(route, FOOTFALL_RADIUS_M)
+    by_id = {int(s["id"]): s for s in sensors}
+    near = sum(1 for i in registry.ids[idx].tolist() if i in by_id)
 
     if near == 0:
         return {"score": 0.0, "near_sensors": 0, "avg": 0.0}
 
-    # normalize by 95th percentile in-window to avoid spikes
-    counts = [float(s.get("count_60m") or 0.0) for s in sensors]
-    counts.sort()
-    p95 = counts[int(0.95 * (len(counts)-1))] if counts else 1.0
-    avg = acc / max(1, near)
-    score = max(0.0, min(1.0, avg / max(1.0, p95)))
-    return {"score": score, "near_sensors": near, "avg": round(avg, 1)}
+    # with a grid for this snapshot, footfall is one pixel read per route sample; without
+    # one (profile, another snapshot, off the grid) the same interpolation and P10–P90
+    # bounds are evaluated at the samples, so both read on one scale
+    samples = sample_route_np(RouteContext.of(route).latlng, step_m=FOOTFALL_SAMPLE_STEP_M)
+    surface = _footfall_surface(minutes, payload)
+    with stage("footfall_compute"):
+        if surface is not None and surface.covers(samples):
+            score, count, _ = surface.sample(samples)
+        else:
+            bounds = (surface.meta["p10"], surface.meta["p90"]) if surface is not None else None
+            score, count = sample_sensors(samples, sensors, bounds=bounds)
+    return {"score": float(score.mean()), "near_sensors": near, "avg": round(float(count.mean()), 1)}
 
 #  safe venues ( open and 24/7)
-def _venues_score(route: List[Tuple[float,float]], bbox) -> Dict[str,Any]:
-    if not bbox:
-        bbox = _route_bbox(route, pad_m=600)
+# a venue helps if it is open at any point while the walker passes (compiled hours, see opening_hours)
+VENUE_OPEN_WITHIN_MIN = 15
+
+def _fetch_venues(bbox) -> List[Dict[str,Any]]:
     w, s, e, n = bbox  # (minx,miny,maxx,maxy)
     qs = VenueCBD.objects.filter(latitude__gte=s, latitude__lte=n, longitude__gte=w, longitude__lte=e)
+    with stage("venues_query"):
+        return list(qs.values("latitude","longitude","opening_hours_raw","mon","tue","wed","thu","fri","sat","sun","name"))
+
+def _venues_score(route: List[Tuple[float,float]] | RouteContext, bbox, venues=None) -> Dict[str,Any]:
+    rc = RouteContext.of(route)
+    if not bbox:
+        bbox = _route_bbox(rc, pad_m=600)
+    venues = _source("venues", _fetch_venues)(bbox) if venues is None else _in_bbox(venues, bbox, "latitude", "longitude")
     total = 0; helpful = 0
-    for v in qs.values("latitude","longitude","mon","tue","wed","thu","fri","sat","sun","name"):
-        lat = float(v["latitude"]); lon = float(v["longitude"])
-        d = _min_dist_point_to_polyline_m(lat, lon, route)
+    dists = rc.dist_m([(float(v["latitude"]), float(v["longitude"])) for v in venues])
+    now = OpeningHours.minute_of_week(datetime.now(MEL_TZ))
+    for v, d in zip(venues, dists):
         if d <= 80:   # inside a short detour
             total += 1
-            # treat 24/7 or “open now” heuristically from hours text
-            today = datetime.now(MEL_TZ).weekday()
-            day = ["mon","tue","wed","thu","fri","sat","sun"][today]
-            txt = (v.get(day) or "").lower()
-            is247 = "24" in txt and "7" in txt
-            openish = is247 or any(k in txt for k in ["am","pm","open","24"])
-            if openish: helpful += 1
+            # 24/7 or open within the next few minutes: one bit test on the compiled weekly mask
+            if compile_hours(v).open_within(now, VENUE_OPEN_WITHIN_MIN):
+                helpful += 1
     if total == 0:
         return {"score": 0.0, "near_venues": 0}
     # more helpful venues closer to the route -> higher score, saturate around ~6+ places
@@ -266,7 +412,7 @@ def _disruptions_local_path():
 
 def _load_disruptions() -> List[Dict[str,Any]]:
     try:
-        with open(_disruptions_local_path(), "r", encoding="utf-8") as f:
+        with stage("disruptions_load"), open(_disruptions_local_path(), "r", encoding="utf-8") as f:
             data = json.load(f)
         return (data.get("features") or []) if isinstance(data, dict) else []
     except Exception as ex:
@@ -284,14 +430,19 @@ def _severity_from_props(p: Dict[str,Any]) -> int:
     if txt.strip(): return 1
     return 0
 
-def _disruptions_penalty(route: List[Tuple[float,float]], radius_m=200) -> Dict[str,Any]:
-    feats = _load_disruptions()
+def _disruptions_penalty(route: List[Tuple[float,float]] | RouteContext, radius_m=200, feats=None) -> Dict[str,Any]:
+    if feats is None:
+        feats = _source("disruptions", _load_disruptions)()
+    with stage("disruption_scan"):
+        return _scan_disruptions(route, feats, radius_m)
+
+def _scan_disruptions(route: List[Tuple[float,float]] | RouteContext, feats: List[Dict[str,Any]], radius_m) -> Dict[str,Any]:
     if not feats: return {"penalty": 0.0, "near": 0}
     near = 0; acc = 0.0
+    # pick a representative point per feature, then measure them all in one batch
+    pts = []; props = []
     for f in feats:
         geom = f.get("geometry") or {}
-        p = f.get("properties") or {}
-        # pick a representative point to measure
         lat, lon = None, None
         try:
             if geom.get("type") == "Point" and geom.get("coordinates"):
@@ -303,7 +454,8 @@ def _disruptions_penalty(route: List[Tuple[float,float]], radius_m=200) -> Dict[
         except Exception:
             continue
         if lat is None: continue
-        d = _min_dist_point_to_polyline_m(lat, lon, route)
+        pts.append((float(lat), float(lon))); props.append(f.get("properties") or {})
+    for p, d in zip(props, RouteContext.of(route).dist_m(pts)):
         if d <= radius_m:
             sev = _severity_from_props(p)  # 0..3
             if sev > 0:
@@ -325,19 +477,299 @@ class ScoreWeights:
     venues: float = 0.10
     disruptions: float = 0.25  # subtract as penalty
 
+# Components run concurrently on one bounded, process-wide pool. Set
+# ROUTE_SCORE_WORKERS <= 1 to evaluate them serially in the request thread.
+ROUTE_SCORE_WORKERS = 4
+_COMPONENT_POOL: ThreadPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+
+def _component_pool() -> ThreadPoolExecutor | None:
+    global _COMPONENT_POOL
+    workers = int(getattr(settings, "ROUTE_SCORE_WORKERS", ROUTE_SCORE_WORKERS))
+    if workers <= 1:
+        return None
+    with _POOL_LOCK:
+        if _COMPONENT_POOL is None:
+            _COMPONENT_POOL = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="route_component")
+    return _COMPONENT_POOL
+
+def _timed(fn, *args, **kwargs) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, round((time.perf_counter() - t0) * 1000.0, 1)
+
+def _timed_in_pool(fn, *args, **kwargs) -> Tuple[Any, float]:
+    try:
+        return _timed(fn, *args, **kwargs)
+    finally:
+        # pool threads outlive the request; release their DB connection like Django does at request end
+        close_old_connections()
+
+def _run_components(jobs: Dict[str, Tuple[Any, tuple, dict]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Run {name: (fn, args, kwargs)} and return ({name: result}, {name: wall ms}).
+    Exceptions propagate to the caller, as they did when components ran inline.
+    """
+    pool = _component_pool()
+    if pool is None:
+        done = {name: _timed(fn, *a, **kw) for name, (fn, a, kw) in jobs.items()}
+    else:
+        # copy_context() so pool threads record into this request's stage timings
+        futures = {name: pool.submit(contextvars.copy_context().run, _timed_in_pool, fn, *a, **kw)
+                   for name, (fn, a, kw) in jobs.items()}
+        done = {name: f.result() for name, f in futures.items()}
+    return {k: v[0] for k, v in done.items()}, {k: v[1] for k, v in done.items()}
+
+# Several alternatives for one trip overlap almost entirely, so batch scoring
+# fetches every data source once for all of them and scores each route from that.
+@dataclass
+class ScoringContext:
+    minutes: int
+    bbox: Tuple[float,float,float,float]             # union of the routes' 800 m bboxes
+    lighting: PackedLighting | None = None           # None: lit mask / snapshot serve every route
+    footfall: Dict[str,Any] | None = None            # city-wide live_payload()
+    venues: List[Dict[str,Any]] | None = None        # VenueCBD rows inside bbox
+    disruptions: List[Dict[str,Any]] | None = None   # local VicRoads features
+    timings_ms: Dict[str,float] = field(default_factory=dict)  # fetch wall time per source
+
+COMPONENTS = ("lighting", "footfall", "venues", "disruptions")
+
+def _union_bbox(routes: List[RouteContext], pad_m: float) -> Tuple[float,float,float,float]:
+    boxes = [_route_bbox(r, pad_m=pad_m) for r in routes]
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def _context_jobs(routes: List[RouteContext], minutes: int, bbox) -> Dict[str, Tuple[Any, tuple, dict]]:
+    return {
+        "lighting":    (_prefetch_lighting, (routes,), {}),
+        "footfall":    (_footfall_payload, (minutes,), {}),
+        "venues":      (_source("venues", _fetch_venues), (bbox,), {}),
+        "disruptions": (_source("disruptions", _load_disruptions), (), {}),
+    }
+
+def _component_jobs(route: List[Tuple[float,float]] | RouteContext, minutes: int, ctx: ScoringContext | None = None) -> Dict[str, Tuple[Any, tuple, dict]]:
+    # project the route once; every component's distance queries reuse the same arrays
+    route = RouteContext.of(route)
+    bbox = route.padded_bbox(800)
+    if ctx is None:
+        return {
+            "lighting":    (_lighting_score_db, (route,), {}),                         # 0..1
+            "footfall":    (_footfall_score, (route, minutes), {}),                    # 0..1
+            "venues":      (_venues_score, (route, bbox), {}),                         # 0..1
+            "disruptions": (_disruptions_penalty, (route,), {"radius_m": 200}),        # 0..1 penalty
+        }
+    # everything is already in memory; the components are pure CPU from here
+    return {
+        "lighting":    (_lighting_score_db, (route,), {"lighting": ctx.lighting}),
+        "footfall":    (_footfall_score, (route, minutes), {"payload": ctx.footfall}),
+        "venues":      (_venues_score, (route, bbox), {"venues": ctx.venues}),
+        "disruptions": (_disruptions_penalty, (route,), {"radius_m": 200, "feats": ctx.disruptions}),
+    }
+
+def _iter_completed(jobs: Dict[str, Tuple[Any, tuple, dict]]) -> Iterator[Tuple[str, Any, float]]:
+    """Like _run_components, but yield (name, result, ms) as each job finishes."""
+    pool = _component_pool()
+    if pool is None:
+        for name, (fn, a, kw) in jobs.items():
+            out, ms = _timed(fn, *a, **kw)
+            yield name, out, ms
+        return
+    futures = {pool.submit(contextvars.copy_context().run, _timed_in_pool, fn, *a, **kw): name
+               for name, (fn, a, kw) in jobs.items()}
+    for f in as_completed(futures):
+        out, ms = f.result()
+        yield futures[f], out, ms
+
+# Google polylines for long walks carry many near-collinear vertices. Every distance
+# query scans all segments, so routes are Douglas–Peucker simplified right after decode.
+ROUTE_SIMPLIFY_TOLERANCE_M = 4.0    # 0 disables
+
+def simplify_for_scoring(route: List[Tuple[float,float]]) -> Tuple[List[Tuple[float,float]], Dict[str,Any]]:
+    """(simplified route, meta with the vertex counts before/after) using ROUTE_SIMPLIFY_TOLERANCE_M."""
+    tol = float(getattr(settings, "ROUTE_SIMPLIFY_TOLERANCE_M", ROUTE_SIMPLIFY_TOLERANCE_M))
+    with stage("simplify"):
+        out = simplify_polyline(route, tol)
+    return out, {"vertices": len(route), "vertices_simplified": len(out), "simplify_tolerance_m": tol}
+
+# Result cache. Google returns slightly different polylines for the same corridor,
+# so the key is the route snapped to a ~10 m grid (near-collinear vertices dropped),
+# plus the footfall window bucket and the versions of the lighting/disruption data.
+ROUTE_SCORE_CACHE_TTL = 300     # seconds; also the footfall time bucket. 0 disables
+ROUTE_SCORE_SNAP_M = 10.0
+
+def _canonical_route(route: List[Tuple[float,float]], snap_m: float = ROUTE_SCORE_SNAP_M) -> List[Tuple[int,int]]:
+    # the lng step uses the whole-degree latitude so nearby routes share one grid
+    lat_step = snap_m / 111_320.0
+    lng_step = snap_m / (111_320.0 * math.cos(math.radians(round(route[0][0]))))
+    cells: List[Tuple[int,int]] = []
+    for lat, lng in route:
+        c = (round(lat / lat_step), round(lng / lng_step))
+        if not cells or cells[-1] != c:
+            cells.append(c)
+    out = cells[:1]
+    for i in range(1, len(cells) - 1):
+        (ax, ay), (bx, by), (cx, cy) = out[-1], cells[i], cells[i + 1]
+        # drop b when it sits within one cell of the straight run a -> c
+        cross = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+        if cross * cross <= (cx - ax) ** 2 + (cy - ay) ** 2 and (bx - ax) * (cx - bx) + (by - ay) * (cy - by) >= 0:
+            continue
+        out.append(cells[i])
+    if len(cells) > 1:
+        out.append(cells[-1])
+    return out
+
+def _file_version(path) -> str:
+    try:
+        st = os.stat(path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        return "-"
+
+def _data_versions() -> str:
+    snap = _source("lighting_snapshot", get_lighting_snapshot)()
+    mask = _source("lit_mask", get_lit_mask)()
+    return "|".join((
+        snap.version if snap is not None else "-",
+        str(mask.meta.get("built_at", "")) if mask is not None else "-",
+        _file_version(_disruptions_local_path()),
+    ))
+
+def _score_cache_key(route: List[Tuple[float,float]], minutes: int, ttl: int, versions: str) -> str:
+    h = hashlib.sha1()
+    for c in _canonical_route(route):
+        h.update(b"%d,%d;" % c)
+    h.update(f"|{int(minutes)}|{int(time.time() // ttl)}|{versions}".encode())
+    return f"route:score:v2:{h.hexdigest()}"
+
+def _score_cache_ttl() -> int:
+    if _SOURCES.get() is not None:
+        return 0    # scores from injected sources (use_sources) are never cached nor served from it
+    return int(getattr(settings, "ROUTE_SCORE_CACHE_TTL", ROUTE_SCORE_CACHE_TTL))
+
+# describe the request that computed a score, not the score: never stored with it
+_PER_REQUEST_FIELDS = ("timings_ms", "context_ms", "meta")
+
+def _cache_entry(out: Dict[str,Any]) -> Dict[str,Any]:
+    return {k: v for k, v in out.items() if k not in _PER_REQUEST_FIELDS}
+
+def _cache_hit(entry: Dict[str,Any], meta, lookup_ms: float) -> Dict[str,Any]:
+    """A cached score as this request served it: its own meta, and only the lookup in timings_ms."""
+    return {**entry, "meta": meta, "timings_ms": {"cache_lookup": lookup_ms}, "cache": "hit"}
+
 def score_route(polyline: str, minutes: int = 60) -> Dict[str,Any]:
-    route = decode_polyline(polyline)
+    with stage("decode"):
+        route = decode_polyline(polyline)
     if len(route) < 2:
         return {"error": "route_too_short"}
+    route, meta = simplify_for_scoring(route)
+    ttl = _score_cache_ttl()
+    if ttl <= 0:
+        return {**_score_decoded(RouteContext(route), minutes), "meta": meta}
+
+    key = _score_cache_key(route, minutes, ttl, _data_versions())
+    with stage("cache_lookup"):
+        hit, lookup_ms = _timed(cache.get, key)
+    if hit is not None:
+        return _cache_hit(hit, meta, lookup_ms)
+    out = {**_score_decoded(RouteContext(route), minutes), "meta": meta}
+    cache.set(key, _cache_entry(out), ttl)
+    return {**out, "cache": "miss"}
+
+def score_routes(polylines: List[str], minutes: int = 60) -> List[Dict[str,Any]]:
+    """
+    Score several alternatives against one shared context: one lighting fetch, one
+    footfall upstream call, one venue query and one disruptions load for the lot.
+    A route that fails on its own gets an error entry; the others are still scored.
+    """
+    results: List[Dict[str,Any] | None] = [None] * len(polylines)
+    for ev in iter_score_routes(polylines, minutes):
+        if ev["event"] == "route":
+            results[ev["route_index"]] = ev["result"]
+    return results
 
-    bbox = _route_bbox(route, pad_m=800)
-    w = ScoreWeights()
+def iter_score_routes(polylines: List[str], minutes: int = 60) -> Iterator[Dict[str,Any]]:
+    """
+    Streaming form of score_routes. Yields, as soon as each is known:
+      {"event": "route", "route_index": i, "result": {...}}          cached, failed or finished routes
+      {"event": "component", "route_index": i, "name": "lighting", "result": {...}}
+    Each shared fetch is scored for every route the moment it lands, so a slow
+    footfall upstream only holds back the footfall components.
+    """
+    routes: List[RouteContext | None] = []
+    metas: List[Dict[str,Any] | None] = []
+    for i, p in enumerate(polylines):
+        try:
+            with stage("decode"):
+                route = decode_polyline(p)
+        except Exception as ex:
+            routes.append(None); metas.append(None)
+            yield {"event": "route", "route_index": i, "result": {"error": "scoring_failed", "detail": str(ex)}}
+            continue
+        if len(route) < 2:
+            routes.append(None); metas.append(None)
+            yield {"event": "route", "route_index": i, "result": {"error": "route_too_short"}}
+            continue
+        route, meta = simplify_for_scoring(route)
+        routes.append(RouteContext(route)); metas.append(meta)
+
+    # answer what we can from the result cache; only the misses need a shared context
+    ttl = _score_cache_ttl()
+    keys: Dict[int, str] = {}
+    done = set()
+    if ttl > 0:
+        versions = _data_versions()
+        keys = {i: _score_cache_key(r.points, minutes, ttl, versions) for i, r in enumerate(routes) if r is not None}
+        with stage("cache_lookup"):
+            hit, lookup_ms = _timed(cache.get_many, list(set(keys.values())))
+        for i, key in keys.items():
+            if key in hit:
+                done.add(i)
+                yield {"event": "route", "route_index": i, "result": _cache_hit(hit[key], metas[i], lookup_ms)}
+
+    todo = [i for i, r in enumerate(routes) if r is not None and i not in done]
+    if not todo:
+        return
+    valid = [routes[i] for i in todo]
+    ctx = ScoringContext(minutes=minutes, bbox=_union_bbox(valid, pad_m=800))
+    parts: Dict[int, Dict[str,Any]] = {i: {} for i in todo}
+    part_ms: Dict[int, Dict[str,float]] = {i: {} for i in todo}
 
-   
-    lighting = _lighting_score_db(route)                 # 0..1
-    footfall = _footfall_score(route, minutes, bbox=bbox)  # 0..1
-    venues   = _venues_score(route, bbox)                # 0..1
-    disrupt  = _disruptions_penalty(route, radius_m=200)   # 0..1 penalty
+    try:
+        for name, value, ms in _iter_completed(_context_jobs(valid, minutes, ctx.bbox)):
+            setattr(ctx, name, value); ctx.timings_ms[name] = ms
+            for i in todo:
+                if i in done:
+                    continue
+                try:
+                    fn, a, kw = _component_jobs(routes[i], minutes, ctx)[name]
+                    parts[i][name], part_ms[i][name] = _timed(fn, *a, **kw)
+                except Exception as ex:
+                    logging.exception("score_routes failed for route %s", i)
+                    done.add(i)
+                    yield {"event": "route", "route_index": i, "result": {"error": "scoring_failed", "detail": str(ex)}}
+                    continue
+                yield {"event": "component", "route_index": i, "name": name, "result": parts[i][name]}
+                if len(parts[i]) == len(COMPONENTS):
+                    done.add(i)
+                    out = {**_compose(parts[i], part_ms[i], ctx), "meta": metas[i]}
+                    if i in keys:
+                        cache.set(keys[i], _cache_entry(out), ttl)
+                        out = {**out, "cache": "miss"}
+                    yield {"event": "route", "route_index": i, "result": out}
+    except Exception as ex:
+        # a shared fetch failed: every route still waiting on it fails, as it would have standalone
+        logging.exception("score_routes context fetch failed")
+        for i in todo:
+            if i not in done:
+                yield {"event": "route", "route_index": i, "result": {"error": "scoring_failed", "detail": str(ex)}}
+
+def _score_decoded(route: List[Tuple[float,float]] | RouteContext, minutes: int, ctx: ScoringContext | None = None) -> Dict[str,Any]:
+    # independent components; latency is the slowest one, not the sum
+    res, timings = _run_components(_component_jobs(route, minutes, ctx))
+    return _compose(res, timings, ctx)
+
+def _compose(res: Dict[str,Any], timings: Dict[str,float], ctx: ScoringContext | None = None) -> Dict[str,Any]:
+    w = ScoreWeights()
+    lighting, footfall, venues, disrupt = res["lighting"], res["footfall"], res["venues"], res["disruptions"]
 
     raw = (
         w.lighting    * lighting["score"] +
@@ -358,5 +790,7 @@ def score_route(polyline: str, minutes: int = 60) -> Dict[str,Any]:
             "disruptions": disrupt
         },
         "samples_total": lighting.get("samples", 0),
-        "samples_scored": lighting.get("samples", 0)
+        "samples_scored": lighting.get("samples", 0),
+        "timings_ms": timings,
+        **({"context_ms": dict(ctx.timings_ms)} if ctx is not None else {}),
     }
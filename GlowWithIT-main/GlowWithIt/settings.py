@@ -110,4 +110,7 @@ STATICFILES_DIRS = [
 # Add this for production builds
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Derived artefacts written by management commands (e.g. the lit mask raster from build_lit_mask)
+DERIVED_DATA_DIR = BASE_DIR / "GlowWithIt" / "derived"
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
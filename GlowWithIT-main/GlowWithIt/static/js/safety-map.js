@@ -3520,22 +3520,21 @@ try{
   (async () => {
     try {
       const body = { polylines: [safer.encoded, shorter.encoded], when:'night', minutes:60 };
-      const resp = await fetch('/api/route/score', {
-        method:'POST',
-        headers:{'Accept':'application/json','Content-Type':'application/json'},
-        credentials:'same-origin',
-        body: JSON.stringify(body),
-        signal: cmp.controller.signal        // ← cancellation
+      const cands = [safer, shorter];
+
+      // Streamed: each alternative is recoloured as soon as its own score lands,
+      // instead of waiting for the slower one (or the footfall upstream)
+      await streamRouteScores(body, {
+        signal: cmp.controller.signal,       // ← cancellation
+        onRoute: (i, r) => {
+          // Drop stale results if user already changed route
+          if (myId !== (window._compareInflight?.id)) return;
+          const c = cands[i];
+          if (!c || r?.label == null) return;
+          c.score = r.overall ?? c.score; c.label = r.label || c.label;
+          window.__applyPrefForRoutes?.({ safer, shorter });
+        }
       });
-      if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
-      const json = await resp.json();
-
-      // Drop stale response if user already changed route
-      if (myId !== (window._compareInflight?.id)) return;
-
-      const arr = json?.routes || [];
-      if (arr[0]) { safer.score = arr[0].overall ?? safer.score; safer.label = arr[0].label || safer.label; }
-      if (arr[1]) { shorter.score = arr[1].overall ?? shorter.score; shorter.label = arr[1].label || shorter.label; }
 
     } catch (e) {
       // If aborted because of route change, just exit quietly
@@ -3932,6 +3931,50 @@ async function fetchRouteScore(enc, minutes = 60, when = 'night') {
 
 
 
+// POST to /api/route/score asking for NDJSON; calls onRoute(i, result) / onComponent(i, name, result)
+// as lines arrive. Falls back to the plain JSON shape if the response isn't streamed.
+async function streamRouteScores(payload, { signal, onRoute, onComponent } = {}) {
+  const res = await fetch('/api/route/score', {
+    method: 'POST',
+    credentials: 'same-origin',
+    headers: { 'Accept': 'application/x-ndjson', 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload),
+    signal
+  });
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+  if (!(res.headers.get('Content-Type') || '').includes('ndjson') || !res.body?.getReader) {
+    const json = await res.json();
+    (json?.routes || []).forEach((r, i) => onRoute?.(r.route_index ?? i, r));
+    return json?.summary || [];
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '', summary = [];
+  const handle = (line) => {
+    if (!line.trim()) return;
+    const ev = JSON.parse(line);
+    if (ev.event === 'route') onRoute?.(ev.route_index, ev.result);
+    else if (ev.event === 'component') onComponent?.(ev.route_index, ev.name, ev.result);
+    else if (ev.event === 'summary') summary = ev.summary || [];
+  };
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let nl;
+    while ((nl = buf.indexOf('\n')) >= 0) {
+      handle(buf.slice(0, nl));
+      buf = buf.slice(nl + 1);
+    }
+  }
+  handle(buf + decoder.decode());
+  return summary;
+}
+
+
+
 function heuristicScoreFromFrontend(path){
   // lighting coverage
   const segs = (window.__lightingSegments || []);
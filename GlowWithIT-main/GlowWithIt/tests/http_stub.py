@@ -0,0 +1,88 @@
+"""
+Local stand-in for the upstream APIs: a threaded HTTP/1.1 server on 127.0.0.1
+that answers from a script of (status, body, headers, delay_s) per path and
+records what it saw (requests, client ports, peak concurrency).
+
+    with StubServer() as srv:
+        srv.script("/records", [(503, {}), (200, {"results": []})])
+        upstream_client.get(srv.url("/records"))
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def log_message(self, *args):
+        pass
+
+    def _serve(self):
+        stub = self.server.stub
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body_in = self.rfile.read(length) if length else b""
+        status, body, headers, delay = stub._next(path, self, body_in)
+        if delay:
+            time.sleep(delay)
+        payload = json.dumps(body).encode() if not isinstance(body, bytes) else body
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            stub._done()
+
+    do_GET = _serve
+    do_POST = _serve
+
+
+class StubServer:
+
+    def __init__(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._scripts = {}
+        self._lock = threading.Lock()
+        self.requests = []          # (method, path, query, body)
+        self.client_ports = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def url(self, path="/"):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}{path}"
+
+    def script(self, path, responses):
+        """Responses for `path` in order: (status, body[, headers[, delay_s]]); the last one repeats."""
+        with self._lock:
+            self._scripts[path] = [tuple(r) + (None, 0.0)[len(r) - 2:] for r in responses]
+
+    def _next(self, path, handler, body_in):
+        with self._lock:
+            self.requests.append((handler.command, path, urlsplit(handler.path).query, body_in))
+            self.client_ports.append(handler.client_address[1])
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            queue = self._scripts.get(path) or [(404, {"error": "no script"}, None, 0.0)]
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+
+    def _done(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, name="http_stub", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
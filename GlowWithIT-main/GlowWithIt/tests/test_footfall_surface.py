@@ -0,0 +1,132 @@
+from django.test import SimpleTestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from unittest.mock import patch
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+from GlowWithIt import ped_snapshot, pedestrians, route_score
+from GlowWithIt.footfall_surface import build_surface, sample_sensors
+from GlowWithIt.tests.test_pedestrians import _minute_rows, _write_sensor_csv
+
+SENSORS = [
+    {"id": 1, "lat": -37.8136, "lon": 144.9631, "count_60m": 1200},
+    {"id": 2, "lat": -37.8100, "lon": 144.9700, "count_60m": 300},
+    {"id": 3, "lat": -37.8200, "lon": 144.9550, "count_60m": 20},
+]
+# west -> east past sensor 1
+ROUTE = [(-37.8136, 144.9600), (-37.8136, 144.9660)]
+
+
+class FootfallSurfaceTests(SimpleTestCase):
+
+    def setUp(self):
+        self.surface = build_surface(SENSORS, res_m=25.0, idw_radius_m=400.0)
+        # route_score finds sensors near a route through the registry: give it these three
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        csv = Path(self.tmp.name) / "sensors.csv"
+        csv.write_text("location_id,sensor_description,latitude,longitude,status\n" + "".join(
+            f"{s['id']},Sensor {s['id']},{s['lat']},{s['lon']},A\n" for s in SENSORS), encoding="utf-8")
+        patcher = patch("GlowWithIt.route_score.PED_SENSORS_CSV", csv)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cells_follow_sensors_and_sensor_scaling(self):
+        score, count, nearest = self.surface.sample(np.array([[s["lat"], s["lon"]] for s in SENSORS]))
+        np.testing.assert_allclose(count, [1200, 300, 20], rtol=0.05)
+        self.assertEqual(nearest.tolist(), [0, 1, 2])
+        # same P10-P90 scale as the sensors' own footfall_score
+        expected = [s["footfall_score"] for s in pedestrians.add_footfall_score([dict(s) for s in SENSORS])]
+        np.testing.assert_allclose(score, expected, atol=0.05)
+
+    def test_far_cells_and_outside_read_empty(self):
+        score, count, nearest = self.surface.sample(np.array([[-37.78, 145.01], [-38.5, 144.0]]))
+        self.assertEqual(score.tolist(), [0.0, 0.0])
+        self.assertEqual(nearest.tolist(), [-1, -1])
+        self.assertFalse(self.surface.covers([[-38.5, 144.0]]))
+        self.assertTrue(all(0.0 < v <= 1.0 for _, _, v in self.surface.heat_points(4)))
+
+    def test_route_score_reads_surface_for_snapshot_payloads(self):
+        payload = {"sensors": SENSORS, "snapshot": {"version": 7}}
+        self.surface.meta["version"] = 7
+        with patch("GlowWithIt.route_score.footfall_surface", return_value=self.surface), \
+             patch("GlowWithIt.route_score.sample_sensors") as by_sensor:
+            out = route_score._footfall_score(ROUTE, payload=payload)
+        by_sensor.assert_not_called()
+        self.assertEqual(out["near_sensors"], 1)
+        self.assertGreater(out["score"], 0.0)
+        # payloads not read from that snapshot (profile, older versions) interpolate at the samples
+        # the same IDW and P10-P90 bounds: only the 25 m cells stand between the two. This walk
+        # runs from between sensors 1 and 2 to sensor 2, so its score sits mid-scale.
+        between = [(-37.8115, 144.9640), (-37.8100, 144.9700)]
+        with patch("GlowWithIt.route_score.footfall_surface", return_value=self.surface):
+            grid = route_score._footfall_score(between, payload=payload)
+            old = route_score._footfall_score(between, payload={"sensors": SENSORS, "snapshot": {"version": 6}})
+        self.assertEqual((grid["near_sensors"], old["near_sensors"]), (1, 1))
+        self.assertTrue(0.3 < grid["score"] < 0.7)
+        self.assertAlmostEqual(grid["score"], old["score"], delta=0.02)
+        self.assertAlmostEqual(grid["avg"], old["avg"], delta=0.03 * old["avg"])
+
+    def test_sampling_sensors_matches_the_cells(self):
+        pts = np.array([[-37.8136 + dy, 144.9631 + dx] for dy in (-0.003, 0.0, 0.0011) for dx in (-0.004, 0.0009, 0.002)])
+        score, count, _ = self.surface.sample(pts)
+        s2, c2 = sample_sensors(pts, SENSORS, bounds=(self.surface.meta["p10"], self.surface.meta["p90"]))
+        np.testing.assert_allclose(s2, score, atol=0.03)
+        np.testing.assert_allclose(c2, count, rtol=0.05, atol=1.0)
+
+    def test_no_sensor_within_60m_scores_zero_on_both_paths(self):
+        north = [(lat + 0.002, lon) for lat, lon in ROUTE]   # ~220 m north of sensor 1
+        self.surface.meta["version"] = 7
+        with patch("GlowWithIt.route_score.footfall_surface", return_value=self.surface):
+            for version in (7, 6):
+                out = route_score._footfall_score(north, payload={"sensors": SENSORS, "snapshot": {"version": version}})
+                self.assertEqual(out, {"score": 0.0, "near_sensors": 0, "avg": 0.0})
+
+
+@override_settings(PED_POLLER_THREAD=False, PED_PROFILE_PATH="/nonexistent/ped_profile.bin")
+class PedHeatTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ped_snapshot._LOCAL["snap"] = None
+        ped_snapshot._SURFACES.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv = Path(self.tmp.name) / "sensors.csv"
+        _write_sensor_csv(self.csv)
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_heat_layer_is_built_once_per_snapshot(self, mock_fetch):
+        mock_fetch.return_value = _minute_rows({1: 400, 2: 90, 3: 10})
+        with patch("GlowWithIt.ped_snapshot.request_refresh"), patch("GlowWithIt.views.CSV_PATH", self.csv):
+            none = self.client.get(reverse("ped_heat"))
+        self.assertEqual(none.status_code, 503)
+        ped_snapshot.poll_once()
+        with patch("GlowWithIt.views.CSV_PATH", self.csv), \
+             patch("GlowWithIt.ped_snapshot.build_surface", wraps=ped_snapshot.build_surface) as build:
+            a = self.client.get(reverse("ped_heat"), {"stride": 2}).json()
+            b = self.client.get(reverse("ped_heat"), {"stride": 8}).json()
+            bad = self.client.get(reverse("ped_heat"), {"stride": "x"})
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(bad.status_code, 400)
+        self.assertTrue(a["points"])
+        self.assertGreater(len(a["points"]), len(b["points"]))
+        self.assertEqual(a["snapshot"]["version"], 1)
+
+    @override_settings(PED_SURFACE_CACHE_SIZE=2)
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_surfaces_are_keyed_by_covered_minutes_and_bounded(self, mock_fetch):
+        mock_fetch.return_value = _minute_rows({1: 400, 2: 90, 3: 10})
+        ped_snapshot.poll_once()
+        with patch("GlowWithIt.views.CSV_PATH", self.csv), \
+             patch("GlowWithIt.ped_snapshot.build_surface", wraps=ped_snapshot.build_surface) as build:
+            codes = [self.client.get(reverse("ped_heat"), {"minutes": m}).status_code for m in (60, 90, 180, 0, 181)]
+            self.assertEqual(build.call_count, 1)      # the series holds 60 minutes: all three are one grid
+            for m in (15, 30, 45):
+                ped_snapshot.footfall_surface(self.csv, m)
+        self.assertEqual(codes, [200, 200, 200, 400, 400])
+        self.assertEqual(sorted(ped_snapshot._SURFACES), [30, 45])
@@ -0,0 +1,181 @@
+from django.test import SimpleTestCase
+import math
+import random
+import time
+
+import numpy as np
+
+from GlowWithIt import geometry
+from GlowWithIt.views import min_distance_geometry_to_route
+
+# Google's reference polyline: (38.5,-120.2) -> (40.7,-120.95) -> (43.252,-126.453)
+POLYLINE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def _ref_dist(pt_lat, pt_lng, route):
+    """Straight scalar loop, as the old per-point helpers did it (with wy * vy)."""
+    ref_lat, ref_lng = route[0]
+    lat_m, lng_m = geometry.meters_per_degree(ref_lat)
+    def to_xy(lat, lng): return (lng - ref_lng) * lng_m, (lat - ref_lat) * lat_m
+    px, py = to_xy(pt_lat, pt_lng); dmin = float("inf")
+    for (a_lat, a_lng), (b_lat, b_lng) in zip(route[:-1], route[1:]):
+        ax, ay = to_xy(a_lat, a_lng); bx, by = to_xy(b_lat, b_lng)
+        vx, vy = bx - ax, by - ay
+        wx, wy = px - ax, py - ay
+        v2 = vx * vx + vy * vy
+        t = 0.0 if v2 == 0 else max(0.0, min(1.0, (wx * vx + wy * vy) / v2))
+        dmin = min(dmin, math.hypot(px - ax - t * vx, py - ay - t * vy))
+    return dmin
+
+
+class PolylineCodecTests(SimpleTestCase):
+
+    def test_decodes_reference_polyline(self):
+        self.assertEqual(geometry.decode_polyline(POLYLINE), [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)])
+        self.assertEqual(geometry.decode_polyline_np(POLYLINE).shape, (3, 2))
+        self.assertEqual(geometry.decode_polyline(""), [])
+
+    def test_round_trips_random_routes(self):
+        rnd = random.Random(3)
+        for _ in range(100):
+            route = [(round(rnd.uniform(-85, 85), 5), round(rnd.uniform(-179, 179), 5))
+                     for _ in range(rnd.randint(1, 40))]
+            self.assertEqual(geometry.decode_polyline(geometry.encode_polyline(route)), route)
+
+    def test_malformed_polylines_raise(self):
+        for bad in ("not_a_polyline", POLYLINE[:5], "ab c", "é"):
+            with self.assertRaises(ValueError):
+                geometry.decode_polyline(bad)
+
+
+class DistanceKernelTests(SimpleTestCase):
+
+    def setUp(self):
+        rnd = random.Random(11)
+        self.route = [(-37.81 + rnd.uniform(-0.01, 0.01), 144.96 + rnd.uniform(-0.01, 0.01)) for _ in range(30)]
+        self.route.insert(10, self.route[9])  # zero-length segment
+        self.points = [(-37.81 + rnd.uniform(-0.02, 0.02), 144.96 + rnd.uniform(-0.02, 0.02)) for _ in range(500)]
+
+    def test_batched_distances_match_scalar_reference(self):
+        got = geometry.min_dist_points_to_polyline_m(self.points, self.route)
+        for d, (lat, lng) in zip(got, self.points):
+            self.assertAlmostEqual(d, _ref_dist(lat, lng, self.route), places=6)
+
+    def test_projection_uses_both_axes(self):
+        """A point beside the middle of a diagonal segment projects onto it (the old views copy dropped wy * vy)."""
+        route = [(-37.8100, 144.9600), (-37.8200, 144.9700)]
+        mid = (-37.8150 + 0.0002, 144.9650 - 0.0002)
+        self.assertAlmostEqual(geometry.min_dist_point_to_polyline_m(*mid, route), _ref_dist(*mid, route), places=6)
+        self.assertLess(geometry.min_dist_point_to_polyline_m(*mid, route), 30.0)
+
+    def test_degenerate_inputs(self):
+        self.assertEqual(geometry.min_dist_point_to_polyline_m(-37.81, 144.96, [(-37.81, 144.96)]), float("inf"))
+        self.assertEqual(len(geometry.min_dist_points_to_polyline_m([], self.route)), 0)
+
+    def test_geometry_to_route_measures_every_vertex(self):
+        line = {"type": "LineString", "coordinates": [[lng, lat] for lat, lng in self.points[:20]]}
+        expected = min(_ref_dist(lat, lng, self.route) for lat, lng in self.points[:20])
+        self.assertAlmostEqual(min_distance_geometry_to_route(line, self.route), expected, places=6)
+        coll = {"type": "GeometryCollection", "geometries": [line, {"type": "Point", "coordinates": [144.96, -37.81]}]}
+        self.assertLessEqual(min_distance_geometry_to_route(coll, self.route), expected)
+        self.assertEqual(min_distance_geometry_to_route({"type": "Point", "coordinates": []}, self.route), float("inf"))
+
+
+class SimplifyTests(SimpleTestCase):
+
+    def _dense_route(self):
+        """Four straight 400 m legs sampled every 8 m with ~1 m of jitter."""
+        rnd = random.Random(5)
+        lat, lng = -37.8100, 144.9600
+        lat_m, lng_m = geometry.meters_per_degree(lat)
+        route = [(lat, lng)]
+        for dx, dy in ((8, 0), (0, 8), (-8, 0), (0, 8)):
+            for _ in range(50):
+                lat += (dy + rnd.uniform(-1, 1)) / lat_m
+                lng += (dx + rnd.uniform(-1, 1)) / lng_m
+                route.append((lat, lng))
+        return route
+
+    def test_stays_within_tolerance_and_keeps_endpoints(self):
+        route = self._dense_route()
+        out = geometry.simplify_polyline(route, 4.0)
+        self.assertLess(len(out), len(route) // 10)
+        self.assertEqual((out[0], out[-1]), (route[0], route[-1]))
+        self.assertLessEqual(geometry.min_dist_points_to_polyline_m(route, out).max(), 4.0 + 1e-6)
+
+    def test_zero_tolerance_and_short_routes_are_untouched(self):
+        route = self._dense_route()
+        self.assertEqual(geometry.simplify_polyline(route, 0), route)
+        self.assertEqual(geometry.simplify_polyline(route[:2], 4.0), route[:2])
+
+
+class RouteContextTests(SimpleTestCase):
+
+    def setUp(self):
+        rnd = random.Random(17)
+        self.route = [(-37.81 + rnd.uniform(-0.01, 0.01), 144.96 + rnd.uniform(-0.01, 0.01)) for _ in range(25)]
+        self.points = [(-37.81 + rnd.uniform(-0.02, 0.02), 144.96 + rnd.uniform(-0.02, 0.02)) for _ in range(200)]
+
+    def test_distances_match_scalar_reference(self):
+        rc = geometry.RouteContext(self.route)
+        for d, (lat, lng) in zip(rc.dist_m(self.points), self.points):
+            self.assertAlmostEqual(d, _ref_dist(lat, lng, self.route), places=6)
+
+    def test_precomputed_arrays(self):
+        rc = geometry.RouteContext(self.route)
+        self.assertIs(geometry.RouteContext.of(rc), rc)
+        self.assertEqual(rc.seg_v.shape, (24, 2))
+        lat_m, lng_m = geometry.meters_per_degree(self.route[0][0])
+        legs = [math.hypot((b[1] - a[1]) * lng_m, (b[0] - a[0]) * lat_m) for a, b in zip(self.route, self.route[1:])]
+        self.assertAlmostEqual(rc.cum_len[5], sum(legs[:5]), places=6)
+        self.assertAlmostEqual(rc.length_m, sum(legs), places=6)
+        self.assertEqual(rc.bbox, (min(p[1] for p in self.route), min(p[0] for p in self.route),
+                                   max(p[1] for p in self.route), max(p[0] for p in self.route)))
+
+    def test_padded_bbox_matches_route_bbox(self):
+        from GlowWithIt.route_score import _route_bbox
+        rc = geometry.RouteContext(self.route)
+        for pad in (0, 50, 800):
+            self.assertEqual(_route_bbox(rc, pad), _route_bbox(self.route, pad))
+
+
+class PointGridTests(SimpleTestCase):
+
+    def setUp(self):
+        rnd = random.Random(23)
+        self.points = [(-37.81 + rnd.uniform(-0.03, 0.03), 144.96 + rnd.uniform(-0.03, 0.03)) for _ in range(400)]
+        self.grid = geometry.PointGrid(self.points, cell_m=60.0)
+        self.rnd = rnd
+
+    def test_route_buffer_matches_brute_force(self):
+        for _ in range(50):
+            route = [(-37.81 + self.rnd.uniform(-0.03, 0.03), 144.96 + self.rnd.uniform(-0.03, 0.03))
+                     for _ in range(self.rnd.randint(2, 8))]
+            d = geometry.min_dist_points_to_polyline_m(self.points, route)
+            idx, dist = self.grid.within_route(route, 60.0)
+            self.assertEqual(idx.tolist(), [i for i, x in enumerate(d) if x <= 60.0])
+            for i, x in zip(idx.tolist(), dist.tolist()):
+                self.assertAlmostEqual(x, d[i], places=6)
+
+    def test_nearest_matches_brute_force(self):
+        xy = self.grid.xy
+        for _ in range(50):
+            lat, lng = -37.81 + self.rnd.uniform(-0.05, 0.05), 144.96 + self.rnd.uniform(-0.05, 0.05)
+            p = geometry.project_np([(lat, lng)], self.grid.ref_lat, self.grid.ref_lng)[0]
+            expected = sorted(math.hypot(x - p[0], y - p[1]) for x, y in xy)[:3]
+            _, got = self.grid.nearest(lat, lng, k=3)
+            self.assertEqual(len(got), 3)
+            for a, b in zip(got, expected):
+                self.assertAlmostEqual(a, b, places=6)
+        self.assertEqual(len(self.grid.nearest(-37.81, 144.96, k=3, max_m=0.5)[0]), 0)
+        self.assertEqual(len(geometry.PointGrid([]).nearest(-37.81, 144.96)[0]), 0)
+
+    def test_nearest_from_far_away_skips_the_empty_rings(self):
+        xy = self.grid.xy
+        for lat, lng in ((-42.0, 147.0), (-39.5, 144.96), (0.0, 0.0)):
+            p = geometry.project_np([(lat, lng)], self.grid.ref_lat, self.grid.ref_lng)[0]
+            t0 = time.perf_counter()
+            idx, _ = self.grid.nearest(lat, lng, k=2)
+            self.assertLess(time.perf_counter() - t0, 0.5)
+            d = np.hypot(*(xy - p).T)
+            self.assertEqual(idx.tolist(), np.argsort(d, kind="stable")[:2].tolist())
@@ -0,0 +1,108 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from datetime import datetime
+
+from GlowWithIt import opening_hours, route_score
+from GlowWithIt.opening_hours import DAY_MINUTES, MEL_TZ, compile_hours, parse_day_text, parse_osm
+
+# 2025-06-02 is a Monday
+MON = datetime(2025, 6, 2, tzinfo=MEL_TZ)
+
+
+def _at(day, hh, mm=0):
+    return MON.replace(day=2 + day, hour=hh, minute=mm)
+
+
+def _row(raw=None, **days):
+    return {"opening_hours_raw": raw, **{d: days.get(d) for d in opening_hours.DAY_FIELDS}}
+
+
+class ParseTests(SimpleTestCase):
+
+    def test_day_text_forms(self):
+        self.assertEqual(parse_day_text("9:00 AM – 5:00 PM"), [(540, 1020)])
+        self.assertEqual(parse_day_text("9-5pm"), [(540, 1020)])
+        self.assertEqual(parse_day_text("11:30-14:30, 17:00-22:00"), [(690, 870), (1020, 1320)])
+        self.assertEqual(parse_day_text("10am-2am"), [(600, DAY_MINUTES + 120)])
+        self.assertEqual(parse_day_text("9-5"), [(540, 1020)])
+        self.assertEqual(parse_day_text("11:30-2:30"), [(690, 870)])
+        self.assertEqual(parse_day_text("22:00-02:00"), [(1320, DAY_MINUTES + 120)])
+        self.assertEqual(parse_day_text("10:00-02:00"), [(600, DAY_MINUTES + 120)])
+        self.assertEqual(parse_day_text("Open 24 hours"), [(0, DAY_MINUTES)])
+        self.assertEqual(parse_day_text("Closed"), [])
+        self.assertIsNone(parse_day_text("ask at the bar"))
+        self.assertIsNone(parse_day_text(""))
+
+    def test_osm_rules(self):
+        days = parse_osm("Mo-Fr 08:00-18:00; Sa 10:00-14:00; Su off")
+        self.assertEqual(days[0], [(480, 1080)])
+        self.assertEqual(days[4], [(480, 1080)])
+        self.assertEqual(days[5], [(600, 840)])
+        self.assertEqual(days[6], [])
+        # comma inside a selector vs. comma starting an additional rule
+        days = parse_osm("Mo-Th,Su 11:00-22:00; Fr,Sa 11:00-01:00")
+        self.assertEqual(days[6], [(660, 1320)])
+        self.assertEqual(days[5], [(660, DAY_MINUTES + 60)])
+        days = parse_osm("Mo-Sa 09:00-12:00, Sa 13:00-17:00; We off")
+        self.assertEqual(days[5], [(540, 720), (780, 1020)])
+        self.assertEqual(days[2], [])
+        self.assertEqual(parse_osm("24/7"), [[(0, DAY_MINUTES)]] * 7)
+        # date-bound rules are skipped, not misread as every week
+        self.assertEqual(parse_osm("Dec 25 off"), [None] * 7)
+
+
+class OpeningHoursTests(SimpleTestCase):
+
+    def test_open_now_and_midnight_spill(self):
+        oh = compile_hours(_row(fri="10am-2am", sat="Closed", mon="9am-5pm"))
+        self.assertTrue(oh.is_open(_at(4, 23, 30)))
+        self.assertTrue(oh.is_open(_at(5, 1, 59)))    # Friday's hours run into Saturday
+        self.assertFalse(oh.is_open(_at(5, 2, 0)))
+        self.assertFalse(oh.is_open(_at(0, 8, 59)))
+        self.assertIsNone(oh.is_open(_at(1, 12)))     # Tuesday: no hours given
+        self.assertTrue(oh.open_within(_at(0, 8, 50), 15))
+        self.assertFalse(oh.open_within(_at(0, 8, 30), 15))
+        self.assertFalse(oh.is_247)
+
+    def test_sunday_night_wraps_to_monday(self):
+        oh = compile_hours(_row(sun="8pm-3am"))
+        self.assertTrue(oh.is_open(_at(0, 2, 30)))
+        self.assertTrue(oh.open_within(_at(6, 19, 50), 15))
+        self.assertTrue(oh.open_within(oh.minute_of_week(_at(6, 19, 50)), 15))
+
+    def test_columns_override_osm_per_day(self):
+        oh = compile_hours(_row("Mo-Su 08:00-18:00", sat="Closed", sun=""))
+        self.assertTrue(oh.is_open(_at(2, 12)))
+        self.assertFalse(oh.is_open(_at(5, 12)))
+        self.assertTrue(oh.is_open(_at(6, 12)))       # blank column: OSM still applies
+        self.assertTrue(compile_hours(_row(**{d: "24/7" for d in opening_hours.DAY_FIELDS})).is_247)
+
+    def test_rows_with_the_same_hours_compile_once(self):
+        opening_hours._compile.cache_clear()
+        a = compile_hours(_row("Mo-Fr 09:00-17:00", sat="10am-4pm"))
+        b = compile_hours(_row("Mo-Fr 09:00-17:00", sat="10am-4pm"))
+        self.assertIs(a, b)
+        self.assertEqual(opening_hours._compile.cache_info().misses, 1)
+
+
+class VenuesScoreTests(SimpleTestCase):
+
+    def test_only_open_venues_help(self):
+        route = [(-37.8136, 144.9600), (-37.8136, 144.9660)]
+        venues = [
+            {"latitude": -37.8137, "longitude": 144.9620, "name": "bar", **_row(fri="6pm-3am")},
+            {"latitude": -37.8135, "longitude": 144.9640, "name": "office", **_row(fri="Closed")},
+            {"latitude": -37.8136, "longitude": 144.9650, "name": "cafe", **_row("Mo-Fr 07:00-15:00")},
+        ]
+        bbox = route_score._route_bbox(route, pad_m=200)
+        helpful = {}
+        with patch("GlowWithIt.route_score.datetime") as dt:
+            for label, when in (("night", _at(4, 23)), ("lunch", _at(4, 12)),
+                                ("between", _at(4, 16)), ("opening", _at(4, 17, 50))):
+                dt.now.return_value = when
+                out = route_score._venues_score(route, bbox, venues=venues)
+                helpful[label] = out["openish"]
+        self.assertEqual(out["near_venues"], 3)
+        self.assertGreater(out["score"], 0.0)
+        # the bar at night, the cafe at lunch, nothing at 4pm, the bar again 10 minutes before it opens
+        self.assertEqual(helpful, {"night": 1, "lunch": 1, "between": 0, "opening": 1})
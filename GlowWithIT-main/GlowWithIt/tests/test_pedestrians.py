@@ -0,0 +1,395 @@
+from django.test import SimpleTestCase, override_settings
+from django.core.cache import cache
+from unittest.mock import patch
+from pathlib import Path
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import requests
+from django.urls import reverse
+
+from django.core.management import call_command
+
+from GlowWithIt import pedestrians, ped_profile, ped_snapshot, route_score
+from GlowWithIt.ped_series import MinuteSeries
+
+
+def _write_sensor_csv(path, n=60, seed=3):
+    rnd = random.Random(seed)
+    rows = ["location_id,sensor_description,latitude,longitude,status"]
+    for lid in range(1, n + 1):
+        rows.append(f"{lid},Sensor {lid},{-37.813 + rnd.uniform(-0.02, 0.02)},{144.963 + rnd.uniform(-0.02, 0.02)},A")
+    rows.append("bad,No id,-37.81,144.96,A")
+    rows.append("99,No coords,,,A")
+    Path(path).write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+
+class SensorRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv = Path(self.tmp.name) / "sensors.csv"
+        _write_sensor_csv(self.csv)
+        pedestrians._REGISTRY_CACHE.update({"path": None, "mtime_ns": -1, "size": -1, "registry": None})
+
+    def test_parsed_once_until_the_file_changes(self):
+        with patch("GlowWithIt.pedestrians.load_sensor_metadata", wraps=pedestrians.load_sensor_metadata) as load:
+            first = pedestrians.get_sensor_registry(self.csv)
+            self.assertIs(pedestrians.get_sensor_registry(self.csv), first)
+            self.assertEqual(load.call_count, 1)
+
+            _write_sensor_csv(self.csv, n=70)
+            st = os.stat(self.csv)
+            os.utime(self.csv, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+            second = pedestrians.get_sensor_registry(self.csv)
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(len(second.ids), 70)
+
+    def test_registry_is_read_only(self):
+        reg = pedestrians.get_sensor_registry(self.csv)
+        with self.assertRaises(TypeError):
+            reg.meta[1] = {}
+        with self.assertRaises(ValueError):
+            reg.lat[0] = 0.0
+
+    def test_bbox_mask_matches_per_sensor_loop(self):
+        meta = pedestrians.load_sensor_metadata(self.csv)
+        reg = pedestrians.get_sensor_registry(self.csv)
+        bbox = (144.955, -37.820, 144.970, -37.805)
+        expected = [lid for lid, m in meta.items()
+                    if bbox[1] <= m["lat"] <= bbox[3] and bbox[0] <= m["lon"] <= bbox[2]]
+        self.assertTrue(expected)
+        with patch.object(pedestrians.SensorRegistry, "from_meta") as build:
+            self.assertEqual(pedestrians.sensor_ids_in_bbox(reg, bbox), expected)
+        build.assert_not_called()
+        self.assertEqual(reg.ids_in_bbox(bbox), expected)
+        self.assertIsNone(pedestrians.sensor_ids_in_bbox(reg, None))
+        self.assertIsNone(pedestrians.sensor_ids_in_bbox(reg, (0.0, 0.0, 1.0, 1.0)))
+
+    def test_nearest_sensors(self):
+        reg = pedestrians.get_sensor_registry(self.csv)
+        lid, dist = reg.nearest(float(reg.lat[4]), float(reg.lon[4]))[0]
+        self.assertEqual((lid, dist), (int(reg.ids[4]), 0.0))
+        self.assertEqual(len(reg.nearest(-37.813, 144.963, k=5)), 5)
+
+    @patch("GlowWithIt.pedestrians.fetch_live_counts")
+    def test_live_payload_reuses_registry(self, mock_fetch):
+        mock_fetch.return_value = [{"location_id": 1, "pedestriancount": 40}, {"location_id": 2, "pedestriancount": 90}]
+        with patch("GlowWithIt.pedestrians.load_sensor_metadata", wraps=pedestrians.load_sensor_metadata) as load:
+            for _ in range(3):
+                out = pedestrians.build_live_payload(self.csv)
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual([s["id"] for s in out["sensors"]], [1, 2])
+
+
+class MinuteSeriesTests(SimpleTestCase):
+
+    def test_windows_match_direct_sums(self):
+        rnd = random.Random(5)
+        series = MinuteSeries(capacity=180)
+        truth = {}
+        for end in (1000, 1060, 1120):  # three polls, each covering the past hour
+            rows = [(lid, m, rnd.randint(0, 30)) for lid in (3, 7, 11) for m in range(end - 59, end + 1)]
+            series.ingest(rows, end_minute=end, span=60)
+            truth.update({(lid, m): c for lid, m, c in rows})
+        self.assertEqual(series.covered_minutes(), 180)
+        for minutes in (1, 15, 30, 60, 120, 180):
+            expected = [sum(truth[(lid, m)] for m in range(1120 - minutes + 1, 1121)) for lid in (3, 7, 11)]
+            self.assertEqual(series.window(minutes).tolist(), expected)
+        self.assertEqual([r["location_id"] for r in series.count_rows(15)], [3, 7, 11])
+
+    def test_gaps_and_late_rows(self):
+        series = MinuteSeries(capacity=30)
+        series.ingest([(1, m, 1) for m in range(91, 101)], end_minute=100, span=10)
+        self.assertTrue(series.covers(10))
+        self.assertFalse(series.covers(11))
+        series.ingest([(1, 100, 5), (2, 104, 2)], end_minute=105, span=6)  # late row for minute 100
+        self.assertEqual(series.covered_minutes(), 14)                      # 105 isn't published yet
+        self.assertEqual(series.window(15).tolist(), [9 + 5, 2])
+        series.ingest([(2, 200, 3)], end_minute=200, span=5)  # outage longer than the ring
+        self.assertEqual(series.covered_minutes(), 5)
+        self.assertEqual(series.window(30).tolist(), [0, 3])
+        series.ingest([], end_minute=210, span=10)            # an empty fetch tells us nothing
+        self.assertEqual((series.head, series.covered_minutes()), (200, 5))
+
+    def test_minutes_published_late_are_fetched_again(self):
+        series = MinuteSeries(capacity=30)
+        series.ingest([(1, m, 1) for m in range(91, 101)], end_minute=100, span=10)
+        # minutes 104-105 lag upstream: they are not marked as fetched zeros
+        series.ingest([(1, m, 1) for m in range(96, 104)], end_minute=105, span=10)
+        self.assertEqual((series.head, series.covered_minutes()), (103, 13))
+        # the next poll re-fetches from the newest minute seen (refresh_snapshot's span)
+        series.ingest([(1, m, 2) for m in range(99, 111)], end_minute=110, span=110 - series.head + 5)
+        self.assertEqual(series.covered_minutes(), 20)
+        self.assertEqual(series.window(20).tolist(), [8 * 1 + 12 * 2])
+
+
+def _minute_rows(counts, minutes=60, now=None):
+    """fetch_minute_counts() rows: `counts` per sensor spread evenly over the last `minutes`."""
+    end = int((time.time() if now is None else now) // 60)
+    rows = []
+    for lid, total in counts.items():
+        for i in range(minutes):
+            iso = datetime.fromtimestamp((end - i) * 60, tz=timezone.utc).isoformat()
+            rows.append({"location_id": lid, "sensing_datetime": iso,
+                         "pedestriancount": total // minutes + (1 if i < total % minutes else 0)})
+    return rows
+
+
+@override_settings(PED_POLLER_THREAD=False, PED_SNAPSHOT_MAX_AGE_S=180, PED_PROFILE_PATH="/nonexistent/ped_profile.bin")
+class PedSnapshotTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ROWS = _minute_rows({1: 40, 2: 90})
+        cache.clear()
+        ped_snapshot._LOCAL["snap"] = None
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv = Path(self.tmp.name) / "sensors.csv"
+        _write_sensor_csv(self.csv)
+        ped_snapshot._STATE["refresh"] = None
+        self.addCleanup(self._join_refresh)
+
+    def _join_refresh(self):
+        # background refreshes must not outlive the test's patches
+        if ped_snapshot._STATE["refresh"] is not None:
+            ped_snapshot._STATE["refresh"].join(5)
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_poll_publishes_versioned_snapshot(self, mock_fetch):
+        mock_fetch.return_value = self.ROWS
+        ped_snapshot.poll_once()
+        self.assertEqual(mock_fetch.call_args.kwargs["minutes"], 60)
+        ped_snapshot.poll_once()
+        self.assertLessEqual(mock_fetch.call_args.kwargs["minutes"], 7)  # only the new minutes + overlap
+        snap = ped_snapshot.get_ped_snapshot()
+        self.assertEqual(snap.version, 2)
+        self.assertEqual(snap.counts(60), [{"location_id": 1, "pedestriancount": 40},
+                                           {"location_id": 2, "pedestriancount": 90}])
+
+    @patch("GlowWithIt.pedestrians.fetch_live_counts")
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_every_window_from_one_fetch(self, mock_fetch, mock_aggregate):
+        mock_fetch.return_value = self.ROWS
+        ped_snapshot.poll_once()
+        out = {m: ped_snapshot.live_payload(self.csv, minutes=m) for m in (15, 30, 60, 120)}
+        self.assertEqual(mock_fetch.call_count, 1)
+        mock_aggregate.assert_not_called()
+        self.assertEqual([s["count_60m"] for s in out[60]["sensors"]], [40, 90])
+        self.assertEqual([s["count_60m"] for s in out[15]["sensors"]], [15, 30])
+        self.assertEqual(out[120]["snapshot"]["minutes_covered"], 60)  # until a second hour accumulates
+        self.assertEqual([out[m]["minutes_window"] for m in (15, 120)], [15, 60])
+        self.assertEqual([s["count_60m"] for s in out[120]["sensors"]], [40, 90])
+
+    @patch("GlowWithIt.pedestrians.fetch_live_counts")
+    def test_payload_reads_snapshot_without_upstream(self, mock_direct):
+        with patch("GlowWithIt.ped_snapshot.fetch_minute_counts", return_value=self.ROWS):
+            ped_snapshot.poll_once()
+        out = ped_snapshot.live_payload(self.csv, minutes=60)
+        mock_direct.assert_not_called()
+        self.assertEqual([s["id"] for s in out["sensors"]], [1, 2])
+        self.assertEqual(out["snapshot"]["version"], 1)
+        self.assertLess(out["snapshot"]["age_s"], 5)
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_stale_snapshot_is_served_and_refreshed_in_background(self, mock_fetch):
+        mock_fetch.return_value = _minute_rows({1: 40, 2: 90}, now=time.time() - 600)
+        with patch("GlowWithIt.ped_snapshot.time.time", return_value=time.time() - 600):
+            ped_snapshot.poll_once()
+        mock_fetch.return_value = _minute_rows({1: 40})
+        with patch("GlowWithIt.ped_snapshot.threading.Thread") as thread:
+            west = ped_snapshot.live_payload(self.csv, minutes=60, bbox=(144.90, -37.90, 144.963, -37.70))
+            east = ped_snapshot.live_payload(self.csv, minutes=60, bbox=(144.963, -37.90, 145.10, -37.70))
+        self.assertEqual(mock_fetch.call_count, 1)   # the poll only: requests don't wait on the upstream
+        self.assertEqual(thread.call_count, 1)       # one background refresh claimed for both bboxes
+        self.assertTrue(west["snapshot"]["stale"])
+        self.assertGreater(west["snapshot"]["age_s"], 590)
+        self.assertEqual(len(west["sensors"]) + len(east["sensors"]), 2)
+        ped_snapshot._refresh_job()
+        self.assertEqual(ped_snapshot.live_payload(self.csv, minutes=60)["snapshot"]["version"], 2)
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_without_snapshot_or_profile_requests_get_503(self, mock_fetch):
+        mock_fetch.side_effect = requests.ConnectionError("down")
+        with patch("GlowWithIt.ped_snapshot.request_refresh") as kick:
+            with self.assertRaises(ped_snapshot.PedUnavailable):
+                ped_snapshot.live_payload(self.csv, minutes=60)
+            with patch("GlowWithIt.views.CSV_PATH", self.csv):
+                resp = self.client.get(reverse("ped_live"))
+        mock_fetch.assert_not_called()
+        self.assertTrue(kick.called)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Cache-Control"], "no-store")
+        # route scoring carries on without footfall
+        payload = route_score._footfall_payload(60)
+        self.assertEqual((payload["source"], payload["sensors"]), ("unavailable", []))
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_ped_live_caches_one_payload_for_every_bbox(self, mock_fetch):
+        mock_fetch.return_value = self.ROWS
+        ped_snapshot.poll_once()
+        with patch("GlowWithIt.views.CSV_PATH", self.csv):
+            a = self.client.get(reverse("ped_live"), {"bbox": "144.90,-37.90,145.10,-37.70"})
+            b = self.client.get(reverse("ped_live"), {"bbox": "144.90,-37.90,144.91,-37.89"})
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual((a["X-Cache"], b["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(len(a.json()["sensors"]), 2)
+        self.assertEqual(b.json()["sensors"], [])
+        self.assertIn("X-Snapshot-Age", b)
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_ped_live_scores_footfall_within_the_bbox(self, mock_fetch):
+        mock_fetch.return_value = self.ROWS
+        ped_snapshot.poll_once()
+        reg = pedestrians.get_sensor_registry(self.csv)
+        around_1 = f"{reg.lon[0] - 1e-4},{reg.lat[0] - 1e-4},{reg.lon[0] + 1e-4},{reg.lat[0] + 1e-4}"
+        with patch("GlowWithIt.views.CSV_PATH", self.csv):
+            city = self.client.get(reverse("ped_live")).json()["sensors"]
+            near = self.client.get(reverse("ped_live"), {"bbox": around_1}).json()["sensors"]
+            again = self.client.get(reverse("ped_live")).json()["sensors"]
+        self.assertEqual([s["footfall_score"] for s in city], [0.0, 1.0])
+        self.assertEqual([(s["id"], s["footfall_score"]) for s in near], [(1, 1.0)])
+        self.assertEqual(again, city)   # the cached city-wide payload is untouched
+
+    def test_one_leader_at_a_time(self):
+        self.assertTrue(ped_snapshot.acquire_leadership("worker-a"))
+        self.assertFalse(ped_snapshot.acquire_leadership("worker-b"))
+        self.assertTrue(ped_snapshot.acquire_leadership("worker-a"))
+        ped_snapshot.release_leadership("worker-a")
+        self.assertTrue(ped_snapshot.acquire_leadership("worker-b"))
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_ped_nearest_endpoint(self, mock_fetch):
+        mock_fetch.return_value = self.ROWS
+        ped_snapshot.poll_once()
+        reg = pedestrians.get_sensor_registry(self.csv)
+        with patch("GlowWithIt.views.CSV_PATH", self.csv):
+            out = self.client.get(reverse("ped_nearest"), {"lat": reg.lat[0], "lon": reg.lon[0], "k": 2}).json()
+            bad = self.client.get(reverse("ped_nearest"), {"lat": "x"})
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(len(out["sensors"]), 2)
+        self.assertEqual(out["sensors"][0]["id"], 1)
+        self.assertEqual(out["sensors"][0]["count_60m"], 40)
+        self.assertEqual(out["snapshot"]["version"], 1)
+
+    def test_ped_nearest_rejects_bad_max_m_and_points_outside_the_city(self):
+        reg = pedestrians.get_sensor_registry(self.csv)
+        where = {"lat": reg.lat[0], "lon": reg.lon[0]}
+        with patch("GlowWithIt.views.CSV_PATH", self.csv), patch("GlowWithIt.ped_snapshot.request_refresh"):
+            codes = [self.client.get(reverse("ped_nearest"), {**where, "max_m": v}).status_code
+                     for v in ("nan", "inf", "-5", "0", "abc")]
+            codes += [self.client.get(reverse("ped_nearest"), {"lat": lat, "lon": lon}).status_code
+                      for lat, lon in ((-42.0, 147.0), (0, 0), ("nan", 144.96))]
+            near = self.client.get(reverse("ped_nearest"), {**where, "max_m": "1"}).json()
+            unbounded = self.client.get(reverse("ped_nearest"), {**where, "k": 60}).json()
+        self.assertEqual(codes, [400] * 8)
+        self.assertEqual([s["id"] for s in near["sensors"]], [1])
+        self.assertEqual(len(unbounded["sensors"]), 20)
+
+
+class FootfallProfileTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ped_snapshot._LOCAL["snap"] = None
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv = Path(self.tmp.name) / "sensors.csv"
+        _write_sensor_csv(self.csv)
+        self.out = Path(self.tmp.name) / "ped_profile.bin"
+        settings = override_settings(PED_POLLER_THREAD=False, PED_PROFILE_PATH=self.out)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _history_csv(self):
+        # two Mondays and a Tuesday: 2025-09-01/08 (Mon), 2025-09-02 (Tue)
+        path = Path(self.tmp.name) / "hourly.csv"
+        rows = ["location_id,sensing_date,hourday,pedestriancount"]
+        rows += ["1,2025-09-01,8,100", "1,2025-09-08,8,300", "1,2025-09-01,9,600", "2,2025-09-02,8,50", "2,x,8,1"]
+        path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+        return path
+
+    def test_command_builds_weekday_hour_means(self):
+        call_command("build_ped_profile", csv=str(self._history_csv()), stdout=open(os.devnull, "w"))
+        profile = ped_profile.get_ped_profile()
+        self.assertEqual(profile.ids.tolist(), [1, 2])
+        self.assertEqual(int(profile.hourly[0, 0, 8]), 200)   # mean of the two Mondays
+        self.assertEqual(int(profile.hourly[1, 1, 8]), 50)
+        self.assertIs(ped_profile.get_ped_profile(), profile)  # cached until the file changes
+        # 60 minutes ending Monday 09:30 Melbourne: half of 08:00-09:00 and half of 09:00-10:00
+        now = datetime(2025, 9, 15, 9, 30, tzinfo=ped_profile.MEL_TZ)
+        self.assertEqual(profile.counts(60, now=now)[0], {"location_id": 1, "pedestriancount": 400})
+
+    def test_expected_walks_hours_not_minutes(self):
+        rnd = random.Random(11)
+        hourly = np.array([[[rnd.randint(0, 900) for _ in range(24)] for _ in range(7)]], dtype=np.uint16)
+        profile = ped_profile.FootfallProfile(np.array([1]), hourly)
+
+        def per_minute(minutes, now):
+            end = now.astimezone(timezone.utc).replace(second=0, microsecond=0)
+            total = 0.0
+            for k in range(minutes):
+                t = (end - timedelta(minutes=k + 1)).astimezone(ped_profile.MEL_TZ)
+                total += hourly[0, t.weekday(), t.hour] / 60.0
+            return total
+
+        # including both DST changes of 2025 (Apr 6, Oct 5)
+        for now in (datetime(2025, 9, 15, 9, 30, tzinfo=ped_profile.MEL_TZ), datetime(2025, 4, 6, 4, 17, tzinfo=timezone.utc),
+                    datetime(2025, 10, 5, 3, 0, tzinfo=ped_profile.MEL_TZ), datetime(2025, 6, 1, 23, 59, tzinfo=timezone.utc)):
+            for minutes in (0, 1, 59, 60, 61, 180, 1441, 10079):
+                self.assertAlmostEqual(profile.expected(minutes, now=now)[0], per_minute(minutes, now), places=6)
+        week = float(hourly.sum())
+        now = datetime(2025, 9, 15, 9, 30, tzinfo=ped_profile.MEL_TZ)
+        self.assertAlmostEqual(profile.expected(3 * 10080 + 90, now=now)[0], 3 * week + per_minute(90, now), places=3)
+        t0 = time.perf_counter()
+        profile.expected(10 ** 6, now=now)
+        self.assertLess(time.perf_counter() - t0, 0.05)
+
+    @patch("GlowWithIt.pedestrians.fetch_live_counts")
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_profile_answers_without_a_snapshot(self, mock_fetch, mock_aggregate):
+        self.assertEqual(ped_profile.live_deadline_s(20), 20)
+        call_command("build_ped_profile", csv=str(self._history_csv()), stdout=open(os.devnull, "w"))
+        self.assertEqual(ped_profile.live_deadline_s(20), ped_profile.PED_LIVE_DEADLINE_S)
+        with patch("GlowWithIt.ped_snapshot.request_refresh") as kick:
+            out = ped_snapshot.live_payload(self.csv, minutes=60)
+        kick.assert_called_once()
+        mock_fetch.assert_not_called()      # the request itself never calls the upstream
+        mock_aggregate.assert_not_called()
+        self.assertEqual(out["source"], "profile")
+        self.assertIsNone(out["snapshot"])
+        self.assertEqual([s["id"] for s in out["sensors"]], [1, 2])
+
+    @patch("GlowWithIt.ped_snapshot.fetch_minute_counts")
+    def test_ped_live_caches_profile_payloads_briefly(self, mock_fetch):
+        call_command("build_ped_profile", csv=str(self._history_csv()), stdout=open(os.devnull, "w"))
+        with patch("GlowWithIt.ped_snapshot.request_refresh"), patch("GlowWithIt.views.CSV_PATH", self.csv), \
+             patch("GlowWithIt.ped_snapshot.build_live_payload", wraps=pedestrians.build_live_payload) as build:
+            a = self.client.get(reverse("ped_live"), {"bbox": "144.90,-37.90,145.10,-37.70"})
+            b = self.client.get(reverse("ped_live"), {"bbox": "144.90,-37.90,144.91,-37.89"})
+        mock_fetch.assert_not_called()
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual((a["X-Cache"], b["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(a.json()["source"], "profile")
+
+
+    def test_views_clamp_the_window(self):
+        call_command("build_ped_profile", csv=str(self._history_csv()), stdout=open(os.devnull, "w"))
+        with patch("GlowWithIt.ped_snapshot.request_refresh"), patch("GlowWithIt.views.CSV_PATH", self.csv), \
+             patch("GlowWithIt.ped_profile.FootfallProfile.expected", wraps=ped_profile.get_ped_profile().expected) as expected:
+            out = self.client.get(reverse("ped_live"), {"minutes": 10 ** 6}).json()
+        self.assertEqual(out["minutes_window"], ped_snapshot.PED_SERIES_MINUTES)
+        self.assertEqual(expected.call_args.args[0], ped_snapshot.PED_SERIES_MINUTES)
+
+    @patch("GlowWithIt.pedestrians.fetch_live_counts")
+    def test_build_live_payload_falls_back_to_profile(self, mock_fetch):
+        call_command("build_ped_profile", csv=str(self._history_csv()), stdout=open(os.devnull, "w"))
+        mock_fetch.side_effect = requests.ConnectionError("down")
+        out = pedestrians.build_live_payload(self.csv)
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(out["source"], "profile")
@@ -0,0 +1,180 @@
+from django.test import SimpleTestCase, override_settings
+from django.core.cache import cache
+from unittest.mock import patch
+from pathlib import Path
+import random
+import tempfile
+
+from GlowWithIt import route_score, lighting_snapshot
+from GlowWithIt.lit_mask import LitMask, rasterize
+from GlowWithIt.lighting_pack import PackedLighting
+
+
+def _synthetic_lighting(seed=7, n_lamps=1500, n_lines=200):
+    """Random lamps + short lit polylines scattered around the CBD."""
+    rnd = random.Random(seed)
+    lamps = [(-37.813 + rnd.uniform(-0.012, 0.012), 144.963 + rnd.uniform(-0.012, 0.012))
+             for _ in range(n_lamps)]
+    lines = []
+    for _ in range(n_lines):
+        lat, lon = -37.813 + rnd.uniform(-0.012, 0.012), 144.963 + rnd.uniform(-0.012, 0.012)
+        line = [(lat, lon)]
+        for _ in range(rnd.randint(1, 5)):
+            lat += rnd.uniform(-0.002, 0.002); lon += rnd.uniform(-0.002, 0.002)
+            line.append((lat, lon))
+        lines.append(line)
+    return {"lamps": lamps, "lines": lines}
+
+
+ROUTE = [(-37.8183, 144.9671), (-37.8150, 144.9600), (-37.8102, 144.9560), (-37.8080, 144.9640)]
+
+
+@override_settings(LIGHTING_SNAPSHOT_ENABLED=False)
+class LightingBackendParityTests(SimpleTestCase):
+
+    def test_sample_route_numpy_matches_python(self):
+        """The vectorized re-sampler must produce the same samples as the reference."""
+        ref = route_score._sample_route(ROUTE, step_m=30.0)
+        vec = route_score.sample_route_np(ROUTE, step_m=30.0)
+        self.assertEqual(len(ref), len(vec))
+        for (a_lat, a_lng), (b_lat, b_lng) in zip(ref, vec.tolist()):
+            self.assertAlmostEqual(a_lat, b_lat, places=12)
+            self.assertAlmostEqual(a_lng, b_lng, places=12)
+
+    @patch("GlowWithIt.route_score._fetch_lighting_db")
+    def test_numpy_and_python_backends_agree(self, mock_fetch):
+        """Both backends must report identical coverage for the same lighting layer."""
+        for seed in (1, 2, 3):
+            mock_fetch.return_value = _synthetic_lighting(seed=seed)
+            py = route_score._lighting_score_db(ROUTE, backend="python")
+            np_ = route_score._lighting_score_db(ROUTE, backend="numpy")
+            self.assertEqual(py["samples"], np_["samples"])
+            self.assertEqual(py["coverage"], np_["coverage"])
+            self.assertEqual(py["score"], np_["score"])
+
+    @patch("GlowWithIt.route_score._fetch_lighting_db")
+    def test_empty_lighting_layer_scores_zero(self, mock_fetch):
+        mock_fetch.return_value = {"lamps": [], "lines": []}
+        for backend in ("python", "numpy"):
+            out = route_score._lighting_score_db(ROUTE, backend=backend)
+            self.assertEqual(out["coverage"], 0.0)
+            self.assertEqual(out["score"], 0.0)
+
+
+@override_settings(LIGHTING_SNAPSHOT_ENABLED=False)
+class LitMaskTests(SimpleTestCase):
+
+    def setUp(self):
+        self.lighting = _synthetic_lighting(seed=4)
+        self.mask = rasterize(self.lighting["lamps"], self.lighting["lines"])
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "lit_mask.bin"
+        self.mask.save(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_is_memory_mapped_and_identical(self):
+        loaded = LitMask.load(self.path)
+        self.assertEqual((loaded.width, loaded.height), (self.mask.width, self.mask.height))
+        self.assertTrue((loaded.bits == self.mask.bits).all())
+        lat, lon = self.lighting["lamps"][0]
+        self.assertTrue(loaded.is_lit(lat, lon))
+        self.assertFalse(loaded.is_lit(-37.7605, 145.0195))  # far corner, nothing nearby
+
+    @patch("GlowWithIt.route_score._fetch_lighting_db")
+    def test_raster_scoring_skips_db_and_tracks_exact_coverage(self, mock_fetch):
+        """With a mask on disk the route is scored by bit lookups only, close to the exact result."""
+        mock_fetch.return_value = self.lighting
+        exact = route_score._lighting_score_db(ROUTE, backend="numpy")
+        mock_fetch.reset_mock()
+        with override_settings(LIT_MASK_PATH=self.path):
+            fast = route_score._lighting_score_db(ROUTE, backend="raster")
+        mock_fetch.assert_not_called()
+        self.assertEqual(fast["samples"], exact["samples"])
+        self.assertAlmostEqual(fast["coverage"], exact["coverage"], delta=0.05)
+
+
+class LightingSnapshotTests(SimpleTestCase):
+
+    def setUp(self):
+        self.lighting = _synthetic_lighting(seed=5)
+        self._saved = dict(lighting_snapshot._STATE)
+
+    def tearDown(self):
+        lighting_snapshot._STATE.update(self._saved)
+
+    @patch("GlowWithIt.route_score._fetch_lighting_db")
+    @patch("GlowWithIt.route_score._query_lighting_db")
+    @patch("GlowWithIt.lighting_snapshot._lighting_version")
+    def test_snapshot_scores_without_db_and_reloads_on_version_change(self, mock_version, mock_query, mock_fetch):
+        """Once loaded, routes are scored from memory; a new DB version triggers exactly one reload."""
+        mock_version.return_value = "v1"
+        mock_query.return_value = self.lighting
+        mock_fetch.return_value = self.lighting
+        expected = route_score._lighting_score_db(ROUTE, backend="python")
+
+        lighting_snapshot._STATE.update({"snapshot": None, "checked_at": 0.0, "refreshing": False})
+        snap = lighting_snapshot.refresh_lighting_snapshot()
+        self.assertEqual(snap.version, "v1")
+        self.assertEqual(len(snap.lamps), len(self.lighting["lamps"]))
+
+        mock_fetch.reset_mock()
+        with override_settings(LIGHTING_SNAPSHOT_CHECK_S=3600):
+            out = route_score._lighting_score_db(ROUTE, backend="numpy")
+        mock_fetch.assert_not_called()
+        self.assertEqual(out["coverage"], expected["coverage"])
+
+        # same version -> no reload; new version -> reload
+        lighting_snapshot.refresh_lighting_snapshot()
+        self.assertEqual(mock_query.call_count, 1)
+        mock_version.return_value = "v2"
+        self.assertEqual(lighting_snapshot.refresh_lighting_snapshot().version, "v2")
+        self.assertEqual(mock_query.call_count, 2)
+
+
+    @patch("GlowWithIt.lighting_snapshot._refresh_async")
+    def test_only_the_views_start_the_refresh(self, mock_refresh):
+        lighting_snapshot._STATE.update({"snapshot": None, "checked_at": 0.0, "refreshing": False})
+        self.assertIsNone(lighting_snapshot.get_lighting_snapshot())
+        mock_refresh.assert_not_called()
+        lighting_snapshot.ensure_lighting_snapshot()
+        lighting_snapshot.ensure_lighting_snapshot()   # already refreshing
+        mock_refresh.assert_called_once()
+
+
+class LightingTileCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tiles_cover_the_requested_bbox(self):
+        bbox = (144.955, -37.820, 144.972, -37.805)
+        tiles = route_score._tiles_for_bbox(bbox)
+        minx = min(route_score._tile_bbox(x, y, 15)[0] for x, y in tiles)
+        miny = min(route_score._tile_bbox(x, y, 15)[1] for x, y in tiles)
+        maxx = max(route_score._tile_bbox(x, y, 15)[2] for x, y in tiles)
+        maxy = max(route_score._tile_bbox(x, y, 15)[3] for x, y in tiles)
+        self.assertTrue(minx <= bbox[0] and miny <= bbox[1] and maxx >= bbox[2] and maxy >= bbox[3])
+
+    @patch("GlowWithIt.route_score._query_lighting_db")
+    def test_overlapping_routes_reuse_cached_tiles(self, mock_query):
+        """A second, different route over the same tiles must not hit the DB again."""
+        mock_query.return_value = {"lamps": [(-37.8130, 144.9630)], "lines": []}
+        route_score._fetch_lighting_db((144.960, -37.815, 144.965, -37.811))
+        first = mock_query.call_count
+        self.assertGreater(first, 0)
+        out = route_score._fetch_lighting_db((144.961, -37.814, 144.964, -37.812))
+        self.assertEqual(mock_query.call_count, first)
+        self.assertEqual(out.lamps.tolist(), [[-37.8130, 144.9630]])  # de-duplicated across tiles
+
+    def test_packed_payload_round_trips_without_copy(self):
+        lighting = _synthetic_lighting(seed=6, n_lamps=50, n_lines=10)
+        packed = PackedLighting.from_lists(lighting["lamps"], lighting["lines"])
+        blob = packed.to_bytes()
+        back = PackedLighting.from_bytes(blob)
+        self.assertFalse(back.lamps.flags.owndata)  # a view over the cached bytes
+        self.assertEqual(back.lamps.tolist(), [list(p) for p in lighting["lamps"]])
+        self.assertEqual(list(back.lines()), lighting["lines"])
+        n_segs = sum(len(ln) - 1 for ln in lighting["lines"])
+        self.assertEqual(back.segments().shape, (n_segs, 4))
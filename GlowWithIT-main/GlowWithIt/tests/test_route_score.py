@@ -0,0 +1,389 @@
+from django.test import SimpleTestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from unittest.mock import patch
+from io import StringIO
+from pathlib import Path
+import json
+import random
+import tempfile
+import time
+
+from GlowWithIt import pedestrians, route_score, timing
+from GlowWithIt.geometry import RouteContext, encode_polyline
+from GlowWithIt.lighting_pack import PackedLighting
+from GlowWithIt.tests.test_pedestrians import _write_sensor_csv
+
+# Google's reference polyline: (38.5,-120.2) -> (40.7,-120.95) -> (43.252,-126.453)
+POLYLINE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def _slow(value, delay=0.2):
+    def fn(*args, **kwargs):
+        time.sleep(delay)
+        return value
+    return fn
+
+
+@override_settings(ROUTE_SCORE_CACHE_TTL=0)
+class ScoreRouteConcurrencyTests(SimpleTestCase):
+
+    def _patch_components(self, delay):
+        return [
+            patch("GlowWithIt.route_score._lighting_score_db", _slow({"score": 1.0, "coverage": 1.0, "samples": 3}, delay)),
+            patch("GlowWithIt.route_score._footfall_score", _slow({"score": 0.5, "near_sensors": 1, "avg": 10.0}, delay)),
+            patch("GlowWithIt.route_score._venues_score", _slow({"score": 0.5, "near_venues": 2}, delay)),
+            patch("GlowWithIt.route_score._disruptions_penalty", _slow({"penalty": 0.0, "near": 0}, delay)),
+        ]
+
+    def _score(self, delay=0.2):
+        patches = self._patch_components(delay)
+        for p in patches:
+            p.start()
+        try:
+            t0 = time.perf_counter()
+            out = route_score.score_route(POLYLINE)
+            return out, time.perf_counter() - t0
+        finally:
+            for p in patches:
+                p.stop()
+
+    @override_settings(ROUTE_SCORE_WORKERS=4)
+    def test_components_run_concurrently_with_timings(self):
+        """Four 200 ms components should finish in roughly one component's time, not four."""
+        out, elapsed = self._score()
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(set(out["timings_ms"]), {"lighting", "footfall", "venues", "disruptions"})
+        for ms in out["timings_ms"].values():
+            self.assertGreaterEqual(ms, 150.0)
+        # 0.40*1 + 0.25*0.5 + 0.10*0.5 - 0
+        self.assertAlmostEqual(out["overall"], 0.575, places=3)
+
+    @override_settings(ROUTE_SCORE_WORKERS=1)
+    def test_serial_mode_gives_same_result(self):
+        out, _ = self._score(delay=0.0)
+        self.assertAlmostEqual(out["overall"], 0.575, places=3)
+        self.assertEqual(out["label"], "yellow")
+
+    @override_settings(ROUTE_SCORE_WORKERS=4)
+    def test_component_errors_propagate(self):
+        with patch("GlowWithIt.route_score._lighting_score_db", side_effect=RuntimeError("boom")), \
+             patch("GlowWithIt.route_score._footfall_score", _slow({"score": 0.0}, 0.0)), \
+             patch("GlowWithIt.route_score._venues_score", _slow({"score": 0.0}, 0.0)), \
+             patch("GlowWithIt.route_score._disruptions_penalty", _slow({"penalty": 0.0}, 0.0)):
+            with self.assertRaises(RuntimeError):
+                route_score.score_route(POLYLINE)
+
+
+# two overlapping CBD alternatives for the same trip
+ROUTE_A = [(-37.8183, 144.9671), (-37.8150, 144.9600), (-37.8102, 144.9560)]
+ROUTE_B = [(-37.8183, 144.9671), (-37.8120, 144.9650), (-37.8102, 144.9560)]
+
+
+@override_settings(ROUTE_SCORE_WORKERS=1, ROUTE_SCORE_CACHE_TTL=0,
+                   LIGHTING_SNAPSHOT_ENABLED=False, LIT_MASK_PATH="/nonexistent/lit_mask.bin")
+class ScoreRoutesBatchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.payload = {"sensors": [
+            {"id": 1, "lat": -37.8150, "lon": 144.9600, "count_60m": 300},
+            {"id": 2, "lat": -37.8120, "lon": 144.9650, "count_60m": 120},
+            {"id": 3, "lat": -37.8000, "lon": 144.9900, "count_60m": 900},
+        ]}
+        registry = pedestrians.SensorRegistry.from_meta({s["id"]: s for s in self.payload["sensors"]})
+        patcher = patch("GlowWithIt.route_score.get_sensor_registry", return_value=registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.venues = [{"latitude": -37.8151, "longitude": 144.9601, "mon": "24/7", "tue": "24/7", "wed": "24/7",
+                        "thu": "24/7", "fri": "24/7", "sat": "24/7", "sun": "24/7", "name": "Servo"}]
+        self.feats = [{"geometry": {"type": "Point", "coordinates": [144.9650, -37.8120]},
+                       "properties": {"title": "Lane closure"}}]
+        self.lighting = PackedLighting.from_lists([(-37.8150, 144.9600), (-37.8120, 144.9650)], [])
+
+    def _patches(self):
+        return [
+            patch("GlowWithIt.route_score._fetch_lighting_tiles", return_value=self.lighting),
+            patch("GlowWithIt.route_score._footfall_payload", side_effect=lambda m: {"sensors": self.payload["sensors"]}),
+            patch("GlowWithIt.route_score._fetch_venues", side_effect=lambda b: route_score._in_bbox(self.venues, b, "latitude", "longitude")),
+            patch("GlowWithIt.route_score._load_disruptions", return_value=self.feats),
+        ]
+
+    def test_batch_fetches_each_source_once_and_matches_single_scoring(self):
+        polylines = [encode_polyline(ROUTE_A), encode_polyline(ROUTE_B)]
+        patches = self._patches()
+        mocks = [p.start() for p in patches]
+        try:
+            singles = [route_score.score_route(p) for p in polylines]
+            for m in mocks:
+                m.reset_mock()
+            batch = route_score.score_routes(polylines)
+        finally:
+            for p in patches:
+                p.stop()
+
+        for m in mocks:
+            self.assertEqual(m.call_count, 1)
+        for one, many in zip(singles, batch):
+            self.assertEqual(one["overall"], many["overall"])
+            self.assertEqual(one["components"], many["components"])
+        self.assertEqual(set(batch[0]["context_ms"]), {"lighting", "footfall", "venues", "disruptions"})
+
+    @override_settings(ROUTE_SIMPLIFY_TOLERANCE_M=5.0)
+    def test_routes_are_simplified_and_reduction_reported(self):
+        # ROUTE_A with every leg split into 20 collinear pieces
+        dense = [ROUTE_A[0]]
+        for (a_lat, a_lng), (b_lat, b_lng) in zip(ROUTE_A[:-1], ROUTE_A[1:]):
+            dense += [(a_lat + (b_lat - a_lat) * k / 20, a_lng + (b_lng - a_lng) * k / 20) for k in range(1, 21)]
+        patches = self._patches()
+        for p in patches:
+            p.start()
+        try:
+            out = route_score.score_routes([encode_polyline(dense)])[0]
+            single = route_score.score_route(encode_polyline(dense))
+        finally:
+            for p in patches:
+                p.stop()
+        self.assertEqual(out["meta"]["vertices"], 41)
+        self.assertEqual(out["meta"]["vertices_simplified"], 3)
+        self.assertEqual(single["meta"], out["meta"])
+
+    def test_bad_polyline_does_not_sink_the_batch(self):
+        patches = self._patches()
+        for p in patches:
+            p.start()
+        try:
+            out = route_score.score_routes([encode_polyline(ROUTE_A), "_p~iF", encode_polyline(ROUTE_A[:1])])
+        finally:
+            for p in patches:
+                p.stop()
+        self.assertIn("overall", out[0])
+        self.assertEqual(out[1]["error"], "scoring_failed")
+        self.assertEqual(out[2]["error"], "route_too_short")
+
+
+@override_settings(ROUTE_SCORE_WORKERS=1, ROUTE_SCORE_CACHE_TTL=300,
+                   LIGHTING_SNAPSHOT_ENABLED=False, LIT_MASK_PATH="/nonexistent/lit_mask.bin")
+class ScoreResultCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.score = patch("GlowWithIt.route_score._score_decoded",
+                           return_value={"overall": 0.5, "label": "yellow", "timings_ms": {"lighting": 40.0}})
+        self.mock_score = self.score.start()
+        self.addCleanup(self.score.stop)
+
+    def test_near_identical_polylines_share_a_key(self):
+        """A few meters of jitter and an extra vertex on a straight run must not change the key."""
+        jittered = [(-37.81831, 144.96712), (-37.81665, 144.96355), (-37.8150, 144.9600), (-37.81019, 144.95601)]
+        a = route_score._score_cache_key(ROUTE_A, 60, 300, "v")
+        self.assertEqual(a, route_score._score_cache_key(jittered, 60, 300, "v"))
+        self.assertNotEqual(a, route_score._score_cache_key(ROUTE_B, 60, 300, "v"))
+        self.assertNotEqual(a, route_score._score_cache_key(ROUTE_A, 30, 300, "v"))
+        self.assertNotEqual(a, route_score._score_cache_key(ROUTE_A, 60, 300, "v2"))
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = route_score.score_route(encode_polyline(ROUTE_A))
+        second = route_score.score_route(encode_polyline(ROUTE_A))
+        self.assertEqual((first["cache"], second["cache"]), ("miss", "hit"))
+        self.assertEqual(self.mock_score.call_count, 1)
+
+    def test_hit_reports_only_its_own_lookup(self):
+        """The stage times of the request that filled the cache are not replayed on a hit."""
+        route_score.score_route(encode_polyline(ROUTE_A))
+        with timing.collect() as t:
+            hit = route_score.score_route(encode_polyline(ROUTE_A))
+        self.assertEqual(set(hit["timings_ms"]), {"cache_lookup"})
+        self.assertEqual(hit["meta"]["vertices"], len(ROUTE_A))
+        self.assertEqual(set(t.as_dict()), {"decode", "simplify", "cache_lookup", "total"})
+
+    def test_batch_only_scores_cache_misses(self):
+        route_score.score_route(encode_polyline(ROUTE_A))
+        with patch("GlowWithIt.route_score._context_jobs", wraps=route_score._context_jobs) as mock_jobs, \
+             patch("GlowWithIt.route_score._iter_completed", return_value=iter(())):
+            out = route_score.score_routes([encode_polyline(ROUTE_A), encode_polyline(ROUTE_B)])
+        self.assertEqual(out[0]["cache"], "hit")
+        self.assertEqual([rc.points for rc in mock_jobs.call_args.args[0]], [ROUTE_B])
+
+
+@override_settings(ROUTE_SCORE_WORKERS=4, ROUTE_SCORE_CACHE_TTL=300)
+class UseSourcesTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        sensors = [{"id": 1, "lat": -37.8150, "lon": 144.9600, "count_60m": 300}]
+        registry = pedestrians.SensorRegistry.from_meta({s["id"]: s for s in sensors})
+        lighting = PackedLighting.from_lists([(-37.8150, 144.9600), (-37.8120, 144.9650)], [])
+        self.sources = {
+            "query_lighting_db": lambda wkt: {"lamps": [tuple(p) for p in lighting.lamps.tolist()], "lines": []},
+            "lighting_snapshot": lambda: None,
+            "lit_mask": lambda: None,
+            "live_payload": lambda csv_path, minutes=60, bbox=None, snapshot=None: {"sensors": sensors},
+            "sensor_registry": lambda csv_path: registry,
+            "venues": lambda bbox: [],
+            "disruptions": lambda: [],
+        }
+
+    def _real_sources(self):
+        boom = RuntimeError("real source read")
+        return [patch(f"GlowWithIt.route_score.{name}", side_effect=boom) for name in (
+            "_query_lighting_db", "get_lighting_snapshot", "get_lit_mask", "live_payload",
+            "get_sensor_registry", "_fetch_venues", "_load_disruptions")]
+
+    def test_pool_jobs_only_see_the_injected_sources(self):
+        patches = self._real_sources()
+        for p in patches:
+            p.start()
+        try:
+            with route_score.use_sources(**self.sources):
+                single = route_score.score_route(encode_polyline(ROUTE_A))
+                batch = route_score.score_routes([encode_polyline(ROUTE_A), encode_polyline(ROUTE_B)])
+        finally:
+            for p in patches:
+                p.stop()
+        self.assertEqual(single["components"]["footfall"]["near_sensors"], 1)
+        self.assertEqual(single["components"], batch[0]["components"])
+        self.assertNotIn("error", batch[1])
+
+    def test_scores_and_tiles_stay_out_of_the_shared_cache(self):
+        with route_score.use_sources(**self.sources):
+            first = route_score.score_route(encode_polyline(ROUTE_A))
+            second = route_score.score_route(encode_polyline(ROUTE_A))
+        self.assertNotIn("cache", first)
+        self.assertNotIn("cache", second)
+        x, y = route_score._tiles_for_bbox(route_score._route_bbox(ROUTE_A))[0]
+        self.assertIsNone(cache.get(f"lit:tile:v2:z{route_score.LIGHTING_TILE_ZOOM}:{x}:{y}"))
+
+    def test_unknown_source_is_rejected(self):
+        with self.assertRaises(ValueError):
+            with route_score.use_sources(lighting=lambda: None):
+                pass
+
+
+class FootfallGridTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv = Path(self.tmp.name) / "sensors.csv"
+        _write_sensor_csv(self.csv, n=600, seed=9)
+        patcher = patch("GlowWithIt.route_score.PED_SENSORS_CSV", self.csv)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_registry_grid_agrees_with_a_broadcast(self):
+        reg = pedestrians.get_sensor_registry(self.csv)
+        rnd = random.Random(9)
+        sensors = [{"id": lid, "lat": m["lat"], "lon": m["lon"], "count_60m": rnd.randint(0, 900)}
+                   for lid, m in reg.meta.items() if m.get("lat") is not None]
+        payload = {"sensors": sensors}
+        for route in (ROUTE_A, ROUTE_B):
+            with patch("GlowWithIt.pedestrians.PointGrid") as build:
+                out = route_score._footfall_score(route, payload=payload)
+            build.assert_not_called()     # the registry's grid, not one per call
+            d = RouteContext.of(route).dist_m([(s["lat"], s["lon"]) for s in sensors])
+            near = [s for s, m in zip(sensors, d.tolist()) if m <= route_score.FOOTFALL_RADIUS_M]
+            self.assertGreater(len(near), 0)
+            self.assertEqual(out["near_sensors"], len(near))
+
+
+@override_settings(ROUTE_SCORE_CACHE_TTL=0)
+class ScoreRoutesStreamingTests(SimpleTestCase):
+
+    def _events(self):
+        yield {"event": "component", "route_index": 1, "name": "lighting", "result": {"score": 1.0}}
+        yield {"event": "route", "route_index": 1, "result": {"overall": 0.7, "label": "green"}}
+        yield {"event": "route", "route_index": 0, "result": {"overall": 0.2, "label": "red"}}
+
+    @patch("GlowWithIt.views.iter_score_routes")
+    def test_ndjson_streams_events_then_summary(self, mock_iter):
+        mock_iter.return_value = self._events()
+        resp = self.client.post(reverse("route_score_api"), data=json.dumps({"polylines": ["a", "b"]}),
+                                content_type="application/json", HTTP_ACCEPT="application/x-ndjson")
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(x) for x in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([e["event"] for e in lines], ["component", "route", "route", "summary"])
+        self.assertEqual(lines[1]["result"]["route_index"], 1)
+        self.assertEqual(lines[-1]["summary"], [{"i": 0, "label": "red", "score": 0.2}, {"i": 1, "label": "green", "score": 0.7}])
+
+    @patch("GlowWithIt.views.score_routes", return_value=[{"overall": 0.5, "label": "yellow"}])
+    def test_plain_json_is_still_the_default(self, _):
+        resp = self.client.post(reverse("route_score_api"), data=json.dumps({"polyline": "a"}),
+                                content_type="application/json")
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.json()["summary"], [{"i": 0, "label": "yellow", "score": 0.5}])
+
+    def test_components_stream_before_their_route(self):
+        """Each shared fetch is scored for every route as it lands; the route event follows its last component."""
+        lighting = PackedLighting.from_lists([(-37.8150, 144.9600)], [])
+        with patch("GlowWithIt.route_score._fetch_lighting_tiles", return_value=lighting), \
+             patch("GlowWithIt.route_score._footfall_payload", return_value={"sensors": []}), \
+             patch("GlowWithIt.route_score._fetch_venues", return_value=[]), \
+             patch("GlowWithIt.route_score._load_disruptions", return_value=[]), \
+             override_settings(ROUTE_SCORE_WORKERS=1, LIGHTING_SNAPSHOT_ENABLED=False, LIT_MASK_PATH="/nonexistent"):
+            events = list(route_score.iter_score_routes([encode_polyline(ROUTE_A), encode_polyline(ROUTE_B)]))
+        self.assertEqual(len(events), 2 * 4 + 2)
+        for i in (0, 1):
+            mine = [e for e in events if e["route_index"] == i]
+            self.assertEqual([e["event"] for e in mine], ["component"] * 4 + ["route"])
+            self.assertEqual(set(mine[-1]["result"]["components"]), set(route_score.COMPONENTS))
+
+
+class StageTimingTests(SimpleTestCase):
+
+    @override_settings(ROUTE_SCORE_WORKERS=4)
+    def test_stages_recorded_from_pool_threads_are_collected(self):
+        def work():
+            with timing.stage("venues_query"):
+                time.sleep(0.02)
+            return {}
+        with timing.collect() as t:
+            with timing.stage("decode"):
+                pass
+            route_score._run_components({"a": (work, (), {}), "b": (work, (), {})})
+        out = t.as_dict()
+        self.assertGreaterEqual(out["venues_query"], 35.0)  # two 20 ms stages, summed
+        self.assertIn("decode", out)
+        self.assertGreaterEqual(out["total"], out["venues_query"] / 2)
+
+    @override_settings(ROUTE_SCORE_CACHE_TTL=0)
+    def test_view_sends_server_timing_and_optional_block(self):
+        def fake(polylines, minutes):
+            with timing.stage("lighting_fetch"):
+                pass
+            return [{"overall": 0.5, "label": "yellow"}]
+        with patch("GlowWithIt.views.score_routes", side_effect=fake):
+            plain = self.client.post(reverse("route_score_api"), data=json.dumps({"polyline": "a"}),
+                                     content_type="application/json")
+            full = self.client.post(reverse("route_score_api"), data=json.dumps({"polyline": "a", "timings": True}),
+                                    content_type="application/json")
+        self.assertIn("lighting_fetch;dur=", plain["Server-Timing"])
+        self.assertIn("total;dur=", plain["Server-Timing"])
+        self.assertNotIn("timings", plain.json())
+        self.assertEqual(set(full.json()["timings"]), {"lighting_fetch", "total"})
+
+
+class BenchRouteScoreCommandTests(SimpleTestCase):
+
+    def test_tiny_run_reports_and_round_trips_a_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bench.json"
+            args = ["--lamps", "200", "--ways", "30", "--venues", "20", "--disruptions", "10",
+                    "--routes", "3", "--iterations", "5", "--warmup", "1", "--baseline", str(path)]
+            call_command("bench_route_score", *args, "--save-baseline", stdout=StringIO())
+            saved = json.loads(path.read_text())
+            self.assertEqual(set(saved["results"]), {"lighting", "footfall", "venues", "disruptions", "score_route"})
+            for r in saved["results"].values():
+                self.assertGreater(r["ops_s"], 0)
+                self.assertLessEqual(r["p50_ms"], r["p99_ms"])
+
+            # a baseline that's impossibly fast must be flagged
+            for r in saved["results"].values():
+                r["p50_ms"] = 1e-6
+            path.write_text(json.dumps(saved))
+            out = StringIO()
+            with self.assertRaises(CommandError):
+                call_command("bench_route_score", *args, "--only", "lighting", "--fail-on-regression", stdout=out)
+            self.assertIn("REGRESSION", out.getvalue())
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from GlowWithIt import pedestrians, upstream
+from GlowWithIt.tests.http_stub import StubServer
+
+
+class UpstreamClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.srv = StubServer().__enter__()
+        self.addCleanup(self.srv.__exit__, None, None, None)
+        self.client = upstream.UpstreamClient(max_per_host=2, retries=2, backoff_s=0.01)
+        self.addCleanup(self.client.close)
+
+    def test_retries_5xx_and_429_then_succeeds(self):
+        self.srv.script("/x", [(503, {}), (429, {}, {"Retry-After": "0"}), (200, {"ok": True})])
+        r = self.client.get(self.srv.url("/x"))
+        self.assertEqual(r.json(), {"ok": True})
+        self.assertEqual(len(self.srv.requests), 3)
+
+    def test_gives_back_last_response_when_retries_run_out(self):
+        self.srv.script("/x", [(502, {"error": "bad gateway"})])
+        r = self.client.get(self.srv.url("/x"), retries=1)
+        self.assertEqual(r.status_code, 502)
+        self.assertEqual(len(self.srv.requests), 2)
+        self.srv.script("/y", [(404, {})])
+        self.assertEqual(self.client.get(self.srv.url("/y")).status_code, 404)
+        self.assertEqual(len(self.srv.requests), 3)  # 4xx other than 429 is not retried
+
+    def test_keep_alive_reuses_one_connection(self):
+        self.srv.script("/x", [(200, {})])
+        for _ in range(5):
+            self.client.get(self.srv.url("/x"))
+        self.assertEqual(len(set(self.srv.client_ports)), 1)
+
+    def test_deadline_covers_the_whole_call(self):
+        self.srv.script("/slow", [(200, {}, None, 1.0)])
+        t0 = time.monotonic()
+        with self.assertRaises(upstream.DeadlineExceeded):
+            self.client.get(self.srv.url("/slow"), timeout=5, deadline_s=0.3)
+        self.assertLess(time.monotonic() - t0, 0.9)
+
+    def test_concurrency_is_bounded_per_host(self):
+        self.srv.script("/x", [(200, {}, None, 0.1)])
+        with ThreadPoolExecutor(6) as ex:
+            list(ex.map(lambda _: self.client.get(self.srv.url("/x")), range(6)))
+        self.assertEqual(len(self.srv.requests), 6)
+        self.assertLessEqual(self.srv.peak_in_flight, 2)
+
+    def test_fetch_live_counts_goes_through_client(self):
+        rows = [{"location_id": 1, "pedestriancount": 10}]
+        self.srv.script("/records", [(500, {}), (200, {"results": rows})])
+        with patch("GlowWithIt.pedestrians.OD_ENDPOINT", self.srv.url("/records")), \
+             patch("GlowWithIt.upstream._CLIENT", self.client):
+            self.assertEqual(pedestrians.fetch_live_counts(minutes=30, sensor_ids=[1, 2]), rows)
+        query = self.srv.requests[-1][2]
+        self.assertIn("location_id+IN+%281%2C2%29", query)
@@ -0,0 +1,68 @@
+# GlowWithIt/timing.py
+"""
+Per-request stage timings for route scoring.
+
+Code marks a stage with `with stage("lighting_fetch"): ...`. A view wraps the
+work in `with collect() as t:` and reads t.as_dict() / t.server_timing() for the
+JSON body and the Server-Timing header. Stages are summed, since a batch runs
+the same stage once per route, and cost nothing when no collector is active.
+Pool threads see the collector because jobs are submitted through
+contextvars.copy_context().run.
+"""
+from __future__ import annotations
+import contextvars, threading, time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+_CURRENT: contextvars.ContextVar[Optional["StageTimings"]] = contextvars.ContextVar("stage_timings", default=None)
+
+
+class StageTimings:
+    def __init__(self):
+        self._ms: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def add(self, name: str, ms: float) -> None:
+        with self._lock:
+            self._ms[name] = self._ms.get(name, 0.0) + ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            out = {k: round(v, 1) for k, v in self._ms.items()}
+        out["total"] = round(self.total_ms(), 1)
+        return out
+
+    def server_timing(self) -> str:
+        """Header value, e.g. 'decode;dur=0.2, lighting_fetch;dur=41.7, total;dur=63.0'."""
+        return ", ".join(f"{k};dur={v:.1f}" for k, v in self.as_dict().items())
+
+
+@contextmanager
+def collect() -> Iterator[StageTimings]:
+    t = StageTimings()
+    token = _CURRENT.set(t)
+    try:
+        yield t
+    finally:
+        try:
+            _CURRENT.reset(token)
+        except ValueError:
+            # a streaming body can be finished from a different context than it started in
+            _CURRENT.set(None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t = _CURRENT.get()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(name, (time.perf_counter() - t0) * 1000.0)
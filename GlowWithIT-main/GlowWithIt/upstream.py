@@ -0,0 +1,163 @@
+# GlowWithIt/upstream.py
+"""
+Shared HTTP client for the upstream APIs (City of Melbourne pedestrian counts,
+VicRoads planned disruptions, Overpass).
+
+Each host gets one keep-alive requests.Session with its own connection pool, so
+repeated calls skip the TCP+TLS handshake, and a semaphore that bounds how many
+calls are in flight to it at once. Connection errors, timeouts, 429 and 5xx are
+retried with full-jitter exponential backoff (honouring Retry-After), and every
+call can carry a deadline that covers all attempts, queueing and sleeps included.
+
+Errors are the usual requests exceptions, so `except requests.RequestException`
+keeps working; a spent deadline raises DeadlineExceeded, a requests.Timeout.
+"""
+from __future__ import annotations
+import random, threading, time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+UPSTREAM_MAX_PER_HOST = 4       # concurrent calls per host, per process
+UPSTREAM_POOL_SIZE = 8          # keep-alive connections kept per host
+UPSTREAM_RETRIES = 2
+UPSTREAM_BACKOFF_S = 0.5        # first retry waits up to this; doubles each attempt
+UPSTREAM_BACKOFF_MAX_S = 8.0
+UPSTREAM_CONNECT_TIMEOUT_S = 5.0
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The call's deadline ran out before a usable response arrived."""
+
+
+class UpstreamClient:
+
+    def __init__(self, max_per_host: int = UPSTREAM_MAX_PER_HOST, pool_size: int = UPSTREAM_POOL_SIZE,
+                 retries: int = UPSTREAM_RETRIES, backoff_s: float = UPSTREAM_BACKOFF_S,
+                 backoff_max_s: float = UPSTREAM_BACKOFF_MAX_S, connect_timeout_s: float = UPSTREAM_CONNECT_TIMEOUT_S):
+        self.max_per_host = max_per_host
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self.connect_timeout_s = connect_timeout_s
+        self._sessions: Dict[str, requests.Session] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url: str):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if host not in self._sessions:
+                s = requests.Session()
+                # retries are ours (with jitter and the deadline), not urllib3's
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                s.mount(host, adapter)
+                self._sessions[host] = s
+                self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._sessions[host], self._slots[host]
+
+    def _backoff(self, attempt: int, resp: Optional[requests.Response], base_s: float) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max_s, max(0.0, float(retry_after)))
+            except ValueError:
+                pass  # HTTP-date form: fall back to our own schedule
+        return random.uniform(0.0, min(self.backoff_max_s, base_s * (2 ** attempt)))
+
+    def request(self, method: str, url: str, *, timeout: float = 20.0, deadline_s: Optional[float] = None,
+                retries: Optional[int] = None, backoff_s: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        One logical call. `timeout` is the read timeout per attempt; `deadline_s` bounds the
+        whole call. Returns the last response (callers raise_for_status as before) or raises
+        the last connection error.
+        """
+        session, slots = self._host(url)
+        retries = self.retries if retries is None else retries
+        backoff_s = self.backoff_s if backoff_s is None else backoff_s
+        deadline = None if deadline_s is None else time.monotonic() + deadline_s
+
+        def remaining() -> float:
+            if deadline is None:
+                return float("inf")
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise DeadlineExceeded(f"{method} {url}: deadline of {deadline_s}s exceeded")
+            return left
+
+        resp = err = None
+        for attempt in range(retries + 1):
+            resp = err = None
+            if not slots.acquire(timeout=None if deadline is None else remaining()):
+                raise DeadlineExceeded(f"{method} {url}: no free slot before the {deadline_s}s deadline")
+            try:
+                left = remaining()
+                resp = session.request(method, url, timeout=(min(self.connect_timeout_s, left), min(timeout, left)),
+                                       **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                err = ex
+            finally:
+                slots.release()
+
+            if resp is not None and resp.status_code not in RETRY_STATUS:
+                return resp
+            if attempt == retries:
+                break
+            pause = self._backoff(attempt, resp, backoff_s)
+            if pause >= remaining():
+                break
+            if resp is not None:
+                resp.close()
+            time.sleep(pause)
+
+        if resp is not None:
+            return resp
+        if deadline is not None and deadline - time.monotonic() <= 0:
+            raise DeadlineExceeded(f"{method} {url}: deadline of {deadline_s}s exceeded") from err
+        raise err
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            for s in self._sessions.values():
+                s.close()
+            self._sessions.clear()
+            self._slots.clear()
+
+
+_CLIENT: Optional[UpstreamClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client() -> UpstreamClient:
+    """The process-wide client, built from the UPSTREAM_* settings on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = UpstreamClient(
+                    max_per_host=getattr(settings, "UPSTREAM_MAX_PER_HOST", UPSTREAM_MAX_PER_HOST),
+                    pool_size=getattr(settings, "UPSTREAM_POOL_SIZE", UPSTREAM_POOL_SIZE),
+                    retries=getattr(settings, "UPSTREAM_RETRIES", UPSTREAM_RETRIES),
+                    backoff_s=getattr(settings, "UPSTREAM_BACKOFF_S", UPSTREAM_BACKOFF_S),
+                    backoff_max_s=getattr(settings, "UPSTREAM_BACKOFF_MAX_S", UPSTREAM_BACKOFF_MAX_S),
+                    connect_timeout_s=getattr(settings, "UPSTREAM_CONNECT_TIMEOUT_S", UPSTREAM_CONNECT_TIMEOUT_S),
+                )
+    return _CLIENT
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_client().get(url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return get_client().post(url, **kwargs)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path
-from .views import home, crime_heatmap, insight, score_google_routes,support,lighting_geojson,disruptions_along_route,hazards_create,hazards_active,api_venues,voice_call,landing_fakecall,ped_live
+from .views import home, crime_heatmap, insight, score_google_routes,support,lighting_geojson,disruptions_along_route,hazards_create,hazards_active,api_venues,voice_call,landing_fakecall,ped_live,ped_nearest,ped_heat
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -14,6 +14,8 @@ urlpatterns = [
      path("simulator/", landing_fakecall, name="landing_fakecall"),  # marketing/landing
     path("voice-call/", voice_call, name="voice_call"),             # simulated voice call
     path("api/ped/live", ped_live, name="ped_live"), 
+    path("api/ped/nearest", ped_nearest, name="ped_nearest"),
+    path("api/ped/heat", ped_heat, name="ped_heat"),
     path("api/route/score", score_google_routes, name="route_score_api"),
     path("api/hazards/active/", hazards_active, name="hazards_active"),
     path("api/hazards/", hazards_create, name="hazards_create"),
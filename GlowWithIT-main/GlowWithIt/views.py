@@ -1,7 +1,9 @@
 from django.shortcuts import render  
-from django.http import HttpResponse, JsonResponse,HttpResponseBadRequest
+from django.http import HttpResponse, JsonResponse,HttpResponseBadRequest, StreamingHttpResponse
 from django.views.decorators.http import require_GET, require_POST
-from GlowWithIt.route_score import score_route
+from GlowWithIt.route_score import score_routes, iter_score_routes, simplify_for_scoring
+from GlowWithIt.lighting_snapshot import ensure_lighting_snapshot
+from GlowWithIt.timing import collect as collect_timings
 from .models import NightWorkerInsight, VenueCBD, HazardReport
 from django.db import connection  
 from django.core.cache import cache 
@@ -20,15 +22,21 @@ from datetime import datetime, timedelta
 from django.utils import timezone  
 from zoneinfo import ZoneInfo
 from django.db.models import Q
-from .pedestrians import build_live_payload
+from .ped_snapshot import PED_SNAPSHOT_MAX_AGE_S, PedUnavailable, footfall_surface, get_ped_snapshot, live_payload
+from .ped_series import PED_SERIES_MINUTES
+from .pedestrians import add_footfall_score, get_sensor_registry, sensors_in_bbox
+from .opening_hours import compile_hours
+from . import upstream
 import os
 import threading
+import time
 from pathlib import Path
 from django.conf import settings
 import hashlib
 import json as _json  
-from django.utils.crypto import salted_hmac
 from .models import LightingLamp, LightingLitway 
+from .lighting_index import MEL_BBOX
+from .geometry import decode_polyline as _decode_polyline, min_dist_points_to_polyline_m
 
 
 
@@ -80,11 +88,6 @@ VIC_TIMEOUT_S = 30     # per-request timeout in seconds
 MEL_TZ = ZoneInfo("Australia/Melbourne")
 
 
-# Regex pattern for identifying 24/7 safe venues
-PATTERN_247 = r'(?i)\b(24\s*(?:/|\-)?\s*7|24\s*h(?:ou)?rs?)\b'
-
-
-
 try:
     import orjson as _fastjson  # type: ignore
     def _fast_loads(b: bytes):
@@ -187,11 +190,12 @@ def _fetch_planned_disruptions_upstream_all() -> list:
     feats = []
     page = 1
     while True:
-        r = requests.get(
+        r = upstream.get(
             VIC_ROADS_PLANNED_URL,
             headers=VIC_ROADS_HEADERS,
             params={"page": page, "limit": VIC_PAGELIMIT},
             timeout=VIC_TIMEOUT_S,
+            deadline_s=2 * VIC_TIMEOUT_S,  # per page, retries included
         )
         r.raise_for_status()
         data = r.json()
@@ -269,60 +273,18 @@ def home(request):
     return render(request, "home.html", {"news_items": news_items})
 
 
-def is_247_text(txt: str) -> bool:
-    return bool(txt and re.search(PATTERN_247, txt, flags=re.I))
-
-
-def _parse_hhmm_to_minutes(hh: str | int, mm: str | int | None) -> int:
-    h = int(hh)
-    m = int(mm) if mm is not None and str(mm).strip() != "" else 0
-    return (h % 24) * 60 + (m % 60)
-
-def _open_now_from_text(txt: str | None, now_minutes: int) -> bool | None:
-    """
-    Parse a simple "HH[:MM]-HH[:MM]" string or detect 24/7. Returns:
-      True  -> open now,
-      False -> closed now,
-      None  -> unknown.
-    """
-    if not txt:
-        return None
-    s = txt.strip().lower()
-    if is_247_text(s):
-        return True
-    if "closed" in s or "by appointment" in s:
-        return False
-    s = s.replace("–", "-")
-    parts = re.split(r"[;,]\s*", s)
-    rng_re = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*-\s*(\d{1,2})(?::(\d{2}))?\s*$")
-    hit_any = False
-    for p in parts:
-        m = rng_re.match(p)
-        if not m:
-            continue
-        hit_any = True
-        starthr, starmin, endhr, endmin = m.group(1), m.group(2), m.group(3), m.group(4)
-        start = _parse_hhmm_to_minutes(starthr, starmin)
-        end   = _parse_hhmm_to_minutes(endhr, endmin)
-        if start == end:
-            continue
-        if end > start:
-            if start <= now_minutes < end:
-                return True
-        else:
-            if now_minutes >= start or now_minutes < end:
-                return True
-    if hit_any:
-        return False
-    return None
-
 @require_GET
 def api_venues(request):
     """
     Return a list of venues (optionally filtered by bounding box), including today's
-    hours and an "open_now" flag. Adds HTTP caching headers and a weak ETag.
+    hours and an "open_now" flag (plus "open_within" for ?within=N minutes), read from
+    each row's compiled weekly opening-hours mask. Adds HTTP caching headers and a weak ETag.
     """
     limit = int(request.GET.get("limit") or 500)
+    try:
+        within = max(0, min(24 * 60, int(request.GET.get("within") or 0)))
+    except ValueError:
+        within = 0
     qs = VenueCBD.objects.all()
     n = request.GET.get("n"); s = request.GET.get("s")
     e = request.GET.get("e"); w = request.GET.get("w")
@@ -339,6 +301,7 @@ def api_venues(request):
         "osm_type", "osm_id",
         "name", "venue_type", "address",
         "latitude", "longitude",
+        "opening_hours_raw",
         "mon", "tue", "wed", "thu", "fri", "sat", "sun",
     )[:limit]
 
@@ -346,29 +309,15 @@ def api_venues(request):
         return (x or "").strip() or None
 
     now_dt = datetime.now(MELBOURNE_TZ)
-    today_idx = now_dt.weekday()
-    today_field = DAY_FIELDS[today_idx]
-    now_minutes = now_dt.hour * 60 + now_dt.minute
+    today_field = DAY_FIELDS[now_dt.weekday()]
 
     data = []
     for v in qs:
         hours = {d: norm(v[d]) for d in DAY_FIELDS}
-        is_247 = True
-        seen_any = False
-        for h in hours.values():
-            if h:
-                seen_any = True
-                if not is_247_text(h):
-                    is_247 = False
-                    break
-        if not seen_any:
-            is_247 = False
-
-        hours_today = hours.get(today_field)
-        open_now = _open_now_from_text(hours_today, now_minutes)
+        oh = compile_hours(v)
 
         json_id = f"{v['osm_type']}:{v['osm_id']}"
-        data.append({
+        row = {
             "id": json_id,
             "name": v["name"],
             "type": v["venue_type"],
@@ -376,10 +325,13 @@ def api_venues(request):
             "lat": float(v["latitude"]),
             "lng": float(v["longitude"]),
             "hours": hours,
-            "hours_today": hours_today,
-            "is_247": is_247,
-            "open_now": open_now, 
-        })
+            "hours_today": hours.get(today_field),
+            "is_247": oh.is_247,
+            "open_now": oh.is_open(now_dt),
+        }
+        if within:
+            row["open_within"] = oh.open_within(now_dt, within)
+        data.append(row)
 
     payload = {"venues": data}
     resp = JsonResponse(payload)
@@ -482,7 +434,6 @@ def _load_city_wkt() -> str | None:
       3) CSV column 'Geo Shape' / 'geo shape' / 'geo_shape' / 'geometry' / 'geom' / 'geojson':
          contains GeoJSON (Polygon/MultiPolygon) that will be converted to WKT
     """
-    import re
     csv_path = finders.find("data/municipal-boundary.csv")
     DBG(f"_load_city_wkt: csv_path={csv_path}")
     if not csv_path:
@@ -628,9 +579,6 @@ def _intersect_bbox(b1, b2):
     return out
 
 
-MEL_BBOX = (144.90, -37.86, 145.02, -37.76)
-
-
 @require_GET
 def lighting_geojson(request):
     """
@@ -881,31 +829,6 @@ def lighting_geojson(request):
 
 
 
-def decode_polyline(s: str):
-    """
-    Decode a Google-encoded polyline string into a list of (lat, lng) tuples.
-    """
-    coords = []
-    i, lat, lng = 0, 0, 0
-    while i < len(s):
-        shift = 0; result = 0
-        while True:
-            b = ord(s[i]) - 63; i += 1
-            result |= (b & 0x1F) << shift; shift += 5
-            if b < 0x20: break
-        dlat = ~(result >> 1) if (result & 1) else (result >> 1)
-        lat += dlat
-        shift = 0; result = 0
-        while True:
-            b = ord(s[i]) - 63; i += 1
-            result |= (b & 0x1F) << shift; shift += 5
-            if b < 0x20: break
-        dlng = ~(result >> 1) if (result & 1) else (result >> 1)
-        lng += dlng
-        coords.append((lat / 1e5, lng / 1e5))
-    return coords
-
-
 def parse_iso_or_none(ts):
     """
     Parse an ISO8601 string into a datetime or return None if parsing fails.
@@ -997,98 +920,48 @@ def norm_lon_lat(x, y):
     return x, y
 
 
-def meters_per_degree(lat):
-    """
-    Rough meters-per-degree at a given latitude for local projection math.
+def _geometry_lon_lats(geometry):
     """
-    lat_m = 111_320.0
-    lon_m = 111_320.0 * math.cos(math.radians(lat))
-    return lat_m, lon_m
-
-
-def min_dist_point_to_polyline_m(pt_lat, pt_lng, route_latlng):
+    Yield every (lon, lat) vertex of a GeoJSON geometry, normalized with norm_lon_lat.
     """
-    Compute the minimum distance (in meters) from a point to a polyline (list of lat/lng pairs).
-    """
-    if len(route_latlng) < 2:
-        return float("inf")
-    ref_lat, ref_lng = route_latlng[0]
-    LAT_M, LNG_M = meters_per_degree(ref_lat)
-    def to_xy(lat, lng):
-        return (lng - ref_lng) * LNG_M, (lat - ref_lat) * LAT_M
-    px, py = to_xy(pt_lat, pt_lng)
-    dmin = float("inf")
-    for (a_lat, a_lng), (b_lat, b_lng) in zip(route_latlng[:-1], route_latlng[1:]):
-        ax, ay = to_xy(a_lat, a_lng)
-        bx, by = to_xy(b_lat, b_lng)
-        vx, vy = bx - ax, by - ay
-        wx, wy = px - ax, py - ay
-        v2 = vx * vx + vy * vy
-        t = 0.0 if v2 == 0 else max(0.0, min(1.0, (wx * vx + wy) / v2))
-        projx, projy = ax + t * vx, ay + t * vy
-        dmin = min(dmin, math.hypot(px - projx, py - projy))
-    return dmin
+    gtype = geometry.get("type")
+    if gtype == "GeometryCollection":
+        for g in geometry.get("geometries", []):
+            yield from _geometry_lon_lats(g or {})
+        return
+    coords = geometry.get("coordinates")
+    if not coords:
+        return
+    if gtype == "Point":
+        yield norm_lon_lat(*coords)
+    elif gtype in ("MultiPoint", "LineString"):
+        for c in coords:
+            yield norm_lon_lat(*c)
+    elif gtype in ("MultiLineString", "Polygon"):
+        for line in coords or []:
+            for c in line or []:
+                yield norm_lon_lat(*c)
+    elif gtype == "MultiPolygon":
+        for poly in coords:
+            for ring in poly:
+                for c in ring:
+                    yield norm_lon_lat(*c)
 
 
 def min_distance_geometry_to_route(geometry, route_latlng):
     """
     Compute the minimum distance (in meters) from a GeoJSON geometry to a route polyline.
+    All vertices of the geometry are measured against the route in one batch.
     """
     if not geometry or not route_latlng:
         return float("inf")
-    gtype = geometry.get("type")
-    coords = geometry.get("coordinates")
-    if gtype == "GeometryCollection":
-        dmin = float("inf")
-        for g in geometry.get("geometries", []):
-            dmin = min(dmin, min_distance_geometry_to_route(g, route_latlng))
-        return dmin
-    if not coords:
-        return float("inf")
     try:
-        if gtype == "Point":
-            lon, lat = norm_lon_lat(*coords)
-            return min_dist_point_to_polyline_m(lat, lon, route_latlng)
-        if gtype == "MultiPoint":
-            return min(
-                min_dist_point_to_polyline_m(lat, lon, route_latlng)
-                for c in coords
-                for lon, lat in [norm_lon_lat(*c)]
-            )
-        if gtype == "LineString":
-            return min(
-                min_dist_point_to_polyline_m(*reversed(norm_lon_lat(*c)), route_latlng)
-                for c in coords
-            )
-        if gtype == "MultiLineString":
-            dmin = float("inf")
-            for line in coords or []:
-                if not line:
-                    continue
-                dmin = min(
-                    dmin,
-                    min(
-                        min_dist_point_to_polyline_m(*reversed(norm_lon_lat(*c)), route_latlng)
-                        for c in line
-                    ),
-                )
-            return dmin
-        if gtype == "Polygon":
-            return min(
-                min_dist_point_to_polyline_m(*reversed(norm_lon_lat(*c)), route_latlng)
-                for ring in coords
-                for c in ring
-            )
-        if gtype == "MultiPolygon":
-            return min(
-                min_dist_point_to_polyline_m(*reversed(norm_lon_lat(*c)), route_latlng)
-                for poly in coords
-                for ring in poly
-                for c in ring
-            )
+        pts = [(lat, lon) for lon, lat in _geometry_lon_lats(geometry)]
     except Exception:
         return float("inf")
-    return float("inf")
+    if not pts:
+        return float("inf")
+    return float(min_dist_points_to_polyline_m(pts, route_latlng).min())
 
 
 def fetch_planned_disruptions_all():
@@ -1382,11 +1255,13 @@ def disruptions_along_route(request):
         return set_cache_headers(resp, max_age=5*60, swr=5*60, etag_source=cached)
 
     try:
-        route_latlng = decode_polyline(encoded)
+        route_latlng = _decode_polyline(encoded)
     except Exception:
         return JsonResponse({"error": "Invalid polyline"}, status=400)
     if len(route_latlng) < 2:
         return JsonResponse({"error": "Route must have at least 2 points"}, status=400)
+    # drop near-collinear vertices before any distance work (see ROUTE_SIMPLIFY_TOLERANCE_M)
+    route_latlng, simplify_meta = simplify_for_scoring(route_latlng)
 
     try:
         features = fetch_planned_disruptions_all()
@@ -1468,6 +1343,7 @@ def disruptions_along_route(request):
             "near_route": len(near),
             "skipped_invalid_geometry": skipped_invalid,
             "radius_m": radius_m,
+            **simplify_meta,
         },
     }
     
@@ -1518,22 +1394,21 @@ def voice_call(request):
 
 CSV_PATH = Path(settings.BASE_DIR) / "GlowWithIt/static/data" / "pedestrian-counting-system-sensor-locations.csv"
 
-def _round_bbox(bbox, ndp=4):
-    if not bbox:
-        return None
-    minx, miny, maxx, maxy = bbox
-    return (round(minx, ndp), round(miny, ndp), round(maxx, ndp), round(maxy, ndp))
+# profile payloads (no snapshot yet) are cached briefly: the next poll may land any moment
+PED_FALLBACK_CACHE_S = 60
 
-def _ped_cache_key(minutes: int, bbox_rounded):
-    # Keep the key short but stable; include a version in case payload format changes.
-    version = "v1"
-    base = f"{version}:{minutes}:{bbox_rounded}"
-    # HMAC so we don’t end up with super-long keys for bbox str
-    digest = salted_hmac("ped_live_key", base).hexdigest()[:16]
-    return f"ped_live:{version}:{minutes}:{digest}"
+def _ped_minutes(raw) -> int:
+    """A footfall window from a request, clamped to 1..PED_SERIES_MINUTES (all the live series holds)."""
+    return max(1, min(int(raw), getattr(settings, "PED_SERIES_MINUTES", PED_SERIES_MINUTES)))
+
+def _ped_cache_key(minutes: int, snapshot_version) -> str:
+    # One city-wide payload per window and snapshot version ("profile" without one); the bbox
+    # is applied per request, so panning the map never creates new entries. Bump the prefix
+    # if the payload format changes.
+    return f"ped_live:v3:{int(minutes)}:{snapshot_version}"
 
 def ped_live(request):
-    minutes = int(request.GET.get("minutes", "60"))
+    minutes = _ped_minutes(request.GET.get("minutes", "60"))
     bbox_q = request.GET.get("bbox")
     bbox = None
     if bbox_q:
@@ -1544,16 +1419,31 @@ def ped_live(request):
         except Exception:
             bbox = None
 
-    bbox_r = _round_bbox(bbox, ndp=4)
     nocache = request.GET.get("nocache") == "1"
 
-    key = _ped_cache_key(minutes, bbox_r)
-    data = None if nocache else cache.get(key)
+    snap = get_ped_snapshot()
+    key = _ped_cache_key(minutes, snap.version if snap else "profile")
+    data = cache.get(key) if not nocache else None
+    hit = data is not None
 
     try:
         if not data:
-            data = build_live_payload(CSV_PATH, minutes=minutes, bbox=bbox_r)
-            cache.set(key, data, timeout=5 * 60)
+            data = live_payload(CSV_PATH, minutes=minutes, snapshot=snap)
+            if data.get("snapshot"):
+                cache.set(_ped_cache_key(minutes, data["snapshot"]["version"]), data, timeout=5 * 60)
+            else:
+                cache.set(_ped_cache_key(minutes, "profile"), data, timeout=PED_FALLBACK_CACHE_S)
+        sensors = sensors_in_bbox(data["sensors"], get_sensor_registry(CSV_PATH), bbox)
+        if bbox:
+            # footfall_score is P10–P90 across the sensors in view, not the whole city
+            sensors = add_footfall_score([dict(s) for s in sensors])
+        data["sensors"] = sensors
+    except PedUnavailable as ex:
+        # nothing to serve yet; a refresh is already running in the background
+        resp = JsonResponse({"error": "ped_live_unavailable", "detail": str(ex)}, status=503)
+        resp["Cache-Control"] = "no-store"
+        resp["Retry-After"] = "30"
+        return resp
     except Exception as ex:
         # Return JSON error so jq/python -m json.tool don’t choke on HTML
         payload = {"error": "ped_live_fetch_failed", "detail": str(ex)}
@@ -1561,17 +1451,99 @@ def ped_live(request):
         resp["Cache-Control"] = "no-store"
         return resp
 
+    if data.get("snapshot"):
+        # age at response time, not when this payload was cached
+        data["snapshot"]["age_s"] = round(max(0.0, time.time() - data["snapshot"]["fetched_at"]), 1)
+        data["snapshot"]["stale"] = data["snapshot"]["age_s"] > getattr(settings, "PED_SNAPSHOT_MAX_AGE_S", PED_SNAPSHOT_MAX_AGE_S)
     resp = JsonResponse(data, json_dumps_params={"separators": (",", ":")})
+    if data.get("snapshot"):
+        resp["X-Snapshot-Age"] = str(int(data["snapshot"]["age_s"]))
     if nocache:
         resp["Cache-Control"] = "no-store"
         resp["X-Cache"] = "BYPASS"
         return resp
 
     # This header is just informational
-    resp["X-Cache"] = "HIT" if cache.get(key) else "MISS"
+    resp["X-Cache"] = "HIT" if hit else "MISS"
     return set_cache_headers(resp, max_age=120, swr=180, etag_source=data)
 
 
+@require_GET
+def ped_nearest(request):
+    """
+    GET /api/ped/nearest?lat=-37.81&lon=144.96&k=3[&max_m=500][&minutes=60]
+    The k sensors closest to the point (sensor registry grid), with their live count
+    when there is a fresh snapshot.
+    """
+    try:
+        lat = float(request.GET["lat"]); lon = float(request.GET["lon"])
+        k = max(1, min(20, int(request.GET.get("k", "1"))))
+        max_m = float(request.GET.get("max_m", "inf"))
+        minutes = _ped_minutes(request.GET.get("minutes", "60"))
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "bad_params", "detail": "lat and lon are required numbers"}, status=400)
+    # a missing max_m means unbounded; a given one must be a finite, positive distance
+    if "max_m" in request.GET and not (math.isfinite(max_m) and max_m > 0):
+        return JsonResponse({"error": "bad_params", "detail": "max_m must be a positive number of metres"}, status=400)
+    minlon, minlat, maxlon, maxlat = MEL_BBOX
+    if not (minlat <= lat <= maxlat and minlon <= lon <= maxlon):
+        return JsonResponse({"error": "bad_params", "detail": "lat/lon must be inside the city bbox"}, status=400)
+
+    registry = get_sensor_registry(CSV_PATH)
+    snap = get_ped_snapshot()
+    counts = {}
+    if snap is not None:
+        counts = {s["id"]: s for s in live_payload(CSV_PATH, minutes=minutes, snapshot=snap)["sensors"]}
+
+    sensors = []
+    for lid, dist in registry.nearest(lat, lon, k=k, max_m=max_m):
+        m = registry.meta[lid]
+        live = counts.get(lid) or {}
+        sensors.append({"id": lid, "name": m["name"], "lat": m["lat"], "lon": m["lon"],
+                        "distance_m": round(dist, 1), "count_60m": live.get("count_60m"),
+                        "footfall_score": live.get("footfall_score")})
+    out = {"sensors": sensors, "snapshot": snap.describe(minutes) if snap else None}
+    return set_cache_headers(JsonResponse(out, json_dumps_params={"separators": (",", ":")}), max_age=60)
+
+
+@require_GET
+def ped_heat(request):
+    """
+    GET /api/ped/heat?minutes=60[&stride=4]
+    Heat layer from the interpolated footfall grid of the current snapshot:
+    [[lat, lng, score 0..1], ...] for every `stride`-th cell (stride 4 = 100 m).
+    """
+    try:
+        minutes = int(request.GET.get("minutes", "60"))
+        stride = max(1, min(16, int(request.GET.get("stride", "4"))))
+    except ValueError:
+        return JsonResponse({"error": "bad_params", "detail": "minutes and stride must be integers"}, status=400)
+    max_minutes = getattr(settings, "PED_SERIES_MINUTES", PED_SERIES_MINUTES)
+    if not 1 <= minutes <= max_minutes:
+        return JsonResponse({"error": "bad_params", "detail": f"minutes must be 1..{max_minutes}"}, status=400)
+
+    try:
+        surface = footfall_surface(CSV_PATH, minutes)
+    except Exception as ex:
+        resp = JsonResponse({"error": "ped_heat_failed", "detail": str(ex)}, status=502)
+        resp["Cache-Control"] = "no-store"
+        return resp
+    if surface is None:
+        resp = JsonResponse({"error": "ped_heat_unavailable", "detail": "no live pedestrian snapshot"}, status=503)
+        resp["Cache-Control"] = "no-store"
+        resp["Retry-After"] = "30"
+        return resp
+
+    out = {
+        "bbox": list(surface.bbox),
+        "res_m": surface.res_m * stride,
+        "points": surface.heat_points(stride),
+        "snapshot": {k: surface.meta.get(k) for k in ("version", "fetched_at", "minutes_covered")},
+    }
+    out["snapshot"]["age_s"] = round(max(0.0, time.time() - surface.meta["fetched_at"]), 1)
+    return set_cache_headers(JsonResponse(out, json_dumps_params={"separators": (",", ":")}), max_age=60)
+
+
 @csrf_exempt
 @require_POST
 def score_google_routes(request):
@@ -1582,6 +1554,10 @@ def score_google_routes(request):
       { "polyline": "ENC1", "minutes": 60 }
     Returns:
       { "routes":[...], "summary":[{"i":0,"label":"green","score":0.82}, ...] }
+    With "Accept: application/x-ndjson" the response streams one JSON object per line
+    as results become available (see _stream_route_scores).
+    Stage wall times (decode, sampling, lighting_fetch, ...) go out in a Server-Timing
+    header; add "timings": true to the body (or ?timings=1) to get them as a "timings" block too.
     """
     #  Parse JSON
     try:
@@ -1595,19 +1571,27 @@ def score_google_routes(request):
     if not polylines:
         return JsonResponse({"error": "no_polylines"}, status=400)
 
-    minutes = int(body.get("minutes") or 60)
-    
+    minutes = _ped_minutes(body.get("minutes") or 60)
+    want_timings = bool(body.get("timings")) or request.GET.get("timings") == "1"
+    # keep this worker's lighting snapshot current (background check, never blocks)
+    ensure_lighting_snapshot()
+
+    if "application/x-ndjson" in request.headers.get("Accept", ""):
+        # headers are gone before the work starts, so stage timings ride on the summary line instead
+        resp = StreamingHttpResponse(_stream_route_scores(polylines, minutes, want_timings), content_type="application/x-ndjson")
+        resp["Cache-Control"] = "no-store"
+        resp["X-Accel-Buffering"] = "no"  # don't let nginx hold the lines back
+        return resp
 
-    #  Score each route
-    results = []
-    for idx, p in enumerate(polylines):
+    #  Score all routes against one shared fetch of lighting / footfall / venues / disruptions
+    with collect_timings() as timings:
         try:
-            r = score_route(p, minutes=minutes)   
-            r["route_index"] = idx
-            results.append(r)
+            results = score_routes(polylines, minutes=minutes)
         except Exception as ex:
-            logging.exception("score_route failed for route %s", idx)
-            results.append({"route_index": idx, "error": "scoring_failed", "detail": str(ex)})
+            logging.exception("score_routes failed")
+            results = [{"error": "scoring_failed", "detail": str(ex)} for _ in polylines]
+    for idx, r in enumerate(results):
+        r["route_index"] = idx
 
     # 4) Build summary for quick UI color swap
     summary = [
@@ -1616,7 +1600,39 @@ def score_google_routes(request):
         if r.get("label") is not None
     ]
 
-    return JsonResponse({"routes": results, "summary": summary})
+    payload = {"routes": results, "summary": summary}
+    if want_timings:
+        payload["timings"] = timings.as_dict()
+    resp = JsonResponse(payload)
+    resp["Server-Timing"] = timings.server_timing()
+    return resp
+
+
+def _stream_route_scores(polylines, minutes, want_timings=False):
+    """
+    NDJSON lines, in completion order:
+      {"event":"component","route_index":0,"name":"lighting","result":{...}}
+      {"event":"route","route_index":0,"result":{..., "route_index":0}}
+      {"event":"summary","summary":[{"i":0,"label":"green","score":0.82}, ...]}   (always last,
+       with "timings" when asked for)
+    """
+    summary = []
+    with collect_timings() as timings:
+        try:
+            for ev in iter_score_routes(polylines, minutes=minutes):
+                if ev["event"] == "route":
+                    ev["result"]["route_index"] = ev["route_index"]
+                    if ev["result"].get("label") is not None:
+                        summary.append({"i": ev["route_index"], "label": ev["result"]["label"], "score": ev["result"].get("overall")})
+                yield json.dumps(ev) + "\n"
+        except Exception as ex:
+            logging.exception("score_routes stream failed")
+            yield json.dumps({"event": "error", "error": "scoring_failed", "detail": str(ex)}) + "\n"
+    summary.sort(key=lambda s: s["i"])
+    tail = {"event": "summary", "summary": summary}
+    if want_timings:
+        tail["timings"] = timings.as_dict()
+    yield json.dumps(tail) + "\n"
 
 
 def iso_utc(dt):